@@ -0,0 +1,297 @@
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, Optional
+
+from app.config import settings, resolve_path
+from app.synonyms import normalize
+
+
+class CacheBackend:
+    """Key/value store with TTL, LRU eviction and tag-based invalidation"""
+
+    def get(self, key: str) -> Optional[Any]:
+        raise NotImplementedError
+
+    def set(self, key: str, value: Any, tags: Iterable[str] = ()) -> None:
+        raise NotImplementedError
+
+    def invalidate_tags(self, tags: Iterable[str]) -> int:
+        """Drop every entry carrying one of the tags; returns entries dropped"""
+        raise NotImplementedError
+
+    def clear(self) -> None:
+        raise NotImplementedError
+
+    def __len__(self) -> int:
+        raise NotImplementedError
+
+
+class MemoryCache(CacheBackend):
+    """In-process LRU cache with per-entry TTL"""
+
+    def __init__(self, max_entries: int = 1024, ttl: float = 600.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        # key -> (expires_at, value, tags)
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._tags: Dict[str, set] = {}
+
+    def get(self, key: str) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry[0] < time.monotonic():
+            self._remove(key)
+            return None
+        self._entries.move_to_end(key)
+        return entry[1]
+
+    def set(self, key: str, value: Any, tags: Iterable[str] = ()) -> None:
+        if key in self._entries:
+            self._remove(key)
+        tags = frozenset(tags)
+        self._entries[key] = (time.monotonic() + self.ttl, value, tags)
+        for tag in tags:
+            self._tags.setdefault(tag, set()).add(key)
+
+        while len(self._entries) > self.max_entries:
+            self._remove(next(iter(self._entries)))
+
+    def invalidate_tags(self, tags: Iterable[str]) -> int:
+        keys = set()
+        for tag in tags:
+            keys |= self._tags.get(tag, set())
+        for key in keys:
+            self._remove(key)
+        return len(keys)
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._tags.clear()
+
+    def _remove(self, key: str) -> None:
+        _, _, tags = self._entries.pop(key)
+        for tag in tags:
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class DiskCache(CacheBackend):
+    """
+    SQLite-backed cache that survives restarts
+
+    Values must be JSON-serialisable. LRU order is kept in an access
+    timestamp column.
+    """
+
+    def __init__(self, path: str, max_entries: int = 10000, ttl: float = 600.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                "key TEXT PRIMARY KEY, value TEXT, expires_at REAL, accessed_at REAL)"
+            )
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS tags (tag TEXT, key TEXT)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS tags_tag ON tags (tag)")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS tags_key ON tags (key)")
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed_at)"
+            )
+
+    def get(self, key: str) -> Optional[Any]:
+        now = time.time()
+        with self._lock, self._conn:
+            row = self._conn.execute(
+                "SELECT value, expires_at FROM entries WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            if row[1] < now:
+                self._delete_keys([key])
+                return None
+            self._conn.execute(
+                "UPDATE entries SET accessed_at = ? WHERE key = ?", (now, key)
+            )
+        return json.loads(row[0])
+
+    def set(self, key: str, value: Any, tags: Iterable[str] = ()) -> None:
+        now = time.time()
+        with self._lock, self._conn:
+            self._delete_keys([key])
+            self._conn.execute(
+                "INSERT INTO entries (key, value, expires_at, accessed_at) VALUES (?, ?, ?, ?)",
+                (key, json.dumps(value, ensure_ascii=False), now + self.ttl, now),
+            )
+            self._conn.executemany(
+                "INSERT INTO tags (tag, key) VALUES (?, ?)",
+                [(tag, key) for tag in set(tags)],
+            )
+            excess = self._count() - self.max_entries
+            if excess > 0:
+                keys = [
+                    r[0] for r in self._conn.execute(
+                        "SELECT key FROM entries ORDER BY accessed_at LIMIT ?", (excess,)
+                    )
+                ]
+                self._delete_keys(keys)
+
+    def invalidate_tags(self, tags: Iterable[str]) -> int:
+        tags = list(set(tags))
+        if not tags:
+            return 0
+        placeholders = ",".join("?" * len(tags))
+        with self._lock, self._conn:
+            keys = [
+                r[0] for r in self._conn.execute(
+                    f"SELECT DISTINCT key FROM tags WHERE tag IN ({placeholders})", tags
+                )
+            ]
+            self._delete_keys(keys)
+        return len(keys)
+
+    def clear(self) -> None:
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM entries")
+            self._conn.execute("DELETE FROM tags")
+
+    def _delete_keys(self, keys) -> None:
+        rows = [(k,) for k in keys]
+        self._conn.executemany("DELETE FROM entries WHERE key = ?", rows)
+        self._conn.executemany("DELETE FROM tags WHERE key = ?", rows)
+
+    def _count(self) -> int:
+        return self._conn.execute("SELECT count(*) FROM entries").fetchone()[0]
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._count()
+
+
+class NullCache(CacheBackend):
+    """Cache that never stores anything (CACHE_BACKEND=none)"""
+
+    def get(self, key: str) -> Optional[Any]:
+        return None
+
+    def set(self, key: str, value: Any, tags: Iterable[str] = ()) -> None:
+        pass
+
+    def invalidate_tags(self, tags: Iterable[str]) -> int:
+        return 0
+
+    def clear(self) -> None:
+        pass
+
+    def __len__(self) -> int:
+        return 0
+
+
+class CacheLayer:
+    """A cache backend with hit/miss counters"""
+
+    def __init__(self, name: str, backend: CacheBackend):
+        self.name = name
+        self.backend = backend
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str) -> Optional[Any]:
+        value = self.backend.get(key)
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    def set(self, key: str, value: Any, tags: Iterable[str] = ()) -> None:
+        self.backend.set(key, value, tags)
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+            "entries": len(self.backend),
+        }
+
+
+class QACache:
+    """
+    Two-level cache for /ask
+
+    - retrieval: normalized question + hop + limit -> linked entities and
+      triples (skips linking and subgraph fetch)
+    - answer: hash of the built prompt -> LLM answer (skips the LLM call)
+    """
+
+    def __init__(self, backend: str = "memory", ttl: float = 600.0, max_entries: int = 1024):
+        self.backend = backend
+        self.retrieval = CacheLayer("retrieval", _make_backend(backend, "retrieval", ttl, max_entries))
+        self.answer = CacheLayer("answer", _make_backend(backend, "answer", ttl, max_entries))
+
+    @staticmethod
+    def retrieval_key(question: str, hop: int, limit: int) -> str:
+        text = re.sub(r"[\s，。、？?！!,.]+", "", normalize(question))
+        return f"{hop}:{limit}:{text}"
+
+    @staticmethod
+    def answer_key(prompt: str) -> str:
+        return hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+
+    def invalidate(self) -> int:
+        """Drop everything (after a full KG reload); returns entries dropped"""
+        dropped = len(self.retrieval.backend) + len(self.answer.backend)
+        self.retrieval.backend.clear()
+        self.answer.backend.clear()
+        return dropped
+
+    def invalidate_nodes(self, node_ids: Iterable[str]) -> int:
+        """
+        Drop retrieval entries that touched any of node_ids (after a delta load)
+
+        Answers are keyed by prompt, and a changed subgraph changes the
+        prompt, so the answer layer needs no invalidation.
+        """
+        return self.retrieval.backend.invalidate_tags(node_ids)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "backend": self.backend,
+            "retrieval": self.retrieval.stats(),
+            "answer": self.answer.stats(),
+        }
+
+
+def _make_backend(kind: str, name: str, ttl: float, max_entries: int) -> CacheBackend:
+    if kind == "memory":
+        return MemoryCache(max_entries=max_entries, ttl=ttl)
+    if kind == "disk":
+        path = os.path.join(resolve_path(settings.CACHE_DIR), f"{name}.sqlite3")
+        return DiskCache(path, max_entries=max_entries, ttl=ttl)
+    return NullCache()
+
+
+qa_cache = QACache(
+    backend=settings.CACHE_BACKEND,
+    ttl=settings.CACHE_TTL_SECONDS,
+    max_entries=settings.CACHE_MAX_ENTRIES,
+)
@@ -1,23 +1,105 @@
+import os
+
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 
 class Settings(BaseSettings):
     model_config = SettingsConfigDict(env_file=".env", env_file_encoding="utf-8", extra="ignore")
 
+    # Graph store (neo4j | embedded)
+    GRAPH_BACKEND: str = "neo4j"
+    KG_NODES_FILE: str = "./data/processed/nodes.csv"
+    KG_EDGES_FILE: str = "./data/processed/edges.csv"
+    KG_SNAPSHOT_PATH: str = ""
+
     # Neo4j
     NEO4J_URI: str = "bolt://localhost:7687"
     NEO4J_USER: str = "neo4j"
     NEO4J_PASSWORD: str = "neo4j_password"
+    # Empty: the user's home database. Naming it saves a home-database
+    # lookup per session
+    NEO4J_DATABASE: str = ""
+    NEO4J_MAX_POOL_SIZE: int = 100
+    NEO4J_ACQUISITION_TIMEOUT: float = 5.0
+    NEO4J_CONNECTION_TIMEOUT: float = 5.0
+    NEO4J_MAX_CONNECTION_LIFETIME: float = 3600.0
+    NEO4J_QUERY_TIMEOUT: float = 10.0
+    NEO4J_MAX_RETRY_TIME: float = 5.0
+    # Full-text index on name/aliases created by load_neo4j.py ("" scans nodes instead)
+    NEO4J_FULLTEXT_INDEX: str = "entity_names"
 
     # LLM
     LLM_PROVIDER: str = "mock"
     LLM_API_KEY: str = "mock_key"
     LLM_MODEL: str = "mock-model"
+    LLM_BASE_URL: str = "https://api.openai.com/v1"
+    LLM_TIMEOUT: float = 30.0
+    LLM_CONNECT_TIMEOUT: float = 5.0
+    LLM_MAX_CONCURRENCY: int = 8
+    LLM_MAX_RETRIES: int = 2
+    LLM_RETRY_BACKOFF: float = 0.5
+    LLM_RETRY_MAX_BACKOFF: float = 8.0
 
     # Application
     LOG_DIR: str = "./data/logs"
+    QA_LOG_QUEUE_SIZE: int = 10000
+    QA_LOG_BATCH_SIZE: int = 100
+    QA_LOG_FLUSH_INTERVAL: float = 1.0
+    QA_LOG_MAX_BYTES: int = 100 * 1024 * 1024
+    QA_LOG_GZIP: bool = False
     SUBGRAPH_DEFAULT_HOP: int = 2
     SUBGRAPH_DEFAULT_LIMIT: int = 20
+    SUBGRAPH_MAX_HOP: int = 3
+    SUBGRAPH_RELATION_FANOUT: int = 10
+    RULE_ENGINE_ENABLED: bool = True
+    INTENT_ROUTING_ENABLED: bool = True
+    INTENT_TRAINING_FILE: str = ""
+
+    # Pipeline stage timeouts (seconds)
+    PIPELINE_LINK_TIMEOUT: float = 2.0
+    PIPELINE_AGE_TIMEOUT: float = 2.0
+    PIPELINE_EXPAND_TIMEOUT: float = 3.0
+    PIPELINE_RETRIEVAL_DEADLINE: float = 4.0
+    PIPELINE_LLM_TIMEOUT: float = 90.0
+
+    # Triples retrieved per question, as a multiple of limit; ranking keeps the limit best
+    RANKING_CANDIDATE_MULTIPLIER: int = 4
+
+    # Prompt size in tokens (0: no limit); tokenizer: heuristic | tiktoken[:<encoding>]
+    PROMPT_TOKEN_BUDGET: int = 1536
+    PROMPT_TOKENIZER: str = "heuristic"
+
+    # POST /ask/batch: max questions per batch, questions answered at once
+    ASK_BATCH_MAX_SIZE: int = 1000
+    ASK_BATCH_CONCURRENCY: int = 32
+
+    # Share one computation among identical concurrent /ask and /subgraph calls
+    SINGLEFLIGHT_ENABLED: bool = True
+
+    # Metrics (GET /api/v1/metrics); per-request stage timings in debug
+    METRICS_DEBUG_TIMINGS: bool = True
+
+    # Cache (backend: memory | disk | none)
+    CACHE_BACKEND: str = "memory"
+    CACHE_TTL_SECONDS: float = 600.0
+    CACHE_MAX_ENTRIES: int = 1024
+    CACHE_DIR: str = "./data/cache"
+
+    # Synonyms
+    SYNONYMS_FILE: str = "./data/synonyms/synonyms.json"
+    SYNONYMS_RELOAD_INTERVAL: float = 5.0
+
+    # Fuzzy entity linking (typos, near-miss names) beside exact gazetteer matches
+    FUZZY_LINKING_ENABLED: bool = True
+    FUZZY_MIN_SCORE: float = 0.75
+    FUZZY_TOPK: int = 3
 
 
 settings = Settings()
+
+
+def resolve_path(path: str) -> str:
+    """Resolve a configured path; relative paths are relative to project root"""
+    if os.path.isabs(path):
+        return path
+    return os.path.join(os.path.dirname(__file__), "../../../", path)
@@ -0,0 +1,510 @@
+import asyncio
+import csv
+import hashlib
+import json
+from bisect import bisect_right
+from functools import cached_property, partial
+from array import array
+from typing import List, Optional, Dict, Any, Iterator, Sequence, Tuple
+
+from app.config import settings, resolve_path
+from app import subgraph
+from app.synonyms import normalize
+from app.fuzzy_index import FuzzyIndex
+from app.kg_snapshot import KGSnapshot, LazySequence
+
+# Sentinel for missing int32 properties (age_min/age_max) and strings
+MISSING = -1
+
+# int32 columns of a GraphState (same names as the snapshot sections)
+COLUMNS = (
+    "node_key", "node_name", "node_label", "node_age_min", "node_age_max",
+    "alias_offsets", "alias_strings",
+    "edge_head", "edge_tail", "edge_rel", "edge_source",
+    "adj_offsets", "adj_edges",
+)
+
+
+class GraphState:
+    """
+    One loaded version of the KG: arrays, name index and age index
+
+    Built completely before it is published and never mutated afterwards
+    (except the per-age result cache), so a request that took a reference
+    keeps a consistent graph even while a reload builds the next one.
+
+    Nodes are dense int32 ids. Strings (node ids, names, labels, aliases,
+    relation types, source ids) are interned once in a string table and
+    stored as int32 indexes. Incident edges of every node are kept in CSR
+    form (adj_offsets / adj_edges), so a k-hop expansion or name lookup is
+    a few array reads with no network round trip. A snapshot supplies the
+    name and age indexes prebuilt; from CSVs they are built here.
+    """
+
+    def __init__(
+        self,
+        strings: Sequence[str],
+        node_index: Dict[str, int],
+        surface_index: Optional[Dict[str, List[int]]],
+        columns: Dict[str, Sequence[int]],
+        snapshot: Optional[KGSnapshot] = None,
+        age_products: Optional[Sequence[int]] = None,
+    ):
+        self.strings = strings
+        # node_id string -> dense node index (dict or SortedIndex)
+        self.node_index = node_index
+
+        # Node columns (int32, indexes into strings unless noted)
+        self.node_key = columns["node_key"]
+        self.node_name = columns["node_name"]
+        self.node_label = columns["node_label"]
+        self.node_age_min = columns["node_age_min"]  # value, MISSING if absent
+        self.node_age_max = columns["node_age_max"]  # value, MISSING if absent
+        self.alias_offsets = columns["alias_offsets"]
+        self.alias_strings = columns["alias_strings"]
+
+        # Edge columns
+        self.edge_head = columns["edge_head"]  # node index
+        self.edge_tail = columns["edge_tail"]  # node index
+        self.edge_rel = columns["edge_rel"]
+        self.edge_source = columns["edge_source"]  # MISSING if absent
+
+        # CSR of incident edges (both directions) per node
+        self.adj_offsets = columns["adj_offsets"]
+        self.adj_edges = columns["adj_edges"]
+
+        # Keeps a snapshot mapped while this state is in use
+        self.snapshot = snapshot
+
+        # normalized name / alias -> dense node indexes (dict or SortedIndex)
+        self.surface_index = surface_index if surface_index is not None else self._build_surface_index()
+
+        # Products with an age range sorted by age_min
+        self.age_products = age_products if age_products is not None else self._build_age_products()
+        # age -> {"eligible", "ineligible"}
+        self.age_sets: Dict[int, Dict[str, List[Dict[str, Any]]]] = {}
+
+    @classmethod
+    def from_snapshot(cls, path: str) -> "GraphState":
+        """Map a binary snapshot (nothing is parsed, copied or scanned)"""
+        snapshot = KGSnapshot(path)
+        columns = {name: snapshot.sections[name] for name in COLUMNS}
+        return cls(
+            snapshot.strings, snapshot.node_index, snapshot.surface_index, columns,
+            snapshot, snapshot.sections["age_products"],
+        )
+
+    @classmethod
+    def from_csv(cls, nodes_path: str, edges_path: str) -> "GraphState":
+        """Build the arrays from nodes.csv / edges.csv"""
+        strings: List[str] = []
+        string_ids: Dict[str, int] = {}
+
+        def intern(value: str) -> int:
+            idx = string_ids.get(value)
+            if idx is None:
+                idx = len(strings)
+                string_ids[value] = idx
+                strings.append(value)
+            return idx
+
+        node_key, node_name, node_label = array("i"), array("i"), array("i")
+        node_age_min, node_age_max = array("i"), array("i")
+        alias_offsets, alias_strings = array("i", [0]), array("i")
+        node_index: Dict[str, int] = {}
+
+        with open(nodes_path, "r", encoding="utf-8") as f:
+            for row in csv.DictReader(f):
+                node_index[row["node_id"]] = len(node_key)
+                node_key.append(intern(row["node_id"]))
+                node_name.append(intern(row["name"]))
+                node_label.append(intern(row["label"]))
+                node_age_min.append(int(row["age_min"]) if row.get("age_min") else MISSING)
+                node_age_max.append(int(row["age_max"]) if row.get("age_max") else MISSING)
+                for alias in _parse_aliases(row.get("aliases_json")):
+                    alias_strings.append(intern(alias))
+                alias_offsets.append(len(alias_strings))
+
+        edge_head, edge_tail = array("i"), array("i")
+        edge_rel, edge_source = array("i"), array("i")
+
+        with open(edges_path, "r", encoding="utf-8") as f:
+            for row in csv.DictReader(f):
+                head = node_index.get(row["head_id"])
+                tail = node_index.get(row["tail_id"])
+                if head is None or tail is None:
+                    continue
+                edge_head.append(head)
+                edge_tail.append(tail)
+                edge_rel.append(intern(row["relation"]))
+                edge_source.append(intern(row["source_id"]) if row.get("source_id") else MISSING)
+
+        adj_offsets, adj_edges = _build_csr(len(node_key), edge_head, edge_tail)
+
+        columns = dict(
+            node_key=node_key, node_name=node_name, node_label=node_label,
+            node_age_min=node_age_min, node_age_max=node_age_max,
+            alias_offsets=alias_offsets, alias_strings=alias_strings,
+            edge_head=edge_head, edge_tail=edge_tail,
+            edge_rel=edge_rel, edge_source=edge_source,
+            adj_offsets=adj_offsets, adj_edges=adj_edges,
+        )
+        return cls(strings, node_index, None, columns)
+
+    def _build_surface_index(self) -> Dict[str, List[int]]:
+        """normalized name / alias -> node indexes"""
+        index: Dict[str, List[int]] = {}
+        for node in range(len(self.node_key)):
+            for form in [self.strings[self.node_name[node]]] + self.aliases(node):
+                nodes = index.setdefault(normalize(form.strip()), [])
+                if node not in nodes:
+                    nodes.append(node)
+        return index
+
+    def _build_age_products(self) -> List[int]:
+        """InsuranceProduct nodes with both age bounds, sorted by age_min"""
+        products = [
+            node for node in range(len(self.node_key))
+            if self.strings[self.node_label[node]] == "InsuranceProduct"
+            and self.node_age_min[node] != MISSING
+            and self.node_age_max[node] != MISSING
+        ]
+        products.sort(key=lambda n: (self.node_age_min[n], self.strings[self.node_key[n]]))
+        return products
+
+    def aliases(self, node: int) -> List[str]:
+        start, end = self.alias_offsets[node], self.alias_offsets[node + 1]
+        return [self.strings[i] for i in self.alias_strings[start:end]]
+
+    def node_record(self, node: int) -> Dict[str, Any]:
+        return {
+            "node_id": self.strings[self.node_key[node]],
+            "name": self.strings[self.node_name[node]],
+            "label": self.strings[self.node_label[node]],
+        }
+
+    def age_range_source(self, node: int) -> Optional[str]:
+        """source_id of the product's AGE_RANGE edge (else None)"""
+        for i in range(self.adj_offsets[node], self.adj_offsets[node + 1]):
+            edge = self.adj_edges[i]
+            if self.strings[self.edge_rel[edge]] == "AGE_RANGE":
+                source = self.edge_source[edge]
+                return self.strings[source] if source != MISSING else None
+        return None
+
+
+class SurfaceLexicon:
+    """
+    A snapshot's name/alias index, scanned in place by the gazetteer
+
+    Exact matching walks the sorted surface keys by binary search and
+    fuzzy matching reads the snapshot's gram postings, so linking needs
+    no automaton or fuzzy index built over the whole catalog at startup.
+    Payloads are {"node_id", "label"} records, as in the gazetteer.
+    """
+
+    def __init__(self, g: GraphState):
+        snapshot = g.snapshot
+        sections = snapshot.sections
+        self._g = g
+        self._index = snapshot.surface_index
+        surface_keys, fuzzy_forms = sections["surface_keys"], sections["fuzzy_forms"]
+        self.fuzzy = FuzzyIndex.from_arrays(
+            LazySequence(len(fuzzy_forms), lambda i: g.strings[surface_keys[fuzzy_forms[i]]]),
+            LazySequence(len(fuzzy_forms), lambda i: self._payload(self._index.value_at(fuzzy_forms[i]))),
+            sections["fuzzy_gram_counts"],
+            snapshot.gram_index,
+        )
+
+    def _payload(self, nodes: Sequence[int]) -> List[Dict[str, Any]]:
+        g = self._g
+        return [
+            {"node_id": g.strings[g.node_key[n]], "label": g.strings[g.node_label[n]]}
+            for n in nodes
+        ]
+
+    def get(self, form: str) -> List[Dict[str, Any]]:
+        """Nodes named by a normalized surface form"""
+        return self._payload(self._index.get(form, []))
+
+    def iter_matches(self, text: str) -> Iterator[Tuple[int, int, List[Dict[str, Any]]]]:
+        """(start, end, nodes) of every surface form (2+ characters) occurring in text"""
+        for start in range(len(text)):
+            for length, nodes in self._index.prefixes_of(text[start:]):
+                if length > 1:
+                    yield start, start + length, self._payload(nodes)
+
+    @cached_property
+    def fingerprint(self) -> str:
+        """Digest of everything linking reads (any string change counts)"""
+        digest = hashlib.blake2b()
+        for name in (
+            "string_offsets", "string_blob", "node_key", "node_label",
+            "surface_keys", "surface_offsets", "surface_nodes",
+        ):
+            digest.update(self._g.snapshot.sections[name])
+        return digest.hexdigest()
+
+    def __contains__(self, form: str) -> bool:
+        return form in self._index
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+
+class EmbeddedGraphStore:
+    """
+    In-process, read-only graph store built from nodes.csv / edges.csv
+
+    The graph lives in a GraphState. With a snapshot path (see
+    kg/scripts/build_snapshot.py) its arrays are memoryviews over a
+    read-only mmap instead of parsed CSVs, and the dict indexes become
+    binary searches over the snapshot's sorted keys. A reload builds a
+    complete new state off the event loop and publishes it by swapping
+    one reference; each call reads a single state throughout.
+    """
+
+    def __init__(self, nodes_path: str, edges_path: str, snapshot_path: Optional[str] = None):
+        self.nodes_path = nodes_path
+        self.edges_path = edges_path
+        self.snapshot_path = snapshot_path
+        self.state: Optional[GraphState] = None
+
+    @property
+    def loaded(self) -> bool:
+        return self.state is not None
+
+    async def connect(self):
+        """Load the graph into memory"""
+        await self.reload()
+
+    async def reload(self):
+        """Re-read the KG files; the old state serves requests until the swap"""
+        if self.snapshot_path:
+            state = await asyncio.to_thread(GraphState.from_snapshot, self.snapshot_path)
+        else:
+            state = await asyncio.to_thread(GraphState.from_csv, self.nodes_path, self.edges_path)
+        # The previous state (and snapshot mapping) is released once no request still uses it
+        self.state = state
+
+    async def close(self):
+        """Nothing to release"""
+
+    async def health_check(self) -> bool:
+        """The store is healthy once loaded"""
+        return self.loaded
+
+    async def find_nodes_by_name_or_alias(
+        self, mention: str, topk: int = 5
+    ) -> List[Dict[str, Any]]:
+        """Find nodes by name or alias"""
+        return await self.find_nodes_by_mentions(
+            [{"term": mention, "mention": mention}], topk=topk
+        )
+
+    async def find_nodes_by_mentions(
+        self, mentions: List[Dict[str, str]], topk: int = 5
+    ) -> List[Dict[str, Any]]:
+        """Resolve many mentions by name or alias (same contract as Neo4jClient)"""
+        g = self.state
+        if g is None:
+            return []
+        records = []
+        for m in mentions:
+            for node in g.surface_index.get(normalize(m["mention"].strip()), [])[:topk]:
+                records.append(dict(
+                    g.node_record(node),
+                    term=m["term"],
+                    mention=m["mention"],
+                    score=1.0,
+                ))
+        return records
+
+    def surface_lexicon(self) -> Optional[SurfaceLexicon]:
+        """The snapshot's name/alias index for the gazetteer (None without a snapshot)"""
+        g = self.state
+        if g is None or g.snapshot is None:
+            return None
+        return SurfaceLexicon(g)
+
+    async def fetch_entity_catalog(self) -> List[Dict[str, Any]]:
+        """Name, label and aliases of every node (for the gazetteer)"""
+        g = self.state
+        if g is None:
+            return []
+        return [
+            dict(g.node_record(node), aliases=g.aliases(node))
+            for node in range(len(g.node_key))
+        ]
+
+    async def find_products_by_age(self, age: int) -> Dict[str, Any]:
+        """Split products with an age range into those accepting age and the rest"""
+        g = self.state
+        if g is None:
+            return {"eligible": [], "ineligible": [], "cypher": ""}
+
+        sets = g.age_sets.get(age)
+        if sets is None:
+            # Only products starting at or below age can accept it
+            cut = bisect_right(g.age_products, age, key=lambda n: g.node_age_min[n])
+            sets = {"eligible": [], "ineligible": []}
+            for pos, node in enumerate(g.age_products):
+                eligible = pos < cut and g.node_age_max[node] >= age
+                sets["eligible" if eligible else "ineligible"].append(dict(
+                    node_id=g.strings[g.node_key[node]],
+                    name=g.strings[g.node_name[node]],
+                    age_min=g.node_age_min[node],
+                    age_max=g.node_age_max[node],
+                    source_id=g.age_range_source(node),
+                ))
+            g.age_sets[age] = sets
+
+        return dict(sets, cypher="")
+
+    async def find_product_edges(self, relation: str, tail_id: str) -> List[Dict[str, Any]]:
+        """Every (InsuranceProduct)-[relation]->(tail_id) edge as a triple"""
+        g = self.state
+        tail = g.node_index.get(tail_id) if g is not None else None
+        if tail is None:
+            return []
+
+        strings = g.strings
+        triples = []
+        for i in range(g.adj_offsets[tail], g.adj_offsets[tail + 1]):
+            edge = g.adj_edges[i]
+            head = g.edge_head[edge]
+            if (
+                g.edge_tail[edge] != tail
+                or strings[g.edge_rel[edge]] != relation
+                or strings[g.node_label[head]] != "InsuranceProduct"
+            ):
+                continue
+            source = g.edge_source[edge]
+            triples.append({
+                "head": strings[g.node_name[head]],
+                "relation": relation,
+                "tail": strings[g.node_name[tail]],
+                "source_id": strings[source] if source != MISSING else None,
+                "head_id": strings[g.node_key[head]],
+                "tail_id": tail_id,
+            })
+        triples.sort(key=lambda t: t["head_id"])
+        return triples
+
+    async def fetch_subgraph(
+        self,
+        node_ids: List[str],
+        hop: int = 2,
+        limit: int = 20,
+    ) -> List[Dict[str, Any]]:
+        """Fetch subgraph around given nodes"""
+        result = await self.expand_subgraph(node_ids, hop=hop, limit=limit)
+        return result["triples"]
+
+    async def expand_subgraph(
+        self,
+        node_ids: List[str],
+        hop: int = 2,
+        limit: int = 20,
+        fanout: Optional[int] = None,
+        relation_types: Optional[List[str]] = None,
+        progress: Optional[List[Dict[str, Any]]] = None,
+    ) -> Dict[str, Any]:
+        """k-hop subgraph around given nodes (see subgraph.expand_khop)"""
+        # Every hop reads the same state, even if a reload lands mid-expansion
+        g = self.state
+        node_ids = [n for n in node_ids if g is not None and n in g.node_index]
+        if not node_ids:
+            return {"triples": [], "nodes": [], "cypher": ""}
+
+        hop = max(1, min(hop, settings.SUBGRAPH_MAX_HOP))
+        fanout = fanout or settings.SUBGRAPH_RELATION_FANOUT
+
+        allowed = set(relation_types) if relation_types else None
+        result = await subgraph.expand_khop(
+            partial(_fetch_hop, g, allowed=allowed), node_ids,
+            hop=hop, limit=limit, fanout=fanout, progress=progress,
+        )
+        # Nothing ran against a database
+        result["cypher"] = ""
+        return result
+
+
+async def _fetch_hop(
+    g: GraphState, frontier: List[Dict[str, str]], fanout: int, allowed: Optional[set] = None
+) -> List[Dict[str, Any]]:
+    """One hop of expansion for every frontier node, read from the CSR arrays"""
+    strings = g.strings
+    rows = []
+    for f in frontier:
+        node = g.node_index[f["node_id"]]
+        per_relation: Dict[int, int] = {}
+        for i in range(g.adj_offsets[node], g.adj_offsets[node + 1]):
+            edge = g.adj_edges[i]
+            rel = g.edge_rel[edge]
+            if allowed is not None and strings[rel] not in allowed:
+                continue
+            if per_relation.get(rel, 0) >= fanout:
+                continue
+            per_relation[rel] = per_relation.get(rel, 0) + 1
+
+            head, tail = g.edge_head[edge], g.edge_tail[edge]
+            source = g.edge_source[edge]
+            rows.append({
+                "seed_id": f["seed"],
+                "from_id": f["node_id"],
+                "head": strings[g.node_name[head]],
+                "relation": strings[rel],
+                "tail": strings[g.node_name[tail]],
+                "source_id": strings[source] if source != MISSING else None,
+                "head_id": strings[g.node_key[head]],
+                "tail_id": strings[g.node_key[tail]],
+            })
+    return rows
+
+
+def _parse_aliases(aliases_json: Optional[str]) -> List[str]:
+    if not aliases_json:
+        return []
+    try:
+        aliases = json.loads(aliases_json)
+    except json.JSONDecodeError:
+        return []
+    return [a for a in aliases if isinstance(a, str)] if isinstance(aliases, list) else []
+
+
+def _build_csr(node_count: int, edge_head: array, edge_tail: array):
+    """
+    CSR of incident edges: edges of node n are adj_edges[adj_offsets[n]:adj_offsets[n + 1]]
+
+    Self loops (e.g. AGE_RANGE) are listed once.
+    """
+    degree = [0] * (node_count + 1)
+    for head, tail in zip(edge_head, edge_tail):
+        degree[head + 1] += 1
+        if tail != head:
+            degree[tail + 1] += 1
+
+    offsets = array("i", [0]) * (node_count + 1)
+    for n in range(node_count):
+        offsets[n + 1] = offsets[n] + degree[n + 1]
+
+    adj_edges = array("i", [0]) * offsets[node_count]
+    cursor = list(offsets[:node_count])
+    for edge, (head, tail) in enumerate(zip(edge_head, edge_tail)):
+        adj_edges[cursor[head]] = edge
+        cursor[head] += 1
+        if tail != head:
+            adj_edges[cursor[tail]] = edge
+            cursor[tail] += 1
+
+    return offsets, adj_edges
+
+
+def create_embedded_store() -> EmbeddedGraphStore:
+    """Embedded store for the configured KG files"""
+    return EmbeddedGraphStore(
+        resolve_path(settings.KG_NODES_FILE),
+        resolve_path(settings.KG_EDGES_FILE),
+        resolve_path(settings.KG_SNAPSHOT_PATH) if settings.KG_SNAPSHOT_PATH else None,
+    )
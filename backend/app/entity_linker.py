@@ -1,22 +1,16 @@
 import re
-import json
-import os
 from typing import List, Dict, Any, Optional
 
-from app.neo4j_client import neo4j_client
+from app.cache import qa_cache
+from app.config import settings
+from app.graph_store import graph_store
+from app.gazetteer import gazetteer
+from app.synonyms import synonym_index
 
-
-# Load synonyms
-def load_synonyms() -> Dict[str, List[str]]:
-    """Load synonyms from file"""
-    synonyms_path = os.path.join(os.path.dirname(__file__), "../../../data/synonyms/synonyms.json")
-    if os.path.exists(synonyms_path):
-        with open(synonyms_path, "r", encoding="utf-8") as f:
-            return json.load(f)
-    return {}
-
-
-SYNONYMS = load_synonyms()
+# Last entity catalog fetched (or snapshot lexicon), so synonym reloads can
+# rebuild the gazetteer
+_catalog: List[Dict[str, Any]] = []
+_lexicon: Optional[Any] = None
 
 
 def extract_age(question: str) -> Optional[int]:
@@ -29,15 +23,82 @@ def extract_age(question: str) -> Optional[int]:
 
 def expand_with_synonyms(mention: str) -> List[str]:
     """Expand mention with synonyms"""
-    mentions = [mention]
-    # Check if mention is a key
-    if mention in SYNONYMS:
-        mentions.extend(SYNONYMS[mention])
-    # Check if mention is a value
-    for key, values in SYNONYMS.items():
-        if mention in values:
-            mentions.append(key)
-    return mentions
+    return synonym_index.expand(mention)
+
+
+async def refresh_gazetteer() -> int:
+    """
+    Rebuild the gazetteer from the current KG and synonyms
+
+    Call after the KG is (re)loaded. A store with a prebuilt name index
+    (a KG snapshot) hands it over instead of the full entity catalog.
+    Returns the number of surface forms (0, and the gazetteer not ready,
+    if the KG has none).
+    """
+    global _catalog, _lexicon
+    _lexicon = graph_store.surface_lexicon()
+    _catalog = [] if _lexicon is not None else await graph_store.fetch_entity_catalog()
+    gazetteer.build(_catalog, synonym_index.groups, _lexicon)
+    return gazetteer.size
+
+
+def surface_fingerprint() -> Any:
+    """
+    Comparable summary of every node's names and aliases
+
+    node_id -> (name, aliases) of the current catalog, or the snapshot
+    lexicon's digest.
+    """
+    if _lexicon is not None:
+        return _lexicon.fingerprint
+    return {
+        e["node_id"]: (e.get("name") or "", tuple(e.get("aliases") or []))
+        for e in _catalog
+    }
+
+
+def _on_synonyms_reload() -> None:
+    """Rebuild the gazetteer with the new synonyms (same entity catalog) and drop cached links"""
+    if gazetteer.ready:
+        gazetteer.build(_catalog, synonym_index.groups, _lexicon)
+    qa_cache.invalidate()
+
+
+synonym_index.add_listener(_on_synonyms_reload)
+
+
+def _link_with_gazetteer(question: str) -> List[Dict[str, Any]]:
+    """
+    Link entities by scanning the question with the gazetteer
+
+    Exact mentions score 1.0; fuzzy matches (if enabled) follow with
+    their similarity score and match="fuzzy".
+    """
+    linked_entities = []
+    seen = set()
+
+    exact = gazetteer.find_mentions(question)
+    matches = [dict(m, score=1.0, match="exact") for m in exact]
+    if settings.FUZZY_LINKING_ENABLED:
+        fuzzy = gazetteer.find_fuzzy(
+            question, exact, topk=settings.FUZZY_TOPK, min_score=settings.FUZZY_MIN_SCORE
+        )
+        matches += [dict(m, match="fuzzy") for m in fuzzy]
+
+    for match in matches:
+        for node in match["nodes"]:
+            if node["node_id"] in seen:
+                continue
+            seen.add(node["node_id"])
+            linked_entities.append({
+                "mention": match["mention"],
+                "node_id": node["node_id"],
+                "label": node["label"],
+                "score": match["score"],
+                "match": match["match"],
+            })
+
+    return linked_entities
 
 
 async def link_entities(question: str) -> List[Dict[str, Any]]:
@@ -46,39 +107,49 @@ async def link_entities(question: str) -> List[Dict[str, Any]]:
 
     Returns list of linked entities with scores
     """
+    synonym_index.maybe_reload()
+
+    if gazetteer.ready:
+        return _link_with_gazetteer(question)
+
+    # Fallback until the gazetteer is built (e.g. the graph store was down at startup)
     # Extract key terms (simplified: split by common delimiters)
     # In production, use NLP for entity extraction
     terms = re.split(r"[，。、？?！!\s,]+", question)
     terms = [t.strip() for t in terms if t.strip() and len(t.strip()) > 1]
 
-    linked_entities = []
-
+    # Collect every (term, expansion) pair and resolve them in one query
+    candidates = []
+    seen = set()
     for term in terms:
-        # Expand with synonyms
-        expanded_terms = expand_with_synonyms(term)
-
-        for exp_term in expanded_terms:
-            # Query Neo4j
-            nodes = await neo4j_client.find_nodes_by_name_or_alias(exp_term, topk=5)
-
-            for node in nodes:
-                # Check if already in list
-                existing = next(
-                    (e for e in linked_entities if e["node_id"] == node["node_id"]),
-                    None,
-                )
-                if existing:
-                    # Update with higher score
-                    if node["score"] > existing["score"]:
-                        existing["score"] = node["score"]
-                        existing["mention"] = term
-                else:
-                    linked_entities.append({
-                        "mention": term,
-                        "node_id": node["node_id"],
-                        "label": node["label"],
-                        "score": node["score"],
-                    })
+        for exp_term in expand_with_synonyms(term):
+            if (term, exp_term) in seen:
+                continue
+            seen.add((term, exp_term))
+            candidates.append({"term": term, "mention": exp_term})
+
+    nodes = await graph_store.find_nodes_by_mentions(candidates, topk=5)
+
+    linked_entities = []
+    by_node_id: Dict[str, Dict[str, Any]] = {}
+
+    for node in nodes:
+        existing = by_node_id.get(node["node_id"])
+        if existing:
+            # Update with higher score
+            if node["score"] > existing["score"]:
+                existing["score"] = node["score"]
+                existing["mention"] = node["term"]
+        else:
+            entity = {
+                "mention": node["term"],
+                "node_id": node["node_id"],
+                "label": node["label"],
+                "score": node["score"],
+                "match": node.get("match", "exact"),
+            }
+            by_node_id[node["node_id"]] = entity
+            linked_entities.append(entity)
 
     # Sort by score descending
     linked_entities.sort(key=lambda x: x["score"], reverse=True)
@@ -0,0 +1,128 @@
+from typing import Any, Dict, List, Mapping, Sequence, Set, Tuple
+
+NGRAM_SIZES = (2, 3)
+# Grams in more than this share of forms (e.g. "保险") are too common to
+# generate candidates from; they are skipped unless the index is small
+MAX_DF_RATIO = 0.02
+MIN_MAX_DF = 200
+# Minimum share of a form's grams that must occur in the text
+MIN_CONTAINMENT = 0.2
+# Candidates verified with edit distance, best containment first
+VERIFY_POOL = 8
+
+
+def char_ngrams(text: str) -> Set[str]:
+    """Distinct character bi- and trigrams (the text itself if shorter)"""
+    grams = {text[i:i + n] for n in NGRAM_SIZES for i in range(len(text) - n + 1)}
+    return grams or ({text} if text else set())
+
+
+def substring_edit_distance(pattern: str, text: str) -> Tuple[int, int, int]:
+    """
+    Fewest edits turning pattern into some substring of text
+
+    Returns (distance, start, end) of the best-matching substring
+    (Sellers' algorithm: edit distance with a free start and end in text).
+    """
+    # Row over text positions: (cost, -start of the substring ending here);
+    # on equal cost the later start, i.e. the tighter substring, wins
+    prev = [(0, -j) for j in range(len(text) + 1)]
+    for i, p in enumerate(pattern, 1):
+        cur = [(i, 0)]
+        for j, t in enumerate(text, 1):
+            cur.append(min(
+                (prev[j - 1][0] + (p != t), prev[j - 1][1]),
+                (prev[j][0] + 1, prev[j][1]),
+                (cur[j - 1][0] + 1, cur[j - 1][1]),
+            ))
+        prev = cur
+    end = min(range(len(text) + 1), key=lambda j: (prev[j][0], -j))
+    return prev[end][0], -prev[end][1], end
+
+
+class FuzzyIndex:
+    """
+    Approximate lookup of surface forms inside a piece of text
+
+    Forms are indexed by their character bi/trigrams. A search counts,
+    over the inverted lists of the text's grams, how many of each form's
+    grams occur (skipping grams common to many forms), keeps forms whose
+    share of grams found passes MIN_CONTAINMENT, and scores the best few
+    by edit distance to their closest substring of the text:
+    1 - distance / len(form).
+    """
+
+    def __init__(self):
+        self.forms: List[str] = []
+        self.payloads: List[Any] = []
+        self._gram_counts: List[int] = []
+        self._postings: Dict[str, List[int]] = {}
+
+    @classmethod
+    def from_arrays(
+        cls,
+        forms: Sequence[str],
+        payloads: Sequence[Any],
+        gram_counts: Sequence[int],
+        postings: Mapping[str, Sequence[int]],
+    ) -> "FuzzyIndex":
+        """Search prebuilt postings (e.g. a KG snapshot's) in place; add() is not supported"""
+        index = cls()
+        index.forms, index.payloads = forms, payloads
+        index._gram_counts, index._postings = gram_counts, postings
+        return index
+
+    def add(self, form: str, payload: Any) -> None:
+        form_id = len(self.forms)
+        self.forms.append(form)
+        self.payloads.append(payload)
+        grams = char_ngrams(form)
+        self._gram_counts.append(len(grams))
+        for gram in grams:
+            self._postings.setdefault(gram, []).append(form_id)
+
+    def search(self, text: str, topk: int = 5, min_score: float = 0.7) -> List[Dict[str, Any]]:
+        """
+        Forms approximately contained in text, best first
+
+        Returns [{"form", "payload", "score", "start", "end"}], where
+        text[start:end] is the matched span.
+        """
+        max_df = max(MIN_MAX_DF, int(len(self.forms) * MAX_DF_RATIO))
+        shared: Dict[int, int] = {}
+        for gram in char_ngrams(text):
+            posting = self._postings.get(gram)
+            if posting is None or len(posting) > max_df:
+                continue
+            for form_id in posting:
+                shared[form_id] = shared.get(form_id, 0) + 1
+
+        candidates = sorted(
+            (
+                (count / self._gram_counts[form_id], form_id)
+                for form_id, count in shared.items()
+                if count >= MIN_CONTAINMENT * self._gram_counts[form_id]
+            ),
+            reverse=True,
+        )[:VERIFY_POOL]
+
+        results = []
+        for containment, form_id in candidates:
+            form = self.forms[form_id]
+            distance, start, end = substring_edit_distance(form, text)
+            score = 1.0 - distance / len(form)
+            if score >= min_score:
+                results.append({
+                    "form": form,
+                    "payload": self.payloads[form_id],
+                    "score": round(score, 4),
+                    "start": start,
+                    "end": end,
+                    "_rank": (score, containment),
+                })
+
+        results.sort(key=lambda r: r.pop("_rank"), reverse=True)
+        return results[:topk]
+
+    def __len__(self) -> int:
+        return len(self.forms)
@@ -0,0 +1,254 @@
+import re
+from collections import deque
+from typing import List, Dict, Any, Iterator, Optional, Sequence, Tuple
+
+from app.fuzzy_index import FuzzyIndex
+from app.synonyms import normalize
+
+# Shorter forms are left to exact matching: one changed character in a
+# 3-4 character name is often another entity (高血糖 vs 高血压)
+FUZZY_MIN_FORM_LENGTH = 5
+# Runs of letters/CJK that fuzzy matching searches within
+SEGMENT_PATTERN = re.compile(r"[^\W\d_]{2,}")
+
+
+class AhoCorasick:
+    """Multi-pattern string matcher (Aho–Corasick automaton)"""
+
+    def __init__(self):
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        # (pattern length, terminal state) of the patterns ending at each state
+        self._out: List[List[Tuple[int, int]]] = [[]]
+        self._payloads: Dict[int, Any] = {}
+        self._built = False
+
+    def add(self, pattern: str, payload: Any) -> None:
+        """Add a pattern with its payload (re-adding a pattern replaces the payload)"""
+        state = 0
+        for ch in pattern:
+            nxt = self._goto[state].get(ch)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[state][ch] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append([])
+            state = nxt
+
+        if state not in self._payloads:
+            self._out[state].append((len(pattern), state))
+        self._payloads[state] = payload
+        self._built = False
+
+    def build(self) -> None:
+        """Compute failure links (BFS over the trie)"""
+        queue = deque()
+        for nxt in self._goto[0].values():
+            self._fail[nxt] = 0
+            queue.append(nxt)
+
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in self._goto[state].items():
+                queue.append(nxt)
+                fail = self._fail[state]
+                while fail and ch not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[nxt] = self._goto[fail].get(ch, 0)
+                # Inherit outputs of the suffix state
+                self._out[nxt] = self._out[nxt] + self._out[self._fail[nxt]]
+
+        self._built = True
+
+    def iter_matches(self, text: str) -> Iterator[Tuple[int, int, Any]]:
+        """Yield (start, end, payload) for every pattern occurrence in text"""
+        if not self._built:
+            self.build()
+
+        state = 0
+        for i, ch in enumerate(text):
+            while state and ch not in self._goto[state]:
+                state = self._fail[state]
+            state = self._goto[state].get(ch, 0)
+            for length, terminal in self._out[state]:
+                yield i + 1 - length, i + 1, self._payloads[terminal]
+
+    def __len__(self) -> int:
+        return len(self._payloads)
+
+
+class Gazetteer:
+    """
+    In-process dictionary of every node name, alias and synonym
+
+    Finds all entity mentions in a raw question in one linear pass, so
+    unsegmented Chinese text ("70岁高血压能买XX护理险吗") links without
+    tokenisation and without querying Neo4j.
+
+    With a lexicon (a KG snapshot's name index, see
+    embedded_graph.SurfaceLexicon) only the synonym forms are held in
+    memory; every other form is matched in the lexicon in place.
+    """
+
+    def __init__(self):
+        self._automaton = AhoCorasick()
+        self._fuzzy = FuzzyIndex()
+        self._lexicon = None
+        # Forms the in-memory structures answer for (they shadow the lexicon's)
+        self._local_forms = frozenset()
+        self._size = 0
+        self.ready = False
+
+    def build(
+        self,
+        entities: List[Dict[str, Any]],
+        synonyms: Dict[str, List[str]],
+        lexicon: Optional[Any] = None,
+    ) -> None:
+        """
+        Rebuild the automaton
+
+        entities: records with node_id, name, label and aliases
+        synonyms: synonym groups as loaded from synonyms.json
+        lexicon: prebuilt name index used instead of entities
+
+        Without entities or lexicon forms (KG not loaded yet) the gazetteer
+        stays not ready, so linking keeps falling back to graph store lookups.
+        """
+        # Surface form -> nodes it names directly
+        surfaces: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        for e in entities:
+            node = {"node_id": e["node_id"], "label": e.get("label") or ""}
+            for form in [e.get("name")] + list(e.get("aliases") or []):
+                if form:
+                    surfaces.setdefault(normalize(form.strip()), {})[node["node_id"]] = node
+        if lexicon is not None:
+            for key, values in synonyms.items():
+                for form in [key] + list(values):
+                    form = normalize(form.strip())
+                    nodes = lexicon.get(form)
+                    if nodes:
+                        surfaces[form] = {n["node_id"]: n for n in nodes}
+
+        # Like SynonymIndex: a key also resolves to its values' nodes and each
+        # value to the key's, but sibling values do not resolve to each other
+        direct = {form: dict(nodes) for form, nodes in surfaces.items()}
+        for key, values in synonyms.items():
+            key_form = normalize(key.strip())
+            for value in values:
+                value_form = normalize(value.strip())
+                key_nodes = direct.get(key_form, {})
+                value_nodes = direct.get(value_form, {})
+                if value_nodes:
+                    surfaces.setdefault(key_form, {}).update(value_nodes)
+                if key_nodes:
+                    surfaces.setdefault(value_form, {}).update(key_nodes)
+
+        automaton = AhoCorasick()
+        fuzzy = FuzzyIndex()
+        local_forms = set()
+        for form, nodes in surfaces.items():
+            if len(form) > 1 and nodes:
+                automaton.add(form, list(nodes.values()))
+                if lexicon is not None:
+                    local_forms.add(form)
+            if len(form) >= FUZZY_MIN_FORM_LENGTH and nodes:
+                fuzzy.add(form, list(nodes.values()))
+        automaton.build()
+
+        size = len(automaton)
+        if lexicon is not None:
+            size += len(lexicon) - sum(form in lexicon for form in local_forms)
+
+        self._automaton = automaton
+        self._fuzzy = fuzzy
+        self._lexicon = lexicon
+        self._local_forms = frozenset(local_forms)
+        self._size = size
+        self.ready = bool(entities) or bool(lexicon)
+
+    def find_mentions(self, text: str) -> List[Dict[str, Any]]:
+        """
+        Find entity mentions in text
+
+        Overlapping matches are resolved leftmost-longest, so "XX护理险"
+        wins over the "护理险" and "护理" inside it.
+        """
+        normalized = normalize(text)
+        source = text if len(normalized) == len(text) else normalized
+
+        matches = list(self._automaton.iter_matches(normalized))
+        if self._lexicon is not None:
+            matches += [
+                m for m in self._lexicon.iter_matches(normalized)
+                if normalized[m[0]:m[1]] not in self._local_forms
+            ]
+        matches.sort(key=lambda m: (m[0], -(m[1] - m[0])))
+
+        mentions = []
+        covered_until = 0
+        for start, end, nodes in matches:
+            if start < covered_until:
+                continue
+            mentions.append({
+                "mention": source[start:end],
+                "start": start,
+                "end": end,
+                "nodes": nodes,
+            })
+            covered_until = end
+
+        return mentions
+
+    def find_fuzzy(
+        self,
+        text: str,
+        exact: Sequence[Dict[str, Any]] = (),
+        topk: int = 3,
+        min_score: float = 0.75,
+    ) -> List[Dict[str, Any]]:
+        """
+        Find approximate entity mentions in text, best score first
+
+        Catches typos and near-miss names ("长期护里保险") that exact
+        matching misses. Matches falling inside one of the ``exact``
+        mentions (as returned by find_mentions) are dropped. Each match
+        carries score = 1 - edits / len(form).
+        """
+        normalized = normalize(text)
+        source = text if len(normalized) == len(text) else normalized
+        spans = [(m["start"], m["end"]) for m in exact]
+
+        mentions = []
+        for segment in SEGMENT_PATTERN.finditer(normalized):
+            offset = segment.start()
+            hits = self._fuzzy.search(segment.group(), topk, min_score)
+            if self._lexicon is not None:
+                hits += [
+                    hit for hit in self._lexicon.fuzzy.search(segment.group(), topk, min_score)
+                    if hit["form"] not in self._local_forms
+                ]
+                hits = sorted(hits, key=lambda hit: hit["score"], reverse=True)[:topk]
+            for hit in hits:
+                start, end = offset + hit["start"], offset + hit["end"]
+                if any(s <= start and end <= e for s, e in spans):
+                    continue
+                mentions.append({
+                    "mention": source[start:end],
+                    "start": start,
+                    "end": end,
+                    "nodes": hit["payload"],
+                    "score": hit["score"],
+                })
+
+        mentions.sort(key=lambda m: m["score"], reverse=True)
+        return mentions
+
+    @property
+    def size(self) -> int:
+        """Number of surface forms (in the automaton and the lexicon)"""
+        return self._size
+
+
+gazetteer = Gazetteer()
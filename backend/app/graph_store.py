@@ -0,0 +1,53 @@
+from typing import List, Optional, Dict, Any, Protocol
+
+from app.config import settings
+from app.neo4j_client import neo4j_client
+from app.embedded_graph import create_embedded_store
+
+
+class GraphStore(Protocol):
+    """
+    Read interface the retrieval pipeline needs from the KG
+
+    Implemented by Neo4jClient (GRAPH_BACKEND=neo4j) and
+    EmbeddedGraphStore (GRAPH_BACKEND=embedded).
+    """
+
+    async def connect(self): ...
+
+    async def close(self): ...
+
+    async def reload(self): ...
+
+    async def health_check(self) -> bool: ...
+
+    async def find_nodes_by_mentions(
+        self, mentions: List[Dict[str, str]], topk: int = 5
+    ) -> List[Dict[str, Any]]: ...
+
+    def surface_lexicon(self) -> Optional[Any]: ...
+
+    async def fetch_entity_catalog(self) -> List[Dict[str, Any]]: ...
+
+    async def find_products_by_age(self, age: int) -> Dict[str, Any]: ...
+
+    async def find_product_edges(self, relation: str, tail_id: str) -> List[Dict[str, Any]]: ...
+
+    async def expand_subgraph(
+        self,
+        node_ids: List[str],
+        hop: int = 2,
+        limit: int = 20,
+        fanout: Optional[int] = None,
+        relation_types: Optional[List[str]] = None,
+        progress: Optional[List[Dict[str, Any]]] = None,
+    ) -> Dict[str, Any]: ...
+
+
+def _make_graph_store(kind: str) -> GraphStore:
+    if kind == "embedded":
+        return create_embedded_store()
+    return neo4j_client
+
+
+graph_store: GraphStore = _make_graph_store(settings.GRAPH_BACKEND)
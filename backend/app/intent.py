@@ -0,0 +1,167 @@
+import json
+import os
+import re
+from typing import List, Dict, Any, Optional, Tuple
+
+from app.config import settings, resolve_path
+from app.synonyms import normalize
+
+# Keyword rules, first match wins (categories as in docs/eval_questions.json)
+INTENT_RULES: List[Tuple[str, "re.Pattern[str]"]] = [
+    ("waiting_period", re.compile(r"等待期")),
+    ("exclusion_query", re.compile(r"排除|除外|免责|不保")),
+    ("drug_query", re.compile(r"药|治疗")),
+    ("service_eligibility", re.compile(r"申请.*护理|护理.*申请")),
+    ("location_service", re.compile(r"在[^\s，。？?]{2,4}有哪些服务")),
+    ("elder_care", re.compile(r"(?:养老院|护理中心|社区|机构).*服务")),
+    ("service_query", re.compile(r"服务")),
+    ("age_limit", re.compile(r"\d+\s*岁.*(?:买|投保)")),
+    ("coverage_query", re.compile(r"哪些(?:产品|保险).*(?:覆盖|承保)")),
+    ("coverage", re.compile(r"承保|覆盖|保障|能买|可以买|投保")),
+    ("product_query", re.compile(r"哪些.*(?:险|产品)|(?:险|产品)有哪些")),
+]
+
+# Retrieval template per intent: the relation types worth reading and how
+# far to expand. Intents without a template use the full expansion.
+INTENT_TEMPLATES: Dict[str, Dict[str, Any]] = {
+    "age_limit": {"relation_types": ["AGE_RANGE", "EXCLUDES", "COVERS"], "max_hop": 1},
+    "product_query": {"relation_types": ["AGE_RANGE", "COVERS", "EXCLUDES"], "max_hop": 1},
+    "coverage": {"relation_types": ["COVERS", "EXCLUDES", "AGE_RANGE"], "max_hop": 1},
+    "coverage_query": {"relation_types": ["COVERS"], "max_hop": 1},
+    "exclusion_query": {"relation_types": ["EXCLUDES"], "max_hop": 1},
+    "drug_query": {"relation_types": ["TREATS"], "max_hop": 1},
+    "service_query": {"relation_types": ["PROVIDES"], "max_hop": 1},
+    "elder_care": {"relation_types": ["PROVIDES"], "max_hop": 1},
+    "location_service": {"relation_types": ["PROVIDES"], "max_hop": 1},
+    "service_eligibility": {"relation_types": ["COVERS", "EXCLUDES", "PROVIDES"], "max_hop": 1},
+}
+
+NGRAM_SIZES = (1, 2, 3)
+TRAINING_EPOCHS = 10
+# Minimum score gap between the best and second-best intent for the model
+# to be trusted
+MODEL_MIN_MARGIN = 1.0
+
+
+def char_ngrams(text: str) -> List[str]:
+    """Character 1-3 grams of normalized text, digits folded to 0"""
+    text = re.sub(r"\d+", "0", normalize(text))
+    text = re.sub(r"[\s，。、？?！!,.]+", "", text)
+    return [
+        text[i:i + n]
+        for n in NGRAM_SIZES
+        for i in range(len(text) - n + 1)
+    ]
+
+
+class IntentModel:
+    """Averaged multi-class perceptron over character n-grams"""
+
+    def __init__(self):
+        self.weights: Dict[str, Dict[str, float]] = {}
+        self.labels: List[str] = []
+
+    def train(self, examples: List[Tuple[str, str]], epochs: int = TRAINING_EPOCHS) -> None:
+        self.labels = sorted({label for _, label in examples})
+        weights: Dict[str, Dict[str, float]] = {}
+        totals: Dict[str, Dict[str, float]] = {}
+        stamps: Dict[Tuple[str, str], int] = {}
+        step = 0
+
+        def update(feature: str, label: str, delta: float) -> None:
+            # Lazy averaging: add the weight held since its last change
+            w = weights.setdefault(feature, {})
+            t = totals.setdefault(feature, {})
+            t[label] = t.get(label, 0.0) + (step - stamps.get((feature, label), 0)) * w.get(label, 0.0)
+            stamps[(feature, label)] = step
+            w[label] = w.get(label, 0.0) + delta
+
+        featurized = [(char_ngrams(text), label) for text, label in examples]
+        for _ in range(epochs):
+            for features, label in featurized:
+                step += 1
+                predicted = self._best(weights, features)[0]
+                if predicted != label:
+                    for f in features:
+                        update(f, label, 1.0)
+                        if predicted is not None:
+                            update(f, predicted, -1.0)
+
+        for feature, w in weights.items():
+            for label in w:
+                update(feature, label, 0.0)
+        self.weights = {
+            feature: {label: total / step for label, total in t.items()}
+            for feature, t in totals.items()
+        }
+
+    def _best(self, weights: Dict[str, Dict[str, float]], features: List[str]) -> Tuple[Optional[str], float]:
+        scores = {label: 0.0 for label in self.labels}
+        for f in features:
+            for label, w in weights.get(f, {}).items():
+                scores[label] += w
+        ranked = sorted(scores.items(), key=lambda x: x[1], reverse=True)
+        if not ranked or ranked[0][1] <= 0:
+            return None, 0.0
+        margin = ranked[0][1] - (ranked[1][1] if len(ranked) > 1 else 0.0)
+        return ranked[0][0], margin
+
+    def predict(self, text: str) -> Tuple[Optional[str], float]:
+        """(intent, margin over the runner-up); intent is None if nothing scores"""
+        return self._best(self.weights, char_ngrams(text))
+
+
+class IntentClassifier:
+    """
+    Keyword rules, backed by an optional perceptron for questions no rule
+    matches
+
+    The model is trained at startup from a JSON list of
+    {"question", "category"} (the format of docs/eval_questions.json) when
+    INTENT_TRAINING_FILE is set.
+    """
+
+    def __init__(self, training_file: Optional[str] = None):
+        self.model: Optional[IntentModel] = None
+        if training_file and os.path.exists(training_file):
+            with open(training_file, "r", encoding="utf-8") as f:
+                examples = [
+                    (q["question"], q["category"])
+                    for q in json.load(f)
+                    if q.get("question") and q.get("category")
+                ]
+            if examples:
+                self.model = IntentModel()
+                self.model.train(examples)
+
+    def classify(self, question: str) -> Dict[str, Any]:
+        """
+        Intent of a question and its retrieval template
+
+        Returns {"intent", "source" (rules | model | default),
+        "relation_types", "max_hop"}; relation_types/max_hop are None
+        when the intent has no template.
+        """
+        intent, source = None, "default"
+        for name, pattern in INTENT_RULES:
+            if pattern.search(question):
+                intent, source = name, "rules"
+                break
+
+        if intent is None and self.model is not None:
+            predicted, margin = self.model.predict(question)
+            if predicted is not None and margin >= MODEL_MIN_MARGIN:
+                intent, source = predicted, "model"
+
+        template = INTENT_TEMPLATES.get(intent, {})
+        return {
+            "intent": intent,
+            "source": source,
+            "relation_types": template.get("relation_types"),
+            "max_hop": template.get("max_hop"),
+        }
+
+
+intent_classifier = IntentClassifier(
+    resolve_path(settings.INTENT_TRAINING_FILE) if settings.INTENT_TRAINING_FILE else None
+)
@@ -0,0 +1,178 @@
+import mmap
+import struct
+from bisect import bisect_left
+from typing import Any, Callable, Dict, Iterator, Optional, Tuple
+
+# Must match kg/scripts/build_snapshot.py
+MAGIC = b"KGSNAP\x00\x00"
+VERSION = 2
+BYTE_ORDER_MARK = 0x01020304
+
+SECTIONS = (
+    "string_offsets", "string_blob",
+    "node_key", "node_name", "node_label", "node_age_min", "node_age_max",
+    "alias_offsets", "alias_strings",
+    "edge_head", "edge_tail", "edge_rel", "edge_source",
+    "adj_offsets", "adj_edges",
+    "node_order",
+    "surface_keys", "surface_offsets", "surface_nodes",
+    "age_products",
+    "fuzzy_forms", "fuzzy_gram_counts", "gram_keys", "gram_offsets", "gram_forms",
+)
+
+HEADER = struct.Struct("=8sIII")
+SECTION_ENTRY = struct.Struct("=QQ")
+
+
+class SnapshotError(Exception):
+    """The file is not a readable KG snapshot"""
+
+
+class StringTable:
+    """
+    Strings decoded on access from the snapshot's UTF-8 blob
+
+    Nothing is memoized: strings are short, and a cache would grow into a
+    private copy of every string the process ever touched.
+    """
+
+    def __init__(self, offsets: memoryview, blob: memoryview):
+        self._offsets = offsets
+        self._blob = blob
+
+    def __getitem__(self, i: int) -> str:
+        return str(self._blob[self._offsets[i]:self._offsets[i + 1]], "utf-8")
+
+    def __len__(self) -> int:
+        return len(self._offsets) - 1
+
+
+class LazySequence:
+    """Read-only sequence whose items are computed on access"""
+
+    def __init__(self, size: int, item_at: Callable[[int], Any]):
+        self._size = size
+        self._item_at = item_at
+
+    def __getitem__(self, i: int) -> Any:
+        if not 0 <= i < self._size:
+            raise IndexError(i)
+        return self._item_at(i)
+
+    def __len__(self) -> int:
+        return self._size
+
+
+class SortedIndex:
+    """Read-only mapping over sorted keys, looked up by binary search"""
+
+    def __init__(self, size: int, key_at: Callable[[int], str], value_at: Callable[[int], Any]):
+        self._size = size
+        self._key_at = key_at
+        self._value_at = value_at
+
+    def value_at(self, i: int) -> Any:
+        """Value of the i-th key in sorted order"""
+        return self._value_at(i)
+
+    def _find(self, key: str) -> Optional[int]:
+        i = bisect_left(range(self._size), key, key=self._key_at)
+        if i < self._size and self._key_at(i) == key:
+            return i
+        return None
+
+    def get(self, key: str, default: Any = None) -> Any:
+        i = self._find(key)
+        return default if i is None else self._value_at(i)
+
+    def __getitem__(self, key: str) -> Any:
+        i = self._find(key)
+        if i is None:
+            raise KeyError(key)
+        return self._value_at(i)
+
+    def __contains__(self, key: str) -> bool:
+        return self._find(key) is not None
+
+    def prefixes_of(self, text: str) -> Iterator[Tuple[int, Any]]:
+        """(length, value) of every key that is a prefix of text, shortest first"""
+        lo = 0
+        for end in range(1, len(text) + 1):
+            prefix = text[:end]
+            # Keys starting with prefix are contiguous from its insertion point
+            lo = bisect_left(range(self._size), prefix, lo, key=self._key_at)
+            if lo == self._size:
+                return
+            key = self._key_at(lo)
+            if not key.startswith(prefix):
+                return
+            if key == prefix:
+                yield end, self._value_at(lo)
+
+    def __len__(self) -> int:
+        return self._size
+
+
+class KGSnapshot:
+    """
+    A snapshot file mapped read-only
+
+    Arrays are int32 memoryviews straight over the mapping and the
+    indexes are binary searches over them, so opening is O(1) and pages
+    are shared by every process mapping the same file.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self.sections = self._read_sections(memoryview(self._mmap))
+
+        s = self.sections
+        self.strings = StringTable(s["string_offsets"], s["string_blob"])
+        strings, node_key = self.strings, s["node_key"]
+        node_order = s["node_order"]
+        surface_keys, surface_offsets = s["surface_keys"], s["surface_offsets"]
+        surface_nodes = s["surface_nodes"]
+
+        # node_id -> node index
+        self.node_index = SortedIndex(
+            len(node_order),
+            lambda i: strings[node_key[node_order[i]]],
+            lambda i: node_order[i],
+        )
+        # normalized name / alias -> node indexes
+        self.surface_index = SortedIndex(
+            len(surface_keys),
+            lambda i: strings[surface_keys[i]],
+            lambda i: surface_nodes[surface_offsets[i]:surface_offsets[i + 1]],
+        )
+        # character bi/trigram -> fuzzy form ids (see fuzzy_index.FuzzyIndex)
+        gram_keys, gram_offsets, gram_forms = s["gram_keys"], s["gram_offsets"], s["gram_forms"]
+        self.gram_index = SortedIndex(
+            len(gram_keys),
+            lambda i: strings[gram_keys[i]],
+            lambda i: gram_forms[gram_offsets[i]:gram_offsets[i + 1]],
+        )
+
+    def _read_sections(self, buf: memoryview) -> Dict[str, memoryview]:
+        if len(buf) < HEADER.size:
+            raise SnapshotError(f"{self.path}: file too small")
+        magic, version, bom, count = HEADER.unpack_from(buf)
+        if magic != MAGIC:
+            raise SnapshotError(f"{self.path}: not a KG snapshot")
+        if version != VERSION:
+            raise SnapshotError(f"{self.path}: snapshot version {version}, expected {VERSION}")
+        if bom != BYTE_ORDER_MARK:
+            raise SnapshotError(f"{self.path}: written on a machine with another byte order")
+        if count != len(SECTIONS):
+            raise SnapshotError(f"{self.path}: {count} sections, expected {len(SECTIONS)}")
+
+        sections = {}
+        for n, name in enumerate(SECTIONS):
+            offset, length = SECTION_ENTRY.unpack_from(buf, HEADER.size + n * SECTION_ENTRY.size)
+            if offset + length > len(buf):
+                raise SnapshotError(f"{self.path}: section {name} is truncated")
+            data = buf[offset:offset + length]
+            sections[name] = data if name == "string_blob" else data.cast("i")
+        return sections
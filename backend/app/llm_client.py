@@ -1,44 +1,104 @@
-from typing import Optional
-import requests
+import asyncio
+import json
+import random
+from typing import Optional, Dict, Any, AsyncIterator
+
+import httpx
 
 from app.config import settings
 
+# Responses worth retrying (rate limited / transient server errors)
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+MOCK_ANSWER = "根据提供的证据信息，无法明确判断。请补充更多相关证据。"
+# Characters per chunk when the mock provider streams
+MOCK_STREAM_CHUNK_SIZE = 4
+
+
+class LLMError(Exception):
+    """The provider failed (error status or connection error)"""
+
 
 class LLMClient:
     def __init__(self):
         self.provider = settings.LLM_PROVIDER
         self.api_key = settings.LLM_API_KEY
         self.model = settings.LLM_MODEL
+        self.base_url = settings.LLM_BASE_URL.rstrip("/")
+        self.max_retries = settings.LLM_MAX_RETRIES
+        self._http: Optional[httpx.AsyncClient] = None
+        # Bounds in-flight provider calls across all requests
+        self._semaphore = asyncio.Semaphore(settings.LLM_MAX_CONCURRENCY)
+
+    def _client(self) -> httpx.AsyncClient:
+        """Shared pooled HTTP client (created on first use)"""
+        if self._http is None:
+            self._http = httpx.AsyncClient(
+                base_url=self.base_url,
+                headers={
+                    "Authorization": f"Bearer {self.api_key}",
+                    "Content-Type": "application/json",
+                },
+                timeout=httpx.Timeout(
+                    settings.LLM_TIMEOUT, connect=settings.LLM_CONNECT_TIMEOUT
+                ),
+                limits=httpx.Limits(
+                    max_connections=settings.LLM_MAX_CONCURRENCY,
+                    max_keepalive_connections=settings.LLM_MAX_CONCURRENCY,
+                ),
+            )
+        return self._http
+
+    async def close(self):
+        """Close pooled connections"""
+        if self._http is not None:
+            await self._http.aclose()
+            self._http = None
 
     async def generate(self, prompt: str) -> str:
         """Generate response from LLM"""
         if self.provider == "mock":
             return self._mock_generate(prompt)
         elif self.provider == "openai_compatible":
-            return self._openai_compatible_generate(prompt)
+            return await self._openai_compatible_generate(prompt)
         else:
             return self._mock_generate(prompt)
 
+    async def generate_stream(self, prompt: str) -> AsyncIterator[str]:
+        """
+        Generate response from LLM, yielding text chunks as they arrive
+
+        Raises LLMError if the provider fails, also after some chunks were
+        yielded, so a truncated answer is never mistaken for a whole one.
+        """
+        if self.provider == "openai_compatible":
+            stream = self._openai_compatible_stream(prompt)
+        else:
+            stream = self._mock_stream(prompt)
+        async for chunk in stream:
+            yield chunk
+
     def _mock_generate(self, prompt: str) -> str:
         """Mock LLM for testing"""
         # Return a simple template response for MVP
-        return "根据提供的证据信息，无法明确判断。请补充更多相关证据。"
+        return MOCK_ANSWER
+
+    async def _mock_stream(self, prompt: str) -> AsyncIterator[str]:
+        """Mock LLM streaming the template answer chunk by chunk"""
+        answer = self._mock_generate(prompt)
+        for i in range(0, len(answer), MOCK_STREAM_CHUNK_SIZE):
+            await asyncio.sleep(0)
+            yield answer[i:i + MOCK_STREAM_CHUNK_SIZE]
 
-    def _openai_compatible_generate(self, prompt: str) -> str:
+    async def _openai_compatible_generate(self, prompt: str) -> str:
         """OpenAI compatible API call"""
-        # This is a generic implementation - adjust based on actual API
         try:
-            response = requests.post(
-                "https://api.openai.com/v1/chat/completions",
-                headers={
-                    "Authorization": f"Bearer {self.api_key}",
-                    "Content-Type": "application/json",
-                },
-                json={
+            response = await self._post_with_retry(
+                "/chat/completions",
+                {
                     "model": self.model,
                     "messages": [{"role": "user", "content": prompt}],
                 },
-                timeout=30,
             )
             if response.status_code == 200:
                 return response.json()["choices"][0]["message"]["content"]
@@ -47,5 +107,90 @@ class LLMClient:
         except Exception as e:
             return f"Error: {str(e)}"
 
+    async def _openai_compatible_stream(self, prompt: str) -> AsyncIterator[str]:
+        """
+        OpenAI compatible streaming call (server-sent events)
+
+        Retries like _post_with_retry, but only until the first token has
+        been yielded.
+        """
+        payload = {
+            "model": self.model,
+            "messages": [{"role": "user", "content": prompt}],
+            "stream": True,
+        }
+
+        started = False
+        async with self._semaphore:
+            for attempt in range(self.max_retries + 1):
+                last_attempt = attempt == self.max_retries
+                retry_after = None
+                try:
+                    async with self._client().stream(
+                        "POST", "/chat/completions", json=payload
+                    ) as response:
+                        if response.status_code in RETRY_STATUS_CODES and not last_attempt:
+                            retry_after = response.headers.get("Retry-After")
+                        elif response.status_code != 200:
+                            raise LLMError(f"LLM returned status {response.status_code}")
+                        else:
+                            async for chunk in self._iter_sse_content(response):
+                                started = True
+                                yield chunk
+                            return
+                except httpx.TransportError as e:
+                    if last_attempt or started:
+                        raise LLMError(f"LLM connection failed: {e}") from e
+                await asyncio.sleep(self._backoff(attempt, retry_after))
+
+    @staticmethod
+    async def _iter_sse_content(response: httpx.Response) -> AsyncIterator[str]:
+        """Content deltas from an OpenAI-style SSE stream"""
+        async for line in response.aiter_lines():
+            if not line.startswith("data:"):
+                continue
+            data = line[len("data:"):].strip()
+            if data == "[DONE]":
+                return
+            try:
+                delta = json.loads(data)["choices"][0].get("delta", {})
+            except (ValueError, KeyError, IndexError):
+                continue
+            if delta.get("content"):
+                yield delta["content"]
+
+    async def _post_with_retry(self, path: str, payload: Dict[str, Any]) -> httpx.Response:
+        """
+        POST with retry on 429/5xx and transport errors
+
+        Backoff is exponential with full jitter and honours Retry-After.
+        Cancellation (e.g. the client disconnected) propagates immediately.
+        """
+        async with self._semaphore:
+            for attempt in range(self.max_retries + 1):
+                last_attempt = attempt == self.max_retries
+                try:
+                    response = await self._client().post(path, json=payload)
+                except httpx.TransportError:
+                    if last_attempt:
+                        raise
+                    await asyncio.sleep(self._backoff(attempt))
+                    continue
+
+                if response.status_code not in RETRY_STATUS_CODES or last_attempt:
+                    return response
+                await asyncio.sleep(self._backoff(attempt, response.headers.get("Retry-After")))
+
+    @staticmethod
+    def _backoff(attempt: int, retry_after: Optional[str] = None) -> float:
+        """Seconds to wait before the next attempt"""
+        if retry_after:
+            try:
+                return min(float(retry_after), settings.LLM_RETRY_MAX_BACKOFF)
+            except ValueError:
+                pass
+        ceiling = min(settings.LLM_RETRY_BACKOFF * (2 ** attempt), settings.LLM_RETRY_MAX_BACKOFF)
+        return random.uniform(0, ceiling)
+
 
 llm_client = LLMClient()
@@ -1,20 +1,196 @@
 import os
 import json
+import gzip
+import shutil
+import asyncio
 from datetime import datetime
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional
 
-from app.config import settings
+from app.config import settings, resolve_path
+from app import metrics
+
+LOG_FILE_NAME = "qa_logs.jsonl"
+
+_log_dir: Optional[str] = None
 
 
 def get_log_dir() -> str:
-    """Get log directory"""
-    log_dir = settings.LOG_DIR
-    if not os.path.isabs(log_dir):
-        # Relative to project root
-        log_dir = os.path.join(os.path.dirname(__file__), "../../../", log_dir)
+    """Get log directory (created on first call)"""
+    global _log_dir
+    if _log_dir is None:
+        log_dir = resolve_path(settings.LOG_DIR)
+        os.makedirs(log_dir, exist_ok=True)
+        _log_dir = log_dir
+    return _log_dir
+
+
+class QALogWriter:
+    """
+    Buffered, non-blocking writer for qa_logs.jsonl
+
+    Requests only enqueue the record. A background task drains the queue
+    in batches (flushed on QA_LOG_BATCH_SIZE or every QA_LOG_FLUSH_INTERVAL
+    seconds) and serialises/writes them in a worker thread. The active file
+    is rotated when it exceeds QA_LOG_MAX_BYTES or the date changes;
+    rotated segments are optionally gzipped. When the queue is full new
+    records are dropped and counted rather than blocking the request.
+    """
+
+    def __init__(
+        self,
+        max_queue: int = 10000,
+        batch_size: int = 100,
+        flush_interval: float = 1.0,
+        max_bytes: int = 100 * 1024 * 1024,
+        gzip_rotated: bool = False,
+    ):
+        self.max_queue = max_queue
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_bytes = max_bytes
+        self.gzip_rotated = gzip_rotated
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._file_date: Optional[str] = None
+        self.written = 0
+        self.dropped = 0
+        self.batches = 0
+        self.rotations = 0
+        self.write_errors = 0
+        self.queue_high_water = 0
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self) -> None:
+        """Start the background writer (call from the running event loop)"""
+        if self.running:
+            return
+        self._queue = asyncio.Queue(maxsize=self.max_queue)
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Flush everything still queued and stop the writer"""
+        if not self.running:
+            return
+        await self._queue.put(None)
+        await self._task
+        self._task = None
+
+    def submit(self, record: Dict[str, Any]) -> bool:
+        """Enqueue a record; returns False if it was dropped"""
+        try:
+            self._queue.put_nowait(record)
+        except asyncio.QueueFull:
+            self.dropped += 1
+            return False
+        self.queue_high_water = max(self.queue_high_water, self._queue.qsize())
+        return True
+
+    async def _run(self) -> None:
+        stopping = False
+        while not stopping:
+            batch = []
+            try:
+                item = await asyncio.wait_for(self._queue.get(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                continue
+
+            # Gather up to batch_size records, waiting at most flush_interval
+            loop = asyncio.get_running_loop()
+            deadline = loop.time() + self.flush_interval
+            while True:
+                if item is None:
+                    stopping = True
+                else:
+                    batch.append(item)
+                if stopping or len(batch) >= self.batch_size:
+                    break
+                try:
+                    item = self._queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    remaining = deadline - loop.time()
+                    if remaining <= 0:
+                        break
+                    try:
+                        item = await asyncio.wait_for(self._queue.get(), timeout=remaining)
+                    except asyncio.TimeoutError:
+                        break
+
+            if stopping:
+                # Drain whatever arrived before shutdown
+                while not self._queue.empty():
+                    item = self._queue.get_nowait()
+                    if item is not None:
+                        batch.append(item)
+
+            if batch:
+                try:
+                    await asyncio.to_thread(self.write_batch, batch)
+                except Exception:
+                    self.write_errors += 1
+
+    def write_batch(self, batch: List[Dict[str, Any]]) -> None:
+        """Serialise and append records, rotating first if needed (blocking)"""
+        with metrics.timed("log_write"):
+            data = "".join(json.dumps(r, ensure_ascii=False) + "\n" for r in batch)
+            log_file = os.path.join(get_log_dir(), LOG_FILE_NAME)
+            self._rotate_if_needed(log_file, len(data.encode("utf-8")))
+
+            with open(log_file, "a", encoding="utf-8") as f:
+                f.write(data)
+
+        self.written += len(batch)
+        self.batches += 1
+
+    def _rotate_if_needed(self, log_file: str, incoming: int) -> None:
+        today = datetime.now().strftime("%Y%m%d")
+        if not os.path.exists(log_file):
+            self._file_date = today
+            return
+        if self._file_date is None:
+            self._file_date = datetime.fromtimestamp(os.path.getmtime(log_file)).strftime("%Y%m%d")
+
+        size = os.path.getsize(log_file)
+        if self._file_date == today and (size == 0 or size + incoming <= self.max_bytes):
+            return
+
+        base = os.path.join(os.path.dirname(log_file), f"qa_logs-{self._file_date}")
+        n = 1
+        while os.path.exists(f"{base}-{n}.jsonl") or os.path.exists(f"{base}-{n}.jsonl.gz"):
+            n += 1
+        rotated = f"{base}-{n}.jsonl"
+        os.replace(log_file, rotated)
+
+        if self.gzip_rotated:
+            with open(rotated, "rb") as src, gzip.open(rotated + ".gz", "wb") as dst:
+                shutil.copyfileobj(src, dst)
+            os.remove(rotated)
+
+        self._file_date = today
+        self.rotations += 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "running": self.running,
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            "queue_high_water": self.queue_high_water,
+            "written": self.written,
+            "dropped": self.dropped,
+            "batches": self.batches,
+            "rotations": self.rotations,
+            "write_errors": self.write_errors,
+        }
+
 
-    os.makedirs(log_dir, exist_ok=True)
-    return log_dir
+qa_log_writer = QALogWriter(
+    max_queue=settings.QA_LOG_QUEUE_SIZE,
+    batch_size=settings.QA_LOG_BATCH_SIZE,
+    flush_interval=settings.QA_LOG_FLUSH_INTERVAL,
+    max_bytes=settings.QA_LOG_MAX_BYTES,
+    gzip_rotated=settings.QA_LOG_GZIP,
+)
 
 
 def log_question(
@@ -39,6 +215,8 @@ def log_question(
         "citations": citations,
     }
 
-    log_file = os.path.join(get_log_dir(), "qa_logs.jsonl")
-    with open(log_file, "a", encoding="utf-8") as f:
-        f.write(json.dumps(log_entry, ensure_ascii=False) + "\n")
+    if qa_log_writer.running:
+        qa_log_writer.submit(log_entry)
+    else:
+        # No event loop writer (scripts, shutdown): write synchronously
+        qa_log_writer.write_batch([log_entry])
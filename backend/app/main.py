@@ -1,20 +1,34 @@
-from fastapi import FastAPI
+import time
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
 
 from app.config import settings
 from app.models import HealthResponse
-from app.neo4j_client import neo4j_client
+from app.graph_store import graph_store
+from app.llm_client import llm_client
+from app.logging_utils import qa_log_writer
 from app import routes
+from app import entity_linker
+from app import metrics
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup
-    await neo4j_client.connect()
+    qa_log_writer.start()
+    await graph_store.connect()
+    try:
+        await entity_linker.refresh_gazetteer()
+    except Exception:
+        # Linking falls back to graph store lookups until /kg/reload succeeds
+        # (also when the catalog is empty, e.g. the KG is not loaded yet)
+        pass
     yield
     # Shutdown
-    await neo4j_client.close()
+    await llm_client.close()
+    await graph_store.close()
+    await qa_log_writer.stop()
 
 
 app = FastAPI(
@@ -33,14 +47,37 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    """Request latency and Neo4j queries per request, by route template"""
+    timings = metrics.start_request()
+    start = time.perf_counter()
+    response = await call_next(request)
+    route = request.scope.get("route")
+    # Templates, not raw paths, keep label cardinality bounded
+    path = getattr(route, "path", "unmatched")
+    metrics.HTTP_REQUEST_SECONDS.observe(
+        time.perf_counter() - start,
+        method=request.method,
+        path=path,
+        status=str(response.status_code),
+    )
+    metrics.NEO4J_QUERIES_PER_REQUEST.observe(timings.get("neo4j_queries", 0))
+    return response
+
+
 # Include routers
 app.include_router(routes.router, prefix="/api/v1")
+# Also at the root, where Prometheus scrapes by default
+app.add_api_route("/metrics", routes.prometheus_metrics, methods=["GET"], include_in_schema=False)
 
 
 @app.get("/health", response_model=HealthResponse)
 async def health_check():
     """Health check endpoint"""
-    neo4j_status = "ok" if await neo4j_client.health_check() else "fail"
+    # Reported under "neo4j" whichever graph backend is configured
+    neo4j_status = "ok" if await graph_store.health_check() else "fail"
     llm_status = "ok"  # Mock for MVP
 
     return HealthResponse(
@@ -0,0 +1,265 @@
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+# Seconds; covers in-process lookups (ms) up to LLM calls (tens of s)
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+TOKEN_BUCKETS = (64, 128, 256, 512, 1024, 2048, 4096, 8192)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21)
+
+LabelValues = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: LabelValues, extra: str = "") -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class Metric:
+    """Base for labelled metrics rendered in Prometheus text format"""
+
+    kind = ""
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> LabelValues:
+        return tuple(str(labels.get(n, "")) for n in self.labelnames)
+
+    def samples(self) -> List[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self.samples())
+        return "\n".join(lines)
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, help, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{_labels(self.labelnames, k)} {_number(v)}" for k, v in items]
+
+
+class Gauge(Metric):
+    kind = "gauge"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, help, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+
+    def set(self, value: float, **labels: str) -> None:
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{_labels(self.labelnames, k)} {_number(v)}" for k, v in items]
+
+
+class ObservedCounter(Gauge):
+    """Counter whose value is kept elsewhere and copied in before rendering"""
+
+    kind = "counter"
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS,
+    ):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+        # label values -> (per-bucket counts, sum)
+        self._values: Dict[LabelValues, Tuple[List[int], List[float]]] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            counts, total = self._values.setdefault(key, ([0] * len(self.buckets), [0.0]))
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+                    break
+            total[0] += value
+
+    def samples(self) -> List[str]:
+        lines = []
+        with self._lock:
+            items = sorted((k, (list(c), s[0])) for k, (c, s) in self._values.items())
+        for key, (counts, total) in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                le = f'le="{_number(bound)}"'
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, key)} {_number(total)}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, key)} {cumulative}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self.metrics: List[Metric] = []
+
+    def register(self, metric: Metric) -> Metric:
+        self.metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        """All metrics in Prometheus text exposition format (0.0.4)"""
+        return "\n".join(m.render() for m in self.metrics) + "\n"
+
+
+registry = Registry()
+
+HTTP_REQUEST_SECONDS = registry.register(Histogram(
+    "graphrag_http_request_duration_seconds",
+    "HTTP request latency",
+    ["method", "path", "status"],
+))
+STAGE_SECONDS = registry.register(Histogram(
+    "graphrag_stage_duration_seconds",
+    "Time spent per pipeline stage",
+    ["stage"],
+))
+NEO4J_QUERIES = registry.register(Counter(
+    "graphrag_neo4j_queries_total",
+    "Neo4j queries run",
+    ["query"],
+))
+NEO4J_QUERY_ERRORS = registry.register(Counter(
+    "graphrag_neo4j_query_errors_total",
+    "Neo4j queries that failed after retries",
+    ["error"],
+))
+NEO4J_POOL_IN_USE = registry.register(Gauge(
+    "graphrag_neo4j_pool_in_use",
+    "Neo4j connections checked out by running queries",
+))
+NEO4J_POOL_MAX = registry.register(Gauge(
+    "graphrag_neo4j_pool_max",
+    "Neo4j connection pool size",
+))
+NEO4J_QUERIES_PER_REQUEST = registry.register(Histogram(
+    "graphrag_neo4j_queries_per_request",
+    "Neo4j queries run per HTTP request",
+    buckets=QUERY_COUNT_BUCKETS,
+))
+PROMPT_TOKENS = registry.register(Histogram(
+    "graphrag_prompt_tokens",
+    "Estimated prompt size in tokens",
+    buckets=TOKEN_BUCKETS,
+))
+ANSWERS = registry.register(Counter(
+    "graphrag_answers_total",
+    "Answers by producer",
+    ["answered_by"],
+))
+COALESCED_CALLS = registry.register(Counter(
+    "graphrag_coalesced_calls_total",
+    "Calls that joined an identical in-flight call instead of running",
+    ["flight"],
+))
+CACHE_HITS = registry.register(ObservedCounter(
+    "graphrag_cache_hits_total",
+    "Cache hits since start",
+    ["layer"],
+))
+CACHE_MISSES = registry.register(ObservedCounter(
+    "graphrag_cache_misses_total",
+    "Cache misses since start",
+    ["layer"],
+))
+CACHE_HIT_RATE = registry.register(Gauge(
+    "graphrag_cache_hit_rate",
+    "Cache hit rate since start",
+    ["layer"],
+))
+QA_LOG_RECORDS = registry.register(ObservedCounter(
+    "graphrag_qa_log_records_total",
+    "QA log records by outcome since start",
+    ["state"],
+))
+
+# Per-request accumulator: "<stage>_ms" totals, neo4j_queries, prompt_tokens
+_request_timings: ContextVar[Optional[Dict[str, float]]] = ContextVar("request_timings", default=None)
+
+
+def start_request() -> Dict[str, float]:
+    """Begin collecting timings for the current request (tasks it spawns share them)"""
+    timings: Dict[str, float] = {}
+    _request_timings.set(timings)
+    return timings
+
+
+def request_timings() -> Optional[Dict[str, float]]:
+    """Timings collected so far for the current request (None outside a request)"""
+    timings = _request_timings.get()
+    if timings is None:
+        return None
+    return {k: round(v, 3) if isinstance(v, float) else v for k, v in timings.items()}
+
+
+def _add(key: str, amount: float) -> None:
+    timings = _request_timings.get()
+    if timings is not None:
+        timings[key] = timings.get(key, 0) + amount
+
+
+@contextmanager
+def timed(stage: str) -> Iterator[None]:
+    """Observe the duration of the block as ``stage`` (works around awaits too)"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        STAGE_SECONDS.observe(elapsed, stage=stage)
+        _add(f"{stage}_ms", elapsed * 1000)
+
+
+def count_query(name: str) -> None:
+    """Count one Neo4j query, globally and for the current request"""
+    NEO4J_QUERIES.inc(query=name)
+    _add("neo4j_queries", 1)
+
+
+def observe_prompt_tokens(tokens: int) -> None:
+    PROMPT_TOKENS.observe(tokens)
+    _add("prompt_tokens", tokens)
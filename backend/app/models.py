@@ -1,5 +1,5 @@
-from typing import Optional, List, Any, Dict
-from pydantic import BaseModel
+from typing import Optional, List, Any, Dict, Union
+from pydantic import BaseModel, Field
 
 
 # Health Check
@@ -15,6 +15,9 @@ class LinkedEntity(BaseModel):
     node_id: str
     label: str
     score: float
+    # "exact" (name, alias or synonym), "fuzzy" (within a few edits) or
+    # "fulltext" (Neo4j full-text index, Lucene score)
+    match: str = "exact"
 
 
 # Triple
@@ -55,6 +58,11 @@ class AskRequest(BaseModel):
     limit: int = 20
 
 
+# Ask Batch Request
+class AskBatchRequest(BaseModel):
+    requests: List[AskRequest] = Field(..., min_length=1)
+
+
 # Citation
 class Citation(BaseModel):
     triple: str
@@ -66,6 +74,14 @@ class DebugInfo(BaseModel):
     linked_entities: List[Dict[str, Any]]
     cypher: str
     triples_used: int
+    # llm | rules (rule engine verdict, no LLM call) | none
+    answered_by: str = "llm"
+    # Question intent that picked the retrieval template (None: generic)
+    intent: Optional[str] = None
+    # True when a retrieval stage hit its deadline and evidence is incomplete
+    partial: bool = False
+    # Per-stage milliseconds, neo4j_queries and prompt_tokens for this request
+    timings: Optional[Dict[str, Union[int, float]]] = None
 
 
 # Ask Response
@@ -74,3 +90,42 @@ class AskResponse(BaseModel):
     citations: List[Citation]
     confidence: str
     debug: DebugInfo
+
+
+# KG Reload Request
+class ReloadRequest(BaseModel):
+    # Node ids changed by a delta load; omit to invalidate everything
+    node_ids: Optional[List[str]] = None
+
+
+# KG Reload Response
+class ReloadResponse(BaseModel):
+    status: str
+    surface_forms: int
+    invalidated: int
+
+
+# Cache Stats
+class CacheLayerStats(BaseModel):
+    hits: int
+    misses: int
+    hit_rate: float
+    entries: int
+
+
+class CacheStatsResponse(BaseModel):
+    backend: str
+    retrieval: CacheLayerStats
+    answer: CacheLayerStats
+
+
+# QA Log Writer Stats
+class LogStatsResponse(BaseModel):
+    running: bool
+    queued: int
+    queue_high_water: int
+    written: int
+    dropped: int
+    batches: int
+    rotations: int
+    write_errors: int
@@ -1,32 +1,179 @@
+import asyncio
+import re
+from functools import partial
 from typing import List, Optional, Dict, Any
-from neo4j import AsyncGraphDatabase, AsyncDriver
+from neo4j import AsyncGraphDatabase, AsyncDriver, AsyncManagedTransaction, READ_ACCESS, unit_of_work
 
 from app.config import settings
+from app import subgraph
+from app import metrics
+
+
+# Neighbours of each frontier node, at most $fanout per relation type.
+# Triples keep the stored edge direction.
+EXPAND_HOP_QUERY = """
+UNWIND $frontier AS f
+MATCH (a {node_id: f.node_id})-[r]-(b)
+WITH f, type(r) AS rel, collect(r)[..$fanout] AS rels
+UNWIND rels AS r
+WITH f, rel, r, startNode(r) AS h, endNode(r) AS t
+RETURN f.seed AS seed_id,
+       f.node_id AS from_id,
+       h.name AS head,
+       rel AS relation,
+       t.name AS tail,
+       r.source_id AS source_id,
+       h.node_id AS head_id,
+       t.node_id AS tail_id
+"""
+
+RELATION_TYPE = re.compile(r"[A-Z_][A-Z0-9_]*")
+
+
+def expand_hop_query(relation_types: Optional[List[str]] = None) -> str:
+    """
+    EXPAND_HOP_QUERY limited to relation_types
+
+    The types go into the pattern ([r:A|B]) so Neo4j only walks those
+    relationship chains instead of filtering every neighbour.
+    """
+    if not relation_types:
+        return EXPAND_HOP_QUERY
+    for rel in relation_types:
+        if not RELATION_TYPE.fullmatch(rel):
+            raise ValueError(f"Invalid relation type: {rel!r}")
+    return EXPAND_HOP_QUERY.replace("-[r]-", f"-[r:{'|'.join(relation_types)}]-")
+
+
+# Nodes whose name or alias contains each mention, best Lucene score first.
+# Served by the full-text index load_neo4j.py creates (CJK analyzer), so
+# cost grows with the matches, not with the graph.
+FULLTEXT_MENTIONS_QUERY = """
+UNWIND $mentions AS m
+CALL db.index.fulltext.queryNodes($index, m.query, {limit: $topk})
+YIELD node AS n, score
+RETURN m.term AS term,
+       m.mention AS mention,
+       n.node_id AS node_id,
+       n.name AS name,
+       labels(n)[0] AS label,
+       score,
+       'fulltext' AS match
+"""
+
+# Exact (case-insensitive) name/alias matches without the full-text index;
+# scans every node
+SCAN_MENTIONS_QUERY = """
+UNWIND $mentions AS m
+MATCH (n)
+WHERE toLower(n.name) = m.key
+   OR (n.aliases IS NOT NULL AND any(a IN n.aliases WHERE toLower(a) = m.key))
+WITH m, collect(n)[..$topk] AS nodes
+UNWIND nodes AS n
+RETURN m.term AS term,
+       m.mention AS mention,
+       n.node_id AS node_id,
+       n.name AS name,
+       labels(n)[0] AS label,
+       1.0 AS score
+"""
+
+# Whether the full-text index exists (any other procedure failure of the
+# lookup is a real error, not a reason to fall back to the scan)
+FULLTEXT_INDEX_QUERY = """
+SHOW FULLTEXT INDEXES YIELD name
+WHERE name = $index
+RETURN name
+"""
+
+LUCENE_SPECIAL = re.compile(r'([+\-&|!(){}\[\]^"~*?:\\/])')
+
+
+def lucene_phrase(text: str) -> str:
+    """text as a Lucene phrase query, special characters escaped"""
+    return '"' + LUCENE_SPECIAL.sub(r"\\\1", text) + '"'
+
+
+# InsuranceProduct age ranges matching a predicate on $age
+AGE_PRODUCTS_QUERY = """
+MATCH (p:InsuranceProduct)
+WHERE {predicate}
+OPTIONAL MATCH (p)-[r:AGE_RANGE]-()
+WITH p, head(collect(r.source_id)) AS source_id
+RETURN p.node_id AS node_id,
+       p.name AS name,
+       p.age_min AS age_min,
+       p.age_max AS age_max,
+       source_id
+ORDER BY p.age_min, p.node_id
+"""
+
+# Products accepting $age and those whose range (both bounds set) excludes
+# it. Both filter on range predicates the InsuranceProduct age_min / age_max
+# indexes can seek (the second as a union of two seeks); results are
+# cached per age until the next reload.
+AGE_ELIGIBLE_QUERY = AGE_PRODUCTS_QUERY.format(
+    predicate="p.age_min <= $age AND p.age_max >= $age"
+)
+AGE_INELIGIBLE_QUERY = AGE_PRODUCTS_QUERY.format(
+    predicate="(p.age_min > $age OR p.age_max < $age)"
+    " AND p.age_min IS NOT NULL AND p.age_max IS NOT NULL"
+)
+
+
+@unit_of_work(timeout=settings.NEO4J_QUERY_TIMEOUT or None)
+async def _read_records(tx: AsyncManagedTransaction, query: str, params: Dict[str, Any]) -> List[Dict[str, Any]]:
+    result = await tx.run(query, params)
+    return await result.data()
 
 
 class Neo4jClient:
     def __init__(self):
         self.driver: Optional[AsyncDriver] = None
+        # age -> {"eligible", "ineligible"}, dropped on reload
+        self._age_sets: Dict[int, Dict[str, List[Dict[str, Any]]]] = {}
+        self._in_use = 0
+        # One batcher per hop query (i.e. per relation-type filter)
+        self._hop_batchers: Dict[str, subgraph.HopBatcher] = {}
+        # Whether the full-text index exists; None until checked
+        self._fulltext: Optional[bool] = None if settings.NEO4J_FULLTEXT_INDEX else False
 
     async def connect(self):
-        """Connect to Neo4j"""
+        """
+        Connect to Neo4j
+
+        One pooled driver serves every request. With a neo4j:// URI the
+        driver discovers the cluster and routes reads to followers and
+        read replicas.
+        """
         self.driver = AsyncGraphDatabase.driver(
             settings.NEO4J_URI,
             auth=(settings.NEO4J_USER, settings.NEO4J_PASSWORD),
+            max_connection_pool_size=settings.NEO4J_MAX_POOL_SIZE,
+            connection_acquisition_timeout=settings.NEO4J_ACQUISITION_TIMEOUT,
+            connection_timeout=settings.NEO4J_CONNECTION_TIMEOUT,
+            max_connection_lifetime=settings.NEO4J_MAX_CONNECTION_LIFETIME,
+            max_transaction_retry_time=settings.NEO4J_MAX_RETRY_TIME,
         )
+        metrics.NEO4J_POOL_MAX.set(settings.NEO4J_MAX_POOL_SIZE)
 
     async def close(self):
         """Close connection"""
         if self.driver:
             await self.driver.close()
 
+    async def reload(self):
+        """Drop per-age product sets and recheck the full-text index; everything else is read live"""
+        self._age_sets.clear()
+        self._fulltext = None if settings.NEO4J_FULLTEXT_INDEX else False
+
     async def health_check(self) -> bool:
-        """Check if Neo4j is reachable"""
+        """Check if Neo4j is reachable (one attempt, no transaction retries)"""
         try:
-            async with self.driver.session() as session:
-                result = await session.run("RETURN 1 AS n")
-                await result.single()
-                return True
+            await asyncio.wait_for(
+                self.driver.verify_connectivity(), settings.NEO4J_CONNECTION_TIMEOUT
+            )
+            return True
         except Exception:
             return False
 
@@ -34,27 +181,126 @@ class Neo4jClient:
         self, mention: str, topk: int = 5
     ) -> List[Dict[str, Any]]:
         """Find nodes by name or alias"""
+        return await self.find_nodes_by_mentions(
+            [{"term": mention, "mention": mention}], topk=topk
+        )
+
+    async def find_nodes_by_mentions(
+        self, mentions: List[Dict[str, str]], topk: int = 5
+    ) -> List[Dict[str, Any]]:
+        """
+        Resolve many mentions by name or alias in a single round trip
+
+        Each mention is a dict with the candidate string (``mention``) and the
+        question term it was expanded from (``term``). Returns up to ``topk``
+        nodes per mention, each record carrying both fields back.
+
+        Uses the NEO4J_FULLTEXT_INDEX full-text index: nodes whose name or
+        alias contains the mention, with Lucene relevance scores. Without
+        the index (not configured, or the database predates it) only exact
+        matches are found, by scanning every node, and score 1.0.
+        """
+        if not self.driver or not mentions:
+            return []
+
+        if await self._has_fulltext_index():
+            params = [
+                {
+                    "term": m["term"],
+                    "mention": m["mention"],
+                    "query": lucene_phrase(m["mention"].strip()),
+                }
+                for m in mentions
+            ]
+            return await self._query(
+                "find_nodes_fulltext",
+                FULLTEXT_MENTIONS_QUERY,
+                mentions=params,
+                index=settings.NEO4J_FULLTEXT_INDEX,
+                topk=topk,
+            )
+
+        params = [
+            {
+                "term": m["term"],
+                "mention": m["mention"],
+                "key": m["mention"].strip().lower(),
+            }
+            for m in mentions
+        ]
+
+        return await self._query("find_nodes", SCAN_MENTIONS_QUERY, mentions=params, topk=topk)
+
+    async def _has_fulltext_index(self) -> bool:
+        """Whether NEO4J_FULLTEXT_INDEX exists (checked on first use and after each reload)"""
+        if self._fulltext is None:
+            records = await self._query(
+                "fulltext_index", FULLTEXT_INDEX_QUERY, index=settings.NEO4J_FULLTEXT_INDEX
+            )
+            self._fulltext = bool(records)
+        return self._fulltext
+
+    def surface_lexicon(self) -> None:
+        """No prebuilt name index: the gazetteer is built from the entity catalog"""
+        return None
+
+    async def fetch_entity_catalog(self) -> List[Dict[str, Any]]:
+        """Fetch name, label and aliases of every node (for the gazetteer)"""
         if not self.driver:
             return []
 
         query = """
         MATCH (n)
-        WHERE toLower(n.name) = toLower($name)
-           OR (exists(n.aliases) AND any(a IN n.aliases WHERE toLower(a) = toLower($name)))
+        WHERE n.node_id IS NOT NULL AND n.name IS NOT NULL
         RETURN n.node_id AS node_id,
                n.name AS name,
                labels(n)[0] AS label,
-               1.0 AS score
-        LIMIT $topk
+               coalesce(n.aliases, []) AS aliases
+        """
+
+        return await self._query("entity_catalog", query)
+
+    async def find_product_edges(self, relation: str, tail_id: str) -> List[Dict[str, Any]]:
+        """Every (InsuranceProduct)-[relation]->(tail_id) edge as a triple"""
+        if not self.driver:
+            return []
+        if not RELATION_TYPE.fullmatch(relation):
+            raise ValueError(f"Invalid relation type: {relation!r}")
+
+        query = f"""
+        MATCH (p:InsuranceProduct)-[r:{relation}]->(d {{node_id: $tail_id}})
+        RETURN p.name AS head,
+               type(r) AS relation,
+               d.name AS tail,
+               r.source_id AS source_id,
+               p.node_id AS head_id,
+               d.node_id AS tail_id
+        ORDER BY head_id
         """
 
-        async with self.driver.session() as session:
-            result = await session.run(
-                query, name=mention.strip(), topk=topk
+        return await self._query("product_edges", query, tail_id=tail_id)
+
+    async def find_products_by_age(self, age: int) -> Dict[str, Any]:
+        """
+        Split products with an age range into those accepting age and the rest
+
+        Returns {"eligible", "ineligible", "cypher"}; each product has
+        node_id, name, age_min, age_max and source_id. Results are kept
+        per age until the next reload.
+        """
+        if not self.driver:
+            return {"eligible": [], "ineligible": [], "cypher": ""}
+
+        sets = self._age_sets.get(age)
+        if sets is None:
+            eligible, ineligible = await asyncio.gather(
+                self._query("age_eligible", AGE_ELIGIBLE_QUERY, age=age),
+                self._query("age_ineligible", AGE_INELIGIBLE_QUERY, age=age),
             )
-            records = await result.data()
+            sets = {"eligible": eligible, "ineligible": ineligible}
+            self._age_sets[age] = sets
 
-        return records
+        return dict(sets, cypher=f"// age filter: {age}\n{AGE_ELIGIBLE_QUERY.strip()}")
 
     async def fetch_subgraph(
         self,
@@ -63,27 +309,80 @@ class Neo4jClient:
         limit: int = 20,
     ) -> List[Dict[str, Any]]:
         """Fetch subgraph around given nodes"""
-        if not self.driver or not node_ids:
-            return []
+        result = await self.expand_subgraph(node_ids, hop=hop, limit=limit)
+        return result["triples"]
 
-        # Simplified 1-hop query for MVP
-        query = """
-        MATCH (a)-[r]-(b)
-        WHERE a.node_id IN $node_ids
-        RETURN a.name AS head,
-               type(r) AS relation,
-               b.name AS tail,
-               r.source_id AS source_id,
-               a.node_id AS head_id,
-               b.node_id AS tail_id
-        LIMIT $limit
+    async def expand_subgraph(
+        self,
+        node_ids: List[str],
+        hop: int = 2,
+        limit: int = 20,
+        fanout: Optional[int] = None,
+        relation_types: Optional[List[str]] = None,
+        progress: Optional[List[Dict[str, Any]]] = None,
+    ) -> Dict[str, Any]:
         """
+        k-hop subgraph around given nodes
 
-        async with self.driver.session() as session:
-            result = await session.run(query, node_ids=node_ids, limit=limit)
-            records = await result.data()
+        Returns {"triples", "nodes", "cypher"}; see subgraph.expand_khop
+        for the budget and fan-out rules. relation_types restricts which
+        relationships are followed.
+        """
+        if not self.driver or not node_ids:
+            return {"triples": [], "nodes": [], "cypher": ""}
+
+        hop = max(1, min(hop, settings.SUBGRAPH_MAX_HOP))
+        fanout = fanout or settings.SUBGRAPH_RELATION_FANOUT
 
-        return records
+        query = expand_hop_query(relation_types)
+        batcher = self._hop_batchers.get(query)
+        if batcher is None:
+            batcher = self._hop_batchers[query] = subgraph.HopBatcher(
+                partial(self._fetch_hop, query=query)
+            )
+        result = await subgraph.expand_khop(
+            batcher.fetch, node_ids,
+            hop=hop, limit=limit, fanout=fanout, progress=progress,
+        )
+
+        header = "\n".join(
+            f"// hop {depth}: frontier={size} fanout={fanout}"
+            for depth, size in enumerate(result["frontiers"], 1)
+        )
+        result["cypher"] = f"{header}\n{query.strip()}"
+        return result
+
+    async def _fetch_hop(
+        self, frontier: List[Dict[str, str]], fanout: int, query: str = EXPAND_HOP_QUERY
+    ) -> List[Dict[str, Any]]:
+        """One hop of expansion for every frontier node"""
+        return await self._query("expand_hop", query, frontier=frontier, fanout=fanout)
+
+    async def _query(self, name: str, query: str, **params) -> List[Dict[str, Any]]:
+        """
+        Run a read query in a managed transaction and return its records
+
+        execute_read retries transient errors (leader switch, unavailable
+        replica) for up to NEO4J_MAX_RETRY_TIME; each attempt has a
+        server-side timeout of NEO4J_QUERY_TIMEOUT. Timed and counted as
+        ``name``.
+        """
+        metrics.count_query(name)
+        self._in_use += 1
+        metrics.NEO4J_POOL_IN_USE.set(self._in_use)
+        try:
+            with metrics.timed("neo4j"):
+                async with self.driver.session(
+                    database=settings.NEO4J_DATABASE or None,
+                    default_access_mode=READ_ACCESS,
+                ) as session:
+                    return await session.execute_read(_read_records, query, params)
+        except Exception as e:
+            metrics.NEO4J_QUERY_ERRORS.inc(error=type(e).__name__)
+            raise
+        finally:
+            self._in_use -= 1
+            metrics.NEO4J_POOL_IN_USE.set(self._in_use)
 
 
 neo4j_client = Neo4jClient()
@@ -0,0 +1,100 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence, Tuple
+
+from app import metrics
+
+# Results of the stages completed so far, keyed by stage name
+Results = Dict[str, Any]
+
+
+class StageTimeout(Exception):
+    """A stage without an on_timeout fallback ran out of time"""
+
+    def __init__(self, stage: str):
+        super().__init__(f"Stage {stage!r} timed out")
+        self.stage = stage
+
+
+class Stage:
+    """
+    One node of a pipeline
+
+    ``run`` receives the results of earlier stages and starts as soon as
+    every stage in ``deps`` has finished. If it exceeds ``timeout`` (or the
+    pipeline deadline) ``on_timeout`` supplies its result instead.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        run: Callable[[Results], Awaitable[Any]],
+        deps: Sequence[str] = (),
+        timeout: Optional[float] = None,
+        on_timeout: Optional[Callable[[Results], Any]] = None,
+    ):
+        self.name = name
+        self.run = run
+        self.deps = tuple(deps)
+        self.timeout = timeout
+        self.on_timeout = on_timeout
+
+
+class Pipeline:
+    """
+    A small async DAG of stages
+
+    Independent stages run concurrently; a stage waits only for its own
+    dependencies. Stages must be listed after the stages they depend on.
+    """
+
+    def __init__(self, stages: List[Stage]):
+        names = set()
+        for stage in stages:
+            missing = [d for d in stage.deps if d not in names]
+            if missing:
+                raise ValueError(f"Stage {stage.name!r} depends on unknown or later stages {missing}")
+            names.add(stage.name)
+        self.stages = stages
+
+    async def run(self, deadline: Optional[float] = None) -> Tuple[Results, List[str]]:
+        """
+        Run every stage, giving up on each at its timeout or ``deadline``
+        seconds from now, whichever comes first
+
+        Returns (results by stage name, names of stages that timed out).
+        Errors other than timeouts cancel the remaining stages and propagate.
+        """
+        loop = asyncio.get_running_loop()
+        ends_at = loop.time() + deadline if deadline is not None else None
+        results: Results = {}
+        timed_out: List[str] = []
+        tasks: Dict[str, asyncio.Future] = {}
+
+        async def run_stage(stage: Stage) -> None:
+            if stage.deps:
+                await asyncio.gather(*(tasks[d] for d in stage.deps))
+
+            timeout = stage.timeout
+            if ends_at is not None:
+                remaining = max(0.0, ends_at - loop.time())
+                timeout = remaining if timeout is None else min(timeout, remaining)
+
+            try:
+                with metrics.timed(stage.name):
+                    results[stage.name] = await asyncio.wait_for(stage.run(results), timeout)
+            except asyncio.TimeoutError:
+                if stage.on_timeout is None:
+                    raise StageTimeout(stage.name)
+                timed_out.append(stage.name)
+                results[stage.name] = stage.on_timeout(results)
+
+        for stage in self.stages:
+            tasks[stage.name] = asyncio.ensure_future(run_stage(stage))
+        try:
+            await asyncio.gather(*tasks.values())
+        finally:
+            for task in tasks.values():
+                if not task.done():
+                    task.cancel()
+
+        return results, timed_out
@@ -1,6 +1,11 @@
-from typing import List
+import re
+from typing import Callable, Dict, List, Optional, Tuple
+from app.config import settings
 from app.models import Triple
 
+# One token per CJK character, word or other symbol (rough, tokenizer-free)
+TOKEN_PATTERN = re.compile(r"[\u4e00-\u9fff]|[A-Za-z0-9_]+|[^\sA-Za-z0-9_\u4e00-\u9fff]")
+
 SYSTEM_PROMPT = """你是一个保险咨询专家。你的职责是根据提供的证据（三元组）回答用户的问题。
 
 重要规则：
@@ -17,19 +22,85 @@ SYSTEM_PROMPT = """你是一个保险咨询专家。你的职责是根据提供
 
 
 def build_prompt(question: str, triples: List[Triple]) -> str:
-    """Build prompt for LLM"""
+    """
+    Build prompt for LLM
 
-    # Format triples
-    triples_text = ""
-    for i, t in enumerate(triples, 1):
-        source_info = f" [source_id={t.source_id}]" if t.source_id else ""
-        triples_text += f"{i}) ({t.h}, {t.r}, {t.t}){source_info}\n"
+    Triples sharing a head and relation are written as one line
+    ("XX护理险: EXCLUDES 高血压 [source_id=...], 糖尿病 [source_id=...]").
+    """
+    lines = [
+        f"{i}) {head}: {relation} " + ", ".join(_tail(t) for t in group)
+        for i, (head, relation, group) in enumerate(_group(triples), 1)
+    ]
+    triples_text = "\n".join(lines)
 
     user_prompt = f"""用户问题：{question}
 
-证据三元组：
+证据三元组（同一主体和关系的合并为一行）：
 {triples_text if triples_text else "（无证据）"}
 
 请根据上述证据回答问题。"""
 
     return f"{SYSTEM_PROMPT}\n\n{user_prompt}"
+
+
+def pack_evidence(question: str, triples: List[Triple], budget: Optional[int] = None) -> List[Triple]:
+    """
+    The most valuable triples whose prompt fits a token budget
+
+    triples must be in priority order (ranking.rank_triples). A
+    triple joining an existing head/relation line costs only its tail,
+    and smaller triples further down still get in after a large one is
+    skipped. budget defaults to PROMPT_TOKEN_BUDGET; 0 keeps everything.
+    """
+    budget = settings.PROMPT_TOKEN_BUDGET if budget is None else budget
+    if budget <= 0:
+        return list(triples)
+
+    remaining = budget - count_tokens(build_prompt(question, []))
+    selected: List[Triple] = []
+    groups = set()
+    for t in triples:
+        if (t.h, t.r) in groups:
+            cost = count_tokens(", " + _tail(t))
+        else:
+            cost = count_tokens(f"\n{len(groups) + 1}) {t.h}: {t.r} {_tail(t)}")
+        if cost > remaining:
+            continue
+        remaining -= cost
+        selected.append(t)
+        groups.add((t.h, t.r))
+    return selected
+
+
+def _tail(t: Triple) -> str:
+    return f"{t.t} [source_id={t.source_id}]" if t.source_id else t.t
+
+
+def _group(triples: List[Triple]) -> List[Tuple[str, str, List[Triple]]]:
+    """(head, relation, triples) in order of first appearance"""
+    groups: Dict[Tuple[str, str], List[Triple]] = {}
+    for t in triples:
+        groups.setdefault((t.h, t.r), []).append(t)
+    return [(h, r, group) for (h, r), group in groups.items()]
+
+
+def estimate_tokens(text: str) -> int:
+    """Approximate token count of a prompt"""
+    return len(TOKEN_PATTERN.findall(text))
+
+
+def _make_tokenizer(kind: str) -> Callable[[str], int]:
+    """Token counter for PROMPT_TOKENIZER: heuristic, or tiktoken[:<encoding>]"""
+    if kind == "heuristic":
+        return estimate_tokens
+    if kind.split(":")[0] == "tiktoken":
+        import tiktoken  # optional; only needed for this tokenizer
+
+        encoding = tiktoken.get_encoding(kind.partition(":")[2] or "cl100k_base")
+        return lambda text: len(encoding.encode(text))
+    raise ValueError(f"Unknown PROMPT_TOKENIZER: {kind!r}")
+
+
+# Replaceable to match the deployed model's tokenizer
+count_tokens = _make_tokenizer(settings.PROMPT_TOKENIZER)
@@ -1,17 +1,215 @@
-from typing import Dict, Any, List
+import asyncio
+import time
+from typing import Dict, Any, List, AsyncIterator, Optional, Tuple, Union
 
 from app.models import (
+    AskRequest,
     AskResponse,
     Citation,
     DebugInfo,
     Triple,
 )
-from app.neo4j_client import neo4j_client
+from app.graph_store import graph_store
 from app import entity_linker
 from app import subgraph as subgraph_module
 from app import prompt_builder
-from app.llm_client import llm_client
+from app import rule_engine
+from app import ranking
+from app.intent import intent_classifier, INTENT_TEMPLATES
+from app.pipeline import Pipeline, Stage
+from app.config import settings
+from app.llm_client import llm_client, LLMError
 from app import logging_utils
+from app import metrics
+from app.cache import qa_cache
+from app.singleflight import SingleFlight
+
+# Identical concurrent calls share one computation (keyed like the retrieval cache)
+_retrieval_flights = SingleFlight("retrieve")
+_answer_flights = SingleFlight("ask")
+
+# Share of the triple limit that leading AGE_RANGE facts may take
+AGE_TRIPLES_SHARE = 0.5
+
+
+async def retrieve(question: str, hop: int = 2, limit: int = 20) -> Dict[str, Any]:
+    """
+    Entity linking + subgraph fetch (see _retrieve), shared by identical
+    concurrent calls
+    """
+    if not settings.SINGLEFLIGHT_ENABLED:
+        return await _retrieve(question, hop, limit)
+    key = qa_cache.retrieval_key(question, hop, limit)
+    return await _retrieval_flights.do(key, lambda: _retrieve(question, hop, limit))
+
+
+async def _retrieve(question: str, hop: int, limit: int) -> Dict[str, Any]:
+    """
+    Entity linking + subgraph fetch, served from the retrieval cache when possible
+
+    If the question states an age, products are checked against it with
+    the store's age index and the resulting AGE_RANGE facts lead the
+    triples, so eligibility never depends on edges surviving the limit.
+
+    The expansion gathers a candidate pool of RANKING_CANDIDATE_MULTIPLIER
+    times limit triples; rank_evidence picks the limit most relevant.
+
+    The question's intent limits the expansion to the relation types of
+    its template (falling back to a full expansion if that finds nothing).
+
+    Linking and the age lookup run concurrently, and every stage has a
+    timeout within PIPELINE_RETRIEVAL_DEADLINE. A stage that runs out of
+    time contributes what it has (e.g. the hops expanded so far) and the
+    result is marked partial and not cached.
+
+    Returns {"linked_entities", "triples", "cypher", "nodes", "intent", "partial"}
+    """
+    key = qa_cache.retrieval_key(question, hop, limit)
+    cached = qa_cache.retrieval.get(key)
+    if cached is not None:
+        return cached
+
+    pool = limit * max(1, settings.RANKING_CANDIDATE_MULTIPLIER)
+    age = entity_linker.extract_age(question)
+    intent = intent_classifier.classify(question) if settings.INTENT_ROUTING_ENABLED else None
+    progress: List[Dict[str, Any]] = []
+
+    async def find_products(results):
+        if age is None:
+            return None
+        return await graph_store.find_products_by_age(age)
+
+    async def expand(results):
+        node_ids = [e["node_id"] for e in results["link"]]
+        return await _expand(node_ids, hop, pool, intent, progress)
+
+    def expanded_so_far(results):
+        triples = list(progress)
+        return {"triples": triples, "nodes": _triple_nodes(triples), "cypher": ""}
+
+    pipeline = Pipeline([
+        Stage(
+            "link",
+            lambda results: entity_linker.link_entities(question),
+            timeout=settings.PIPELINE_LINK_TIMEOUT,
+            on_timeout=lambda results: [],
+        ),
+        Stage(
+            "age",
+            find_products,
+            timeout=settings.PIPELINE_AGE_TIMEOUT,
+            on_timeout=lambda results: None,
+        ),
+        Stage(
+            "expand",
+            expand,
+            deps=["link"],
+            timeout=settings.PIPELINE_EXPAND_TIMEOUT,
+            on_timeout=expanded_so_far,
+        ),
+    ])
+    results, timed_out = await pipeline.run(deadline=settings.PIPELINE_RETRIEVAL_DEADLINE)
+
+    linked_entities = results["link"]
+    result = results["expand"]
+
+    age_triples, age_facts, age_cypher = [], {}, ""
+    if results["age"] is not None:
+        age_triples, age_facts = _age_triples(age, results["age"], linked_entities, limit)
+        age_cypher = results["age"]["cypher"]
+
+    if not linked_entities and not age_triples:
+        # Not cached: linking may only have failed because the KG is unavailable
+        return {
+            "linked_entities": [], "triples": [], "cypher": "", "nodes": [],
+            "intent": None, "partial": bool(timed_out),
+        }
+
+    # Bare AGE_RANGE edges get the age verdict; those already listed are dropped
+    age_products = {t["head_id"] for t in age_triples}
+    triples = list(age_triples)
+    for t in result["triples"]:
+        if t["relation"] == "AGE_RANGE" and t["head_id"] in age_facts:
+            if t["head_id"] in age_products:
+                continue
+            t = dict(t, tail=age_facts[t["head_id"]]["tail"])
+        triples.append(t)
+    triples = triples[:pool]
+    nodes = list(dict.fromkeys(
+        [t["head_id"] for t in age_triples] + result["nodes"]
+    ))
+
+    retrieval = {
+        "linked_entities": linked_entities,
+        "triples": triples,
+        "cypher": "\n".join(c for c in (age_cypher, result["cypher"]) if c),
+        "nodes": nodes,
+        "intent": intent["intent"] if intent else None,
+        "partial": bool(timed_out),
+    }
+    if not timed_out:
+        node_ids = [e["node_id"] for e in linked_entities]
+        qa_cache.retrieval.set(key, retrieval, tags=set(node_ids) | set(nodes))
+    return retrieval
+
+
+async def _expand(
+    node_ids: List[str],
+    hop: int,
+    limit: int,
+    intent: Optional[Dict[str, Any]],
+    progress: List[Dict[str, Any]],
+) -> Dict[str, Any]:
+    """Subgraph around the linked nodes, through the intent's template if it has one"""
+    if intent and intent["relation_types"]:
+        result = await graph_store.expand_subgraph(
+            node_ids,
+            hop=min(hop, intent["max_hop"]),
+            limit=limit,
+            relation_types=intent["relation_types"],
+            progress=progress,
+        )
+        if result["triples"]:
+            return result
+    return await graph_store.expand_subgraph(node_ids, hop=hop, limit=limit, progress=progress)
+
+
+def _triple_nodes(triples: List[Dict[str, Any]]) -> List[str]:
+    return list(dict.fromkeys(
+        node_id for t in triples for node_id in (t["head_id"], t["tail_id"])
+    ))
+
+
+def _age_triples(
+    age: int, products: Dict[str, Any], linked_entities: List[Dict[str, Any]], limit: int
+) -> Tuple[List[Dict[str, Any]], Dict[str, Dict[str, Any]]]:
+    """
+    AGE_RANGE facts for the question's age
+
+    products is the store's find_products_by_age result. Returns (triples
+    to lead with, fact per product node_id). Linked products are checked
+    individually; otherwise ("80岁老人能买什么保险") eligible products are
+    listed, or all products if none is eligible. At most AGE_TRIPLES_SHARE
+    of limit is used, leaving room for disease and product evidence.
+    """
+    facts = {
+        t["head_id"]: t
+        for t in subgraph_module.age_range_triples(
+            products["eligible"] + products["ineligible"], age
+        )
+    }
+    linked = [e["node_id"] for e in linked_entities if e["label"] == "InsuranceProduct"]
+
+    if linked:
+        selected = [facts[node_id] for node_id in linked if node_id in facts]
+    else:
+        selected = [
+            facts[p["node_id"]]
+            for p in (products["eligible"] or products["ineligible"])
+        ]
+    selected = selected[:max(1, int(limit * AGE_TRIPLES_SHARE))]
+
+    return selected, facts
 
 
 async def answer_question(
@@ -19,39 +217,219 @@ async def answer_question(
     hop: int = 2,
     limit: int = 20,
 ) -> AskResponse:
-    """Main RAG orchestration"""
-
-    # Step 1: Entity linking
-    linked_entities = await entity_linker.link_entities(question)
-
-    if not linked_entities:
-        # No entities found - return empty response
-        return AskResponse(
-            answer="未能在问题中识别出相关实体，请重新描述您的问题。",
-            citations=[],
-            confidence="low",
-            debug=DebugInfo(
-                linked_entities=[],
-                cypher="",
-                triples_used=0,
-            ),
-        )
+    """Main RAG orchestration; identical concurrent questions share one answer"""
+    if not settings.SINGLEFLIGHT_ENABLED:
+        return await _answer_question(question, hop, limit)
+    key = qa_cache.retrieval_key(question, hop, limit)
+    return await _answer_flights.do(key, lambda: _answer_question(question, hop, limit))
+
 
-    # Step 2: Get node IDs and fetch subgraph
-    node_ids = [e["node_id"] for e in linked_entities]
-    raw_triples = await neo4j_client.fetch_subgraph(node_ids, hop=hop, limit=limit)
+async def _answer_question(question: str, hop: int, limit: int) -> AskResponse:
 
-    # Step 3: Format and prioritize triples
-    triples = subgraph_module.format_triples(raw_triples)
-    triples = subgraph_module.prioritize_triples(triples, topk=limit)
+    # Step 1-2: Entity linking and subgraph fetch
+    retrieval = await retrieve(question, hop=hop, limit=limit)
 
-    # Step 4: Build prompt
-    prompt = prompt_builder.build_prompt(question, triples)
+    if not retrieval["linked_entities"] and not retrieval["triples"]:
+        # No entities (and no age facts) found - return empty response
+        return _no_entity_response()
+
+    # Certain eligibility / coverage verdicts skip the LLM
+    with metrics.timed("rules"):
+        verdict = await rule_engine.evaluate(question, retrieval)
+    if verdict is not None:
+        triples = subgraph_module.format_triples(verdict["evidence"])
+        return _finish(question, retrieval, triples, "", verdict["answer"], answered_by="rules")
+
+    # Step 3-4: Format and prioritize triples, build prompt
+    triples, prompt = _build_prompt(question, retrieval, limit)
 
     # Step 5: Generate answer
-    answer_text = await llm_client.generate(prompt)
+    answer_key = qa_cache.answer_key(prompt)
+    answer_text = qa_cache.answer.get(answer_key)
+    if answer_text is None:
+        try:
+            with metrics.timed("llm"):
+                answer_text = await asyncio.wait_for(
+                    llm_client.generate(prompt), settings.PIPELINE_LLM_TIMEOUT
+                )
+        except asyncio.TimeoutError:
+            answer_text = f"Error: LLM did not answer within {settings.PIPELINE_LLM_TIMEOUT:g}s"
+        # Errors and empty answers are not cached
+        if answer_text.strip() and not answer_text.startswith("Error:"):
+            qa_cache.answer.set(answer_key, answer_text)
+
+    # Step 6-8: Citations, confidence, logging
+    return _finish(question, retrieval, triples, prompt, answer_text)
+
+
+async def answer_batch(
+    requests: List[AskRequest],
+) -> AsyncIterator[Tuple[int, Union[AskResponse, Exception]]]:
+    """
+    Answer many questions, yielding (index, response or error) as each completes
+
+    Identical questions (same normalized question, hop and limit) are
+    answered once. At most ASK_BATCH_CONCURRENCY questions are in flight;
+    their graph hops are merged into shared queries by the store, and LLM
+    calls stay bounded by LLM_MAX_CONCURRENCY.
+    """
+    groups: Dict[str, List[int]] = {}
+    for i, r in enumerate(requests):
+        groups.setdefault(qa_cache.retrieval_key(r.question, r.hop, r.limit), []).append(i)
+
+    slots = asyncio.Semaphore(settings.ASK_BATCH_CONCURRENCY)
+
+    async def answer(indices: List[int]) -> Tuple[List[int], Union[AskResponse, Exception]]:
+        r = requests[indices[0]]
+        async with slots:
+            # Per-question debug timings, not the whole batch's
+            metrics.start_request()
+            try:
+                return indices, await answer_question(r.question, hop=r.hop, limit=r.limit)
+            except Exception as e:
+                return indices, e
+
+    tasks = [asyncio.ensure_future(answer(indices)) for indices in groups.values()]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            indices, result = await next_done
+            for i in indices:
+                yield i, result
+    finally:
+        for task in tasks:
+            task.cancel()
+
 
-    # Step 6: Build citations from top triples
+async def stream_answer(
+    question: str,
+    hop: int = 2,
+    limit: int = 20,
+) -> AsyncIterator[Tuple[str, Dict[str, Any]]]:
+    """
+    Streaming variant of answer_question
+
+    Yields (event, data) pairs as each stage completes:
+    entities -> evidence -> token (repeated) -> done (the full AskResponse)
+    """
+    retrieval = await retrieve(question, hop=hop, limit=limit)
+    yield "entities", {"linked_entities": retrieval["linked_entities"]}
+
+    if not retrieval["linked_entities"] and not retrieval["triples"]:
+        response = _no_entity_response()
+        yield "token", {"text": response.answer}
+        yield "done", response.model_dump()
+        return
+
+    with metrics.timed("rules"):
+        verdict = await rule_engine.evaluate(question, retrieval)
+    if verdict is not None:
+        triples = subgraph_module.format_triples(verdict["evidence"])
+        yield "evidence", {
+            "triples": [t.model_dump() for t in triples],
+            "cypher": retrieval["cypher"],
+        }
+        yield "token", {"text": verdict["answer"]}
+        response = _finish(question, retrieval, triples, "", verdict["answer"], answered_by="rules")
+        yield "done", response.model_dump()
+        return
+
+    triples, prompt = _build_prompt(question, retrieval, limit)
+    yield "evidence", {
+        "triples": [t.model_dump() for t in triples],
+        "cypher": retrieval["cypher"],
+    }
+
+    answer_key = qa_cache.answer_key(prompt)
+    answer_text = qa_cache.answer.get(answer_key)
+    if answer_text is not None:
+        yield "token", {"text": answer_text}
+    else:
+        chunks = []
+        stream = llm_client.generate_stream(prompt)
+        # PIPELINE_LLM_TIMEOUT bounds the time spent waiting on the LLM;
+        # the "llm" stage timing also includes the client reading each chunk
+        budget = settings.PIPELINE_LLM_TIMEOUT
+        try:
+            with metrics.timed("llm"):
+                while True:
+                    started = time.perf_counter()
+                    try:
+                        chunk = await asyncio.wait_for(anext(stream), max(budget, 0))
+                    except StopAsyncIteration:
+                        break
+                    budget -= time.perf_counter() - started
+                    chunks.append(chunk)
+                    yield "token", {"text": chunk}
+        except asyncio.TimeoutError:
+            yield "error", {"detail": f"LLM did not answer within {settings.PIPELINE_LLM_TIMEOUT:g}s"}
+            return
+        except LLMError as e:
+            # Tokens already sent are not an answer; nothing is cached
+            yield "error", {"detail": str(e)}
+            return
+        finally:
+            await stream.aclose()
+        answer_text = "".join(chunks)
+        # An empty stream is not an answer worth replaying
+        if answer_text.strip():
+            qa_cache.answer.set(answer_key, answer_text)
+
+    response = _finish(question, retrieval, triples, prompt, answer_text)
+    yield "done", response.model_dump()
+
+
+def _no_entity_response() -> AskResponse:
+    """Response when no entity could be linked"""
+    metrics.ANSWERS.inc(answered_by="none")
+    return AskResponse(
+        answer="未能在问题中识别出相关实体，请重新描述您的问题。",
+        citations=[],
+        confidence="low",
+        debug=DebugInfo(
+            linked_entities=[],
+            cypher="",
+            triples_used=0,
+            answered_by="none",
+        ),
+    )
+
+
+def rank_evidence(question: str, retrieval: Dict[str, Any], limit: int) -> List[Dict[str, Any]]:
+    """The limit most relevant triples of the retrieved candidate pool, best first"""
+    return ranking.rank_triples(
+        retrieval["triples"],
+        question,
+        seeds=[e["node_id"] for e in retrieval["linked_entities"]],
+        intent_relations=INTENT_TEMPLATES.get(retrieval.get("intent"), {}).get("relation_types"),
+        topk=limit,
+    )
+
+
+def _build_prompt(
+    question: str, retrieval: Dict[str, Any], limit: int
+) -> Tuple[List[Triple], str]:
+    """Rank retrieved triples by relevance, pack them into the token budget, build the prompt"""
+    with metrics.timed("prompt"):
+        triples = subgraph_module.format_triples(rank_evidence(question, retrieval, limit))
+        triples = prompt_builder.pack_evidence(question, triples)
+        prompt = prompt_builder.build_prompt(question, triples)
+    metrics.observe_prompt_tokens(prompt_builder.count_tokens(prompt))
+    return triples, prompt
+
+
+def _finish(
+    question: str,
+    retrieval: Dict[str, Any],
+    triples: List[Triple],
+    prompt: str,
+    answer_text: str,
+    answered_by: str = "llm",
+) -> AskResponse:
+    """Build citations and confidence, log the interaction"""
+    linked_entities = retrieval["linked_entities"]
+    metrics.ANSWERS.inc(answered_by=answered_by)
+
+    # Build citations from top triples
     citations = [
         Citation(
             triple=f"({t.h}, {t.r}, {t.t})",
@@ -60,14 +438,17 @@ async def answer_question(
         for t in triples[:5]  # Top 5 citations
     ]
 
-    # Step 7: Calculate confidence
-    confidence = _calculate_confidence(triples, linked_entities)
+    # Calculate confidence (rule verdicts are certain by construction)
+    if answered_by == "rules":
+        confidence = "high"
+    else:
+        confidence = _calculate_confidence(triples, linked_entities)
 
-    # Step 8: Log the interaction
+    # Log the interaction
     logging_utils.log_question(
         question=question,
         linked_entities=linked_entities,
-        cypher=f"MATCH (a)-[r]-(b) WHERE a.node_id IN {node_ids}",
+        cypher=retrieval["cypher"],
         triples=[t.model_dump() for t in triples],
         prompt=prompt,
         answer=answer_text,
@@ -80,8 +461,12 @@ async def answer_question(
         confidence=confidence,
         debug=DebugInfo(
             linked_entities=linked_entities,
-            cypher=f"MATCH (a)-[r]-(b) WHERE a.node_id IN {node_ids}",
+            cypher=retrieval["cypher"],
             triples_used=len(triples),
+            answered_by=answered_by,
+            intent=retrieval.get("intent"),
+            partial=retrieval.get("partial", False),
+            timings=metrics.request_timings() if settings.METRICS_DEBUG_TIMINGS else None,
         ),
     )
 
@@ -0,0 +1,118 @@
+from typing import List, Dict, Any, Optional
+
+import numpy as np
+
+from app.subgraph import RELATION_RANK
+
+# Feature weights for the relevance score (features are scaled to 0-1)
+RANKING_WEIGHTS = {
+    "seed_hit": 3.0,        # touches a linked entity
+    "hop": 2.0,             # closer to the seeds
+    "mention": 2.0,         # head/tail named in the question
+    "intent": 1.5,          # relation in the intent's template
+    "relation": 1.0,        # static relation priority
+    "source": 0.5,          # source reliability
+}
+
+# Reliability by source_id prefix; other sourced triples get SOURCE_DEFAULT
+SOURCE_RELIABILITY = {
+    "clause_": 1.0,         # policy clause text
+    "drug_": 0.8,
+    "org_service_": 0.8,
+}
+SOURCE_DEFAULT = 0.5
+
+FEATURES = list(RANKING_WEIGHTS)
+_WEIGHT_VECTOR = np.array([RANKING_WEIGHTS[f] for f in FEATURES])
+
+
+def rank_triples(
+    triples: List[Dict[str, Any]],
+    question: str,
+    seeds: List[str],
+    intent_relations: Optional[List[str]] = None,
+    topk: int = 20,
+) -> List[Dict[str, Any]]:
+    """
+    The topk most relevant retrieved triples, best first
+
+    Each triple is scored on whether it touches a linked seed, its hop
+    distance, whether its head or tail is named in the question, whether
+    its relation is one the intent asks about, the static relation
+    priority and the reliability of its source. Selection partitions
+    around the topk-th score, so only the topk survivors are sorted. Ties
+    (also at the cut) keep retrieval order, as a stable full sort would.
+    """
+    if topk <= 0 or not triples:
+        return []
+
+    scores = score_triples(triples, question, seeds, intent_relations)
+    order = np.arange(len(triples))
+    if topk < len(triples):
+        cut = np.partition(scores, len(triples) - topk)[len(triples) - topk]
+        above = np.flatnonzero(scores > cut)
+        # Earliest of the triples tied at the cut fill the remaining slots
+        tied = np.flatnonzero(scores == cut)[:topk - len(above)]
+        order = np.concatenate([above, tied])
+    # Sort survivors by score, then by original position
+    order = order[np.lexsort((order, -scores[order]))]
+    return [triples[i] for i in order]
+
+
+def score_triples(
+    triples: List[Dict[str, Any]],
+    question: str,
+    seeds: List[str],
+    intent_relations: Optional[List[str]] = None,
+) -> np.ndarray:
+    """Weighted relevance score per triple"""
+    return feature_matrix(triples, question, seeds, intent_relations) @ _WEIGHT_VECTOR
+
+
+def feature_matrix(
+    triples: List[Dict[str, Any]],
+    question: str,
+    seeds: List[str],
+    intent_relations: Optional[List[str]] = None,
+) -> np.ndarray:
+    """(len(triples), len(FEATURES)) matrix of 0-1 features"""
+    seed_set = set(seeds)
+    intent_set = set(intent_relations or ())
+    n_ranks = len(RELATION_RANK)
+
+    heads = [t.get("head_id") for t in triples]
+    tails = [t.get("tail_id") for t in triples]
+    relations = [t["relation"] for t in triples]
+
+    seed_hits = np.array([(h in seed_set) + (t in seed_set) for h, t in zip(heads, tails)], dtype=float)
+    hops = np.array([t.get("hop", 1) for t in triples], dtype=float)
+    mentions = np.array(
+        [_named(t.get("head"), question) + _named(t.get("tail"), question) for t in triples],
+        dtype=float,
+    )
+    intent = np.array([r in intent_set for r in relations], dtype=float)
+    ranks = np.array([RELATION_RANK.get(r, n_ranks) for r in relations], dtype=float)
+    sources = np.array([_reliability(t.get("source_id")) for t in triples])
+
+    return np.column_stack([
+        np.minimum(seed_hits, 1.0),
+        1.0 / (1.0 + hops),
+        mentions / 2.0,
+        intent,
+        1.0 - ranks / n_ranks,
+        sources,
+    ])
+
+
+def _named(name: Optional[str], question: str) -> int:
+    # Single characters match too much Chinese text to count as a mention
+    return int(bool(name) and len(name) > 1 and name in question)
+
+
+def _reliability(source_id: Optional[str]) -> float:
+    if not source_id:
+        return 0.0
+    for prefix, weight in SOURCE_RELIABILITY.items():
+        if source_id.startswith(prefix):
+            return weight
+    return SOURCE_DEFAULT
@@ -1,5 +1,8 @@
-from fastapi import APIRouter, Query, HTTPException
-from typing import Optional
+import asyncio
+import json
+from fastapi import APIRouter, Query, HTTPException, Request, Body
+from fastapi.responses import StreamingResponse, PlainTextResponse
+from typing import Optional, Awaitable, TypeVar, Dict, Any
 
 from app.models import (
     SubgraphResponse,
@@ -7,18 +10,48 @@ from app.models import (
     LinkedEntity,
     Triple,
     AskRequest,
+    AskBatchRequest,
     AskResponse,
     Citation,
     DebugInfo,
+    ReloadRequest,
+    ReloadResponse,
+    CacheStatsResponse,
+    LogStatsResponse,
 )
 from app.config import settings
-from app.neo4j_client import neo4j_client
+from app.graph_store import graph_store
 from app import entity_linker
 from app import subgraph
 from app import rag_engine
+from app.cache import qa_cache
+from app.logging_utils import qa_log_writer
+from app import metrics
 
 router = APIRouter()
 
+# How often a long-running request checks whether its client went away
+DISCONNECT_POLL_INTERVAL = 0.5
+
+T = TypeVar("T")
+
+
+async def _cancel_on_disconnect(http_request: Request, work: Awaitable[T]) -> T:
+    """Run work, cancelling it (and any in-flight LLM call) if the client disconnects"""
+    task = asyncio.ensure_future(work)
+    try:
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=DISCONNECT_POLL_INTERVAL)
+            if done:
+                return task.result()
+            if await http_request.is_disconnected():
+                task.cancel()
+                # 499: client closed request
+                raise HTTPException(status_code=499, detail="Client disconnected")
+    finally:
+        if not task.done():
+            task.cancel()
+
 
 @router.get("/subgraph", response_model=SubgraphResponse)
 async def get_subgraph(
@@ -27,8 +60,9 @@ async def get_subgraph(
     limit: int = Query(settings.SUBGRAPH_DEFAULT_LIMIT, ge=1, le=100),
 ):
     """Query subgraph by entity name"""
-    # Entity linking
-    linked_entities = await entity_linker.link_entities(query)
+    # Entity linking and subgraph fetch (shares the /ask retrieval cache)
+    result = await rag_engine.retrieve(query, hop=hop, limit=limit)
+    linked_entities = result["linked_entities"]
 
     if not linked_entities:
         return SubgraphResponse(
@@ -40,22 +74,9 @@ async def get_subgraph(
             stats=SubgraphStats(triples=0, nodes=0),
         )
 
-    # Get node IDs
-    node_ids = [e["node_id"] for e in linked_entities]
-
-    # Fetch subgraph
-    raw_triples = await neo4j_client.fetch_subgraph(node_ids, hop=hop, limit=limit)
-
-    # Format triples
-    triples = [
-        Triple(
-            h=t["head"],
-            r=t["relation"],
-            t=t["tail"],
-            source_id=t.get("source_id"),
-        )
-        for t in raw_triples
-    ]
+    ranked = rag_engine.rank_evidence(query, result, limit)
+    triples = subgraph.format_triples(ranked)
+    nodes = {t[k] for t in ranked for k in ("head_id", "tail_id")}
 
     # Build response
     linked = [
@@ -64,31 +85,149 @@ async def get_subgraph(
             node_id=e["node_id"],
             label=e.get("label", ""),
             score=e.get("score", 0.0),
+            match=e.get("match", "exact"),
         )
         for e in linked_entities
     ]
 
-    cypher = f"MATCH (a)-[r]-(b) WHERE a.node_id IN {node_ids} RETURN a,r,b LIMIT {limit}"
-
     return SubgraphResponse(
         query=query,
         hop=hop,
         linked_entities=linked,
         triples=triples,
-        cypher=cypher,
-        stats=SubgraphStats(triples=len(triples), nodes=len(node_ids)),
+        cypher=result["cypher"],
+        stats=SubgraphStats(triples=len(triples), nodes=len(nodes)),
     )
 
 
 @router.post("/ask", response_model=AskResponse)
-async def ask_question(request: AskRequest):
+async def ask_question(request: AskRequest, http_request: Request):
     """Ask a question using GraphRAG"""
     try:
-        result = await rag_engine.answer_question(
-            question=request.question,
-            hop=request.hop,
-            limit=request.limit,
+        result = await _cancel_on_disconnect(
+            http_request,
+            rag_engine.answer_question(
+                question=request.question,
+                hop=request.hop,
+                limit=request.limit,
+            ),
         )
         return result
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+
+
+def _sse(event: str, data: Dict[str, Any]) -> str:
+    """Format one server-sent event"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+@router.post("/ask/stream")
+async def ask_question_stream(request: AskRequest):
+    """
+    Ask a question using GraphRAG, streamed as server-sent events
+
+    Events: entities, evidence, token (repeated), done; error on failure.
+    The pipeline is cancelled when the client disconnects.
+    """
+    async def events():
+        try:
+            async for event, data in rag_engine.stream_answer(
+                question=request.question,
+                hop=request.hop,
+                limit=request.limit,
+            ):
+                yield _sse(event, data)
+        except Exception as e:
+            yield _sse("error", {"detail": str(e)})
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.post("/ask/batch")
+async def ask_batch(request: AskBatchRequest):
+    """
+    Answer many questions, streamed as NDJSON in completion order
+
+    Each line is {"index", "response"} or {"index", "error"}, where index
+    is the question's position in the request. Work stops when the client
+    disconnects.
+    """
+    if len(request.requests) > settings.ASK_BATCH_MAX_SIZE:
+        raise HTTPException(
+            status_code=413,
+            detail=f"At most {settings.ASK_BATCH_MAX_SIZE} questions per batch",
+        )
+
+    async def lines():
+        async for index, result in rag_engine.answer_batch(request.requests):
+            if isinstance(result, Exception):
+                line = {"index": index, "error": str(result)}
+            else:
+                line = {"index": index, "response": result.model_dump()}
+            yield json.dumps(line, ensure_ascii=False) + "\n"
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+
+@router.post("/kg/reload", response_model=ReloadResponse)
+async def reload_kg(request: Optional[ReloadRequest] = Body(default=None)):
+    """
+    Rebuild in-process KG structures after the graph was reloaded
+
+    The embedded graph store re-reads the KG files first.
+
+    With node_ids (from a delta load) only cache entries touching those
+    nodes are dropped, unless a name or alias changed, since that can
+    change how any question links.
+    """
+    node_ids = request.node_ids if request else None
+    before = entity_linker.surface_fingerprint()
+    try:
+        await graph_store.reload()
+        surface_forms = await entity_linker.refresh_gazetteer()
+    except Exception as e:
+        raise HTTPException(status_code=503, detail=str(e))
+
+    surfaces_changed = entity_linker.surface_fingerprint() != before
+    if node_ids is None or surfaces_changed:
+        invalidated = qa_cache.invalidate()
+    else:
+        invalidated = qa_cache.invalidate_nodes(node_ids)
+
+    return ReloadResponse(status="ok", surface_forms=surface_forms, invalidated=invalidated)
+
+
+@router.get("/cache/stats", response_model=CacheStatsResponse)
+async def cache_stats():
+    """Hit/miss counters of the /ask caches"""
+    return qa_cache.stats()
+
+
+@router.get("/logs/stats", response_model=LogStatsResponse)
+async def log_stats():
+    """Queue, drop and rotation counters of the QA log writer"""
+    return qa_log_writer.stats()
+
+
+@router.get("/metrics", response_class=PlainTextResponse)
+async def prometheus_metrics():
+    """Latency histograms and counters in Prometheus text format"""
+    for layer in (qa_cache.retrieval, qa_cache.answer):
+        stats = layer.stats()
+        metrics.CACHE_HITS.set(stats["hits"], layer=layer.name)
+        metrics.CACHE_MISSES.set(stats["misses"], layer=layer.name)
+        metrics.CACHE_HIT_RATE.set(stats["hit_rate"], layer=layer.name)
+    log_stats = qa_log_writer.stats()
+    for state in ("written", "dropped"):
+        metrics.QA_LOG_RECORDS.set(log_stats[state], state=state)
+
+    return PlainTextResponse(
+        metrics.registry.render(), media_type="text/plain; version=0.0.4"
+    )
@@ -0,0 +1,224 @@
+import re
+from typing import List, Dict, Any, Optional, Tuple
+
+from app.config import settings
+from app.synonyms import normalize
+from app.graph_store import graph_store
+from app import entity_linker
+from app import subgraph
+
+# Question cues
+ELIGIBILITY_PATTERN = re.compile(r"能(?:否|不能)?(?:买|购买|投保)|可以(?:买|购买|投保)|可否(?:买|购买|投保)")
+COVERAGE_PATTERN = re.compile(r"承保|覆盖|保障|理赔")
+EXCLUSION_PATTERN = re.compile(r"排除|除外|免责|不保")
+LIST_PATTERN = re.compile(r"哪些|什么")
+# Age ranges ("70岁以上", "60-75岁") are not a single age; leave them to the LLM
+AGE_QUALIFIER_PATTERN = re.compile(r"以上|以下|之间|左右|\d+\s*[-~～到至]\s*\d+")
+# A health condition outside the linked mentions ("高血糖", "帕金森") is one
+# the graph knows nothing about, so no verdict can be certain
+CONDITION_PATTERN = re.compile(
+    r"病|症|患|疾|癌|瘤|炎|高血|低血|血糖|血脂|中风|卒中|梗|衰竭|痴呆|失智|帕金森|残疾|瘫|术后"
+)
+
+# A verdict: {"rule", "answer", "evidence" (raw triples to cite)}
+Verdict = Dict[str, Any]
+
+
+async def evaluate(question: str, retrieval: Dict[str, Any]) -> Optional[Verdict]:
+    """
+    Decide eligibility / coverage questions from the graph alone
+
+    Returns None unless the retrieved triples and product age ranges give
+    a certain answer; the caller then falls back to the LLM. Only exact
+    (name, alias or synonym) links decide: a fuzzy or full-text match may
+    be a different entity, so any such link leaves the question to the LLM.
+    So do truncated (partial) retrievals and questions naming a condition
+    that was not linked.
+    """
+    if not settings.RULE_ENGINE_ENABLED or retrieval.get("partial"):
+        return None
+
+    entities = retrieval["linked_entities"]
+    if not all(_is_exact(e) for e in entities):
+        return None
+    if _unlinked_condition(question, entities):
+        return None
+    products = _unique([e["node_id"] for e in entities if e["label"] == "InsuranceProduct"])
+    diseases = _unique([e["node_id"] for e in entities if e["label"] == "Disease"])
+    age = entity_linker.extract_age(question)
+    if age is not None and AGE_QUALIFIER_PATTERN.search(question):
+        return None
+
+    graph = _EdgeIndex(retrieval["triples"])
+    asks_eligibility = bool(ELIGIBILITY_PATTERN.search(question))
+    asks_exclusion = bool(EXCLUSION_PATTERN.search(question))
+    asks_coverage = bool(COVERAGE_PATTERN.search(question))
+    asks_list = bool(LIST_PATTERN.search(question))
+
+    if len(products) == 1 and asks_eligibility and not asks_list:
+        return await _check_eligibility(graph, products[0], diseases, age)
+
+    if len(products) == 1 and len(diseases) == 1 and (asks_coverage or asks_exclusion) and not asks_list:
+        return _check_coverage(graph, products[0], diseases[0])
+
+    if not products and len(diseases) == 1 and asks_list:
+        if asks_exclusion:
+            return await _list_products("EXCLUDES", diseases[0])
+        if asks_coverage:
+            return await _list_products("COVERS", diseases[0])
+
+    if not products and not diseases and age is not None and asks_list and asks_eligibility:
+        return await _list_by_age(age)
+
+    return None
+
+
+class _EdgeIndex:
+    """Retrieved triples keyed by (head_id, relation, tail_id), plus node names"""
+
+    def __init__(self, triples: List[Dict[str, Any]]):
+        self.edges: Dict[Tuple[str, str, str], Dict[str, Any]] = {}
+        self.names: Dict[str, str] = {}
+        for t in triples:
+            self.edges.setdefault((t["head_id"], t["relation"], t["tail_id"]), t)
+            self.names.setdefault(t["head_id"], t["head"])
+            self.names.setdefault(t["tail_id"], t["tail"])
+
+    def get(self, head_id: str, relation: str, tail_id: str) -> Optional[Dict[str, Any]]:
+        return self.edges.get((head_id, relation, tail_id))
+
+    def name(self, node_id: str) -> str:
+        return self.names.get(node_id, node_id)
+
+
+async def _check_eligibility(
+    graph: _EdgeIndex, product: str, diseases: List[str], age: Optional[int]
+) -> Optional[Verdict]:
+    """Can someone (of this age, with these conditions) buy this product?"""
+    reasons_no: List[Tuple[str, Dict[str, Any]]] = []
+    reasons_yes: List[Tuple[str, Dict[str, Any]]] = []
+    undecided = False
+    name = graph.name(product)
+
+    if age is not None:
+        sets = await graph_store.find_products_by_age(age)
+        record = next(
+            (p for p in sets["eligible"] + sets["ineligible"] if p["node_id"] == product),
+            None,
+        )
+        if record is None:
+            undecided = True
+        else:
+            name = record["name"]
+            fact = subgraph.age_range_triples([record], age)[0]
+            span = f"{record['age_min']}-{record['age_max']}岁"
+            if record in sets["eligible"]:
+                reasons_yes.append((f"{name}的投保年龄为{span}，{age}岁在可投保范围内", fact))
+            else:
+                reasons_no.append((f"{name}的投保年龄为{span}，{age}岁不在可投保范围内", fact))
+
+    for disease in diseases:
+        excludes = graph.get(product, "EXCLUDES", disease)
+        covers = graph.get(product, "COVERS", disease)
+        if excludes and covers:
+            # Conflicting clauses need reading, not a rule
+            undecided = True
+        elif excludes:
+            reasons_no.append((f"{name}将{graph.name(disease)}列为除外责任", excludes))
+        elif covers:
+            reasons_yes.append((f"{name}承保{graph.name(disease)}", covers))
+        else:
+            undecided = True
+
+    if reasons_no:
+        return _verdict("eligibility", f"不可以购买{name}。", reasons_no)
+    if reasons_yes and not undecided:
+        return _verdict("eligibility", f"可以购买{name}。", reasons_yes)
+    return None
+
+
+def _check_coverage(graph: _EdgeIndex, product: str, disease: str) -> Optional[Verdict]:
+    """Does this product cover this disease?"""
+    excludes = graph.get(product, "EXCLUDES", disease)
+    covers = graph.get(product, "COVERS", disease)
+    name, disease_name = graph.name(product), graph.name(disease)
+
+    if excludes and not covers:
+        return _verdict(
+            "coverage",
+            f"{name}不承保{disease_name}。",
+            [(f"{name}将{disease_name}列为除外责任", excludes)],
+        )
+    if covers and not excludes:
+        return _verdict(
+            "coverage",
+            f"{name}承保{disease_name}。",
+            [(f"{name}承保{disease_name}", covers)],
+        )
+    return None
+
+
+async def _list_products(relation: str, disease: str) -> Optional[Verdict]:
+    """Which products cover / exclude this disease? (complete: read from the store, not the trimmed subgraph)"""
+    triples = await graph_store.find_product_edges(relation, disease)
+    if not triples:
+        return None
+
+    verb = "排除" if relation == "EXCLUDES" else "覆盖"
+    disease_name = triples[0]["tail"]
+    names = "、".join(_unique([t["head"] for t in triples]))
+    return _verdict(
+        "product_list",
+        f"以下产品{verb}{disease_name}：{names}。",
+        [(f"{t['head']}{verb}{disease_name}", t) for t in triples],
+    )
+
+
+async def _list_by_age(age: int) -> Verdict:
+    """Which products accept this age? (complete: read from the age index)"""
+    sets = await graph_store.find_products_by_age(age)
+    facts = subgraph.age_range_triples(sets["eligible"] + sets["ineligible"], age)
+    reasons = [
+        (f"{t['head']}的投保年龄为{p['age_min']}-{p['age_max']}岁", t)
+        for p, t in zip(sets["eligible"] + sets["ineligible"], facts)
+    ]
+
+    if sets["eligible"]:
+        names = "、".join(p["name"] for p in sets["eligible"])
+        return _verdict(
+            "age_list",
+            f"{age}岁可以投保的产品有：{names}。",
+            reasons[:len(sets["eligible"])],
+        )
+    return _verdict("age_list", f"没有产品接受{age}岁投保。", reasons)
+
+
+def _verdict(rule: str, conclusion: str, reasons: List[Tuple[str, Dict[str, Any]]]) -> Verdict:
+    """Templated answer in the same 结论/依据 layout the LLM is asked for"""
+    lines = [f"结论：{conclusion}", "依据："]
+    for text, triple in reasons:
+        source = f" [source_id={triple['source_id']}]" if triple.get("source_id") else ""
+        lines.append(f"- {text}{source}")
+    return {
+        "rule": rule,
+        "answer": "\n".join(lines),
+        "evidence": [triple for _, triple in reasons],
+    }
+
+
+def _unlinked_condition(question: str, entities: List[Dict[str, Any]]) -> bool:
+    """Does the question mention a condition outside the linked mentions?"""
+    rest = normalize(question)
+    # Longest first, so "原发性高血压" is removed before "高血压"
+    for mention in sorted({normalize(e.get("mention") or "") for e in entities}, key=len, reverse=True):
+        if mention:
+            rest = rest.replace(mention, " ")
+    return bool(CONDITION_PATTERN.search(rest))
+
+
+def _is_exact(entity: Dict[str, Any]) -> bool:
+    return entity.get("match", "exact") == "exact" and entity.get("score") == 1.0
+
+
+def _unique(items: List[str]) -> List[str]:
+    return list(dict.fromkeys(items))
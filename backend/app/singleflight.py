@@ -0,0 +1,53 @@
+import asyncio
+from typing import Awaitable, Callable, Dict, TypeVar
+
+from app import metrics
+
+T = TypeVar("T")
+
+
+class _Call:
+    def __init__(self, task: asyncio.Future):
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    Share one in-flight call among concurrent callers with the same key
+
+    The first caller starts the call as a task; callers arriving before it
+    finishes await that task instead of starting their own. The call is
+    cancelled only once every waiter has gone (e.g. all clients
+    disconnected), so one caller's cancellation does not fail the others.
+    Nothing is kept after the call finishes; repeat requests are the
+    cache's job.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._calls: Dict[str, _Call] = {}
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[T]]) -> T:
+        call = self._calls.get(key)
+        if call is None:
+            call = _Call(asyncio.ensure_future(fn()))
+            self._calls[key] = call
+            call.task.add_done_callback(lambda _: self._forget(key, call))
+        else:
+            metrics.COALESCED_CALLS.inc(flight=self.name)
+
+        call.waiters += 1
+        try:
+            return await asyncio.shield(call.task)
+        finally:
+            call.waiters -= 1
+            if call.waiters == 0 and not call.task.done():
+                call.task.cancel()
+
+    def _forget(self, key: str, call: _Call) -> None:
+        if self._calls.get(key) is call:
+            del self._calls[key]
+
+    def __len__(self) -> int:
+        return len(self._calls)
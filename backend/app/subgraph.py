@@ -1,4 +1,7 @@
-from typing import List, Dict, Any
+import asyncio
+import math
+from typing import List, Dict, Any, Callable, Awaitable, Optional, Set, Tuple
+
 from app.models import Triple
 
 # Priority order for relations
@@ -10,6 +13,75 @@ RELATION_PRIORITY = [
     "PROVIDES",
 ]
 
+RELATION_RANK = {r: i for i, r in enumerate(RELATION_PRIORITY)}
+
+# One hop of expansion: (frontier, fanout) -> rows with seed_id, from_id,
+# head, relation, tail, head_id, tail_id and source_id
+HopFetcher = Callable[[List[Dict[str, str]], int], Awaitable[List[Dict[str, Any]]]]
+
+
+class HopBatcher:
+    """
+    Merge concurrent hop fetches into one call
+
+    Expansions that fetch a hop in the same event-loop tick (concurrent
+    requests, or the questions of an /ask/batch) share a single fetch over
+    the union of their frontiers, each node once. Every caller gets back
+    the rows for its own frontier, tagged with its own seeds, so the
+    per-seed budgets in expand_khop are unaffected.
+    """
+
+    def __init__(self, fetch_hop: HopFetcher):
+        self.fetch_hop = fetch_hop
+        # fanout -> (frontier, future) of callers waiting for the next fetch
+        self._pending: Dict[int, List[Tuple[List[Dict[str, str]], asyncio.Future]]] = {}
+        # Running flushes (the event loop only keeps weak references to tasks)
+        self._flushes: Set[asyncio.Task] = set()
+
+    async def fetch(self, frontier: List[Dict[str, str]], fanout: int) -> List[Dict[str, Any]]:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        if fanout not in self._pending:
+            self._pending[fanout] = []
+            loop.call_soon(self._start_flush, fanout)
+        self._pending[fanout].append((frontier, future))
+        return await future
+
+    def _start_flush(self, fanout: int) -> None:
+        task = asyncio.ensure_future(self._flush(fanout))
+        self._flushes.add(task)
+        task.add_done_callback(self._flushes.discard)
+
+    async def _flush(self, fanout: int) -> None:
+        waiting = [(f, fut) for f, fut in self._pending.pop(fanout) if not fut.done()]
+        if not waiting:
+            return
+
+        union = list(dict.fromkeys(e["node_id"] for frontier, _ in waiting for e in frontier))
+        try:
+            rows = await self.fetch_hop([{"node_id": n, "seed": n} for n in union], fanout)
+        except Exception as e:
+            for _, fut in waiting:
+                if not fut.done():
+                    fut.set_exception(e)
+            return
+        except BaseException:
+            # Cancelled (e.g. at shutdown): no caller may be left waiting
+            for _, fut in waiting:
+                fut.cancel()
+            raise
+
+        by_node: Dict[str, List[Dict[str, Any]]] = {}
+        for row in rows:
+            by_node.setdefault(row["from_id"], []).append(row)
+        for frontier, fut in waiting:
+            if not fut.done():
+                fut.set_result([
+                    dict(row, seed_id=e["seed"])
+                    for e in frontier
+                    for row in by_node.get(e["node_id"], [])
+                ])
+
 
 def format_triples(raw_triples: List[Dict[str, Any]]) -> List[Triple]:
     """Format raw Neo4j results into Triple objects"""
@@ -26,27 +98,108 @@ def format_triples(raw_triples: List[Dict[str, Any]]) -> List[Triple]:
     return triples
 
 
-def prioritize_triples(triples: List[Triple], topk: int = 20) -> List[Triple]:
+def age_range_triples(products: List[Dict[str, Any]], age: int) -> List[Dict[str, Any]]:
+    """
+    Raw AGE_RANGE triples stating whether each product accepts ``age``
+
+    products come from find_products_by_age (node_id, name, age_min,
+    age_max, source_id).
+    """
+    triples = []
+    for p in products:
+        eligible = p["age_min"] <= age <= p["age_max"]
+        triples.append({
+            "head": p["name"],
+            "relation": "AGE_RANGE",
+            "tail": f"{p['age_min']}-{p['age_max']}岁（{age}岁{'可' if eligible else '不可'}投保）",
+            "source_id": p.get("source_id"),
+            "head_id": p["node_id"],
+            "tail_id": p["node_id"],
+            "seed_id": p["node_id"],
+            "hop": 0,
+        })
+    return triples
+
+
+async def expand_khop(
+    fetch_hop: HopFetcher,
+    node_ids: List[str],
+    hop: int = 2,
+    limit: int = 20,
+    fanout: int = 10,
+    progress: Optional[List[Dict[str, Any]]] = None,
+) -> Dict[str, Any]:
     """
-    Prioritize triples by relation type
-
-    Priority order:
-    1. AGE_RANGE
-    2. EXCLUDES
-    3. COVERS
-    4. TREATS
-    5. PROVIDES
+    Breadth-first k-hop expansion around seed nodes
+
+    - Each seed gets an equal share of ``limit`` so one high-degree node
+      cannot use up the whole evidence budget; budget a seed leaves unused
+      is handed to the others at the end
+    - ``fetch_hop`` caps neighbours per (node, relation type) at ``fanout``
+    - Edges reached along several paths are kept once, and nodes are
+      expanded at most once
+
+    Returns {"triples", "nodes", "frontiers"}, where each triple also
+    records the seed it was reached from and its hop distance. If given,
+    ``progress`` holds the triples found so far after every hop, so a
+    caller that times out can still use the completed hops.
     """
-    # Sort by priority
-    sorted_triples = sorted(
-        triples,
-        key=lambda t: (
-            RELATION_PRIORITY.index(t.r) if t.r in RELATION_PRIORITY else len(RELATION_PRIORITY),
-            -len(t.source_id or ""),  # Prefer with source_id
-        ),
-    )
-
-    return sorted_triples[:topk]
+    seeds = list(dict.fromkeys(node_ids))
+    if not seeds or limit <= 0:
+        return {"triples": [], "nodes": [], "frontiers": []}
+
+    per_seed = max(1, math.ceil(limit / len(seeds)))
+    budget = {seed: per_seed for seed in seeds}
+
+    visited = set(seeds)
+    seen_edges = set()
+    triples: List[Dict[str, Any]] = []
+    overflow: List[Dict[str, Any]] = []
+    frontiers: List[int] = []
+
+    frontier = [{"node_id": seed, "seed": seed} for seed in seeds]
+    for depth in range(1, hop + 1):
+        if not frontier or len(triples) >= limit:
+            break
+        frontiers.append(len(frontier))
+
+        rows = await fetch_hop(frontier, fanout)
+        # Spend budget on the most useful relations first
+        rows.sort(key=lambda r: RELATION_RANK.get(r["relation"], len(RELATION_RANK)))
+
+        next_frontier = []
+        for row in rows:
+            key = (row["head_id"], row["relation"], row["tail_id"])
+            if key in seen_edges:
+                continue
+            seen_edges.add(key)
+
+            triple = dict(row, hop=depth)
+            triple.pop("from_id", None)
+            if budget[row["seed_id"]] <= 0:
+                overflow.append(triple)
+                continue
+            budget[row["seed_id"]] -= 1
+            triples.append(triple)
+
+            neighbor = row["tail_id"] if row["head_id"] == row["from_id"] else row["head_id"]
+            if neighbor not in visited:
+                visited.add(neighbor)
+                next_frontier.append({"node_id": neighbor, "seed": row["seed_id"]})
+
+        frontier = next_frontier
+        if progress is not None:
+            progress[:] = (triples + overflow)[:limit]
+
+    # Redistribute budget left unused by small neighbourhoods
+    triples.extend(overflow[: max(0, limit - len(triples))])
+    triples = triples[:limit]
+
+    nodes = list(dict.fromkeys(
+        node_id for t in triples for node_id in (t["head_id"], t["tail_id"])
+    ))
+
+    return {"triples": triples, "nodes": nodes, "frontiers": frontiers}
 
 
 def get_subgraph_stats(triples: List[Triple], node_ids: List[str]) -> Dict[str, int]:
@@ -0,0 +1,111 @@
+import json
+import logging
+import os
+import time
+import unicodedata
+from typing import List, Dict, Callable, Optional
+
+from app.config import settings, resolve_path
+
+logger = logging.getLogger(__name__)
+
+
+def normalize(text: str) -> str:
+    """
+    Normalize text for matching
+
+    NFKC folds full-width forms to half-width ("ＨＴＮ" -> "HTN"), then
+    casefold lowercases.
+    """
+    return unicodedata.normalize("NFKC", text).casefold()
+
+
+class SynonymIndex:
+    """
+    Bidirectional synonym index over synonyms.json
+
+    Keys expand to their values and every value expands back to its key,
+    with lookups on normalized text in O(1) per mention. The file is
+    re-read when its mtime changes (checked at most once per
+    SYNONYMS_RELOAD_INTERVAL seconds).
+    """
+
+    def __init__(self, path: str, reload_interval: float = 5.0):
+        self.path = path
+        self.reload_interval = reload_interval
+        self.groups: Dict[str, List[str]] = {}
+        self._index: Dict[str, List[str]] = {}
+        self._mtime: Optional[float] = None
+        self._checked_at = 0.0
+        self._listeners: List[Callable[[], None]] = []
+        self.load()
+
+    def load(self) -> None:
+        """(Re)load the synonyms file and rebuild the index"""
+        groups: Dict[str, List[str]] = {}
+        mtime = None
+        if os.path.exists(self.path):
+            mtime = os.path.getmtime(self.path)
+            with open(self.path, "r", encoding="utf-8") as f:
+                groups = json.load(f)
+            if not isinstance(groups, dict) or not all(isinstance(v, list) for v in groups.values()):
+                raise ValueError("expected an object of synonym lists")
+
+        index: Dict[str, List[str]] = {}
+        for key, values in groups.items():
+            for value in values:
+                self._link(index, key, value)
+                self._link(index, value, key)
+
+        self.groups = groups
+        self._index = index
+        self._mtime = mtime
+        self._checked_at = time.monotonic()
+
+    @staticmethod
+    def _link(index: Dict[str, List[str]], term: str, other: str) -> None:
+        expansions = index.setdefault(normalize(term.strip()), [])
+        if other not in expansions:
+            expansions.append(other)
+
+    def maybe_reload(self) -> bool:
+        """
+        Reload if the file changed on disk; returns True when reloaded
+
+        A file that cannot be read (e.g. caught mid-write) is logged and
+        the previous index kept; the next check retries it.
+        """
+        now = time.monotonic()
+        if now - self._checked_at < self.reload_interval:
+            return False
+        self._checked_at = now
+
+        try:
+            mtime = os.path.getmtime(self.path)
+        except OSError:
+            mtime = None
+        if mtime == self._mtime:
+            return False
+
+        try:
+            self.load()
+        except (OSError, ValueError) as e:
+            logger.warning("Keeping previous synonyms, could not load %s: %s", self.path, e)
+            return False
+        for listener in self._listeners:
+            listener()
+        return True
+
+    def add_listener(self, callback: Callable[[], None]) -> None:
+        """Register a callback run after every hot reload"""
+        self._listeners.append(callback)
+
+    def expand(self, mention: str) -> List[str]:
+        """Return the mention followed by its synonyms"""
+        return [mention] + self._index.get(normalize(mention.strip()), [])
+
+
+synonym_index = SynonymIndex(
+    resolve_path(settings.SYNONYMS_FILE),
+    reload_interval=settings.SYNONYMS_RELOAD_INTERVAL,
+)
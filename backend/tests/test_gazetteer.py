@@ -0,0 +1,75 @@
+import csv
+import importlib.util
+import json
+from pathlib import Path
+
+from app.embedded_graph import GraphState, SurfaceLexicon
+from app.gazetteer import Gazetteer
+
+ENTITIES = [
+    {"node_id": "s_001", "name": "日常护理", "label": "Service", "aliases": []},
+    {"node_id": "s_002", "name": "专业护理", "label": "Service", "aliases": []},
+]
+
+BUILD_SNAPSHOT = Path(__file__).resolve().parents[2] / "kg" / "scripts" / "build_snapshot.py"
+
+
+def _linked(gazetteer, text):
+    return {n["node_id"] for m in gazetteer.find_mentions(text) for n in m["nodes"]}
+
+
+def test_synonym_key_links_to_values_and_back():
+    gazetteer = Gazetteer()
+    gazetteer.build(ENTITIES, {"护理服务": ["日常护理", "专业护理"]})
+
+    assert _linked(gazetteer, "有哪些护理服务") == {"s_001", "s_002"}
+    assert _linked(gazetteer, "日常护理") == {"s_001"}
+
+
+def test_synonym_siblings_do_not_link_to_each_other():
+    gazetteer = Gazetteer()
+    gazetteer.build(ENTITIES, {"护理": ["日常护理", "专业护理"]})
+
+    assert _linked(gazetteer, "日常护理多少钱") == {"s_001"}
+    assert _linked(gazetteer, "专业护理多少钱") == {"s_002"}
+
+
+def test_empty_catalog_is_not_ready():
+    gazetteer = Gazetteer()
+    gazetteer.build([], {"护理": ["日常护理"]})
+
+    assert not gazetteer.ready
+
+
+def _snapshot_lexicon(tmp_path, entities):
+    spec = importlib.util.spec_from_file_location("build_snapshot", BUILD_SNAPSHOT)
+    build_snapshot = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(build_snapshot)
+
+    nodes, edges = tmp_path / "nodes.csv", tmp_path / "edges.csv"
+    with open(nodes, "w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["node_id", "label", "name", "aliases_json", "age_min", "age_max"])
+        for e in entities:
+            writer.writerow([e["node_id"], e["label"], e["name"], json.dumps(e["aliases"]), "", ""])
+    edges.write_text("head_id,relation,tail_id,source_id\n", encoding="utf-8")
+
+    path = str(tmp_path / "kg.snapshot")
+    build_snapshot.write_snapshot(build_snapshot.build_sections(str(nodes), str(edges)), path)
+    return SurfaceLexicon(GraphState.from_snapshot(path))
+
+
+def test_snapshot_lexicon_links_like_the_catalog(tmp_path):
+    entities = ENTITIES + [
+        {"node_id": "p_001", "name": "长期护理保险", "label": "InsuranceProduct", "aliases": ["LTC"]},
+    ]
+    synonyms = {"护理服务": ["日常护理", "专业护理"]}
+    from_catalog, from_snapshot = Gazetteer(), Gazetteer()
+    from_catalog.build(entities, synonyms)
+    from_snapshot.build([], synonyms, _snapshot_lexicon(tmp_path, entities))
+
+    assert from_snapshot.ready and from_snapshot.size == from_catalog.size
+    for text in ("有哪些护理服务", "日常护理多少钱", "ltc和专业护理"):
+        assert _linked(from_snapshot, text) == _linked(from_catalog, text)
+    fuzzy = from_snapshot.find_fuzzy("长期护里保险怎么买")
+    assert [n["node_id"] for m in fuzzy for n in m["nodes"]] == ["p_001"]
@@ -0,0 +1,251 @@
+#!/usr/bin/env python3
+"""
+Compile nodes.csv / edges.csv into a binary KG snapshot
+
+The backend's embedded graph store (GRAPH_BACKEND=embedded) can mmap the
+snapshot read-only (KG_SNAPSHOT_PATH) instead of parsing the CSVs, so
+startup does no parsing and every worker on a host shares the same pages.
+
+Layout (version 2, native byte order, all arrays int32):
+- header: magic, version, byte-order mark, section count
+- section table: (offset, length in bytes) per section, in SECTIONS order
+- sections, each 8-byte aligned:
+  - string table: string_offsets + string_blob (UTF-8)
+  - node columns: node_key, node_name, node_label, node_age_min, node_age_max
+  - aliases: alias_offsets, alias_strings (CSR per node)
+  - edge columns: edge_head, edge_tail, edge_rel, edge_source
+  - incident edges: adj_offsets, adj_edges (CSR per node, self loops once)
+  - node_order: node indexes sorted by node_id
+  - surface index: surface_keys (sorted normalized names/aliases),
+    surface_offsets, surface_nodes
+  - age_products: products with both age bounds, sorted by age_min
+  - fuzzy gram postings: fuzzy_forms (surface key positions of the forms
+    fuzzy linking indexes), fuzzy_gram_counts, gram_keys (sorted
+    character bi/trigrams), gram_offsets, gram_forms (fuzzy form ids)
+Missing ages and source ids are -1.
+"""
+
+import argparse
+import csv
+import json
+import os
+import struct
+import sys
+import unicodedata
+from array import array
+
+MAGIC = b"KGSNAP\x00\x00"
+VERSION = 2
+BYTE_ORDER_MARK = 0x01020304
+MISSING = -1
+
+SECTIONS = (
+    "string_offsets", "string_blob",
+    "node_key", "node_name", "node_label", "node_age_min", "node_age_max",
+    "alias_offsets", "alias_strings",
+    "edge_head", "edge_tail", "edge_rel", "edge_source",
+    "adj_offsets", "adj_edges",
+    "node_order",
+    "surface_keys", "surface_offsets", "surface_nodes",
+    "age_products",
+    "fuzzy_forms", "fuzzy_gram_counts", "gram_keys", "gram_offsets", "gram_forms",
+)
+
+HEADER = struct.Struct("=8sIII")
+SECTION_ENTRY = struct.Struct("=QQ")
+ALIGNMENT = 8
+
+# Must match the backend's gazetteer / fuzzy index
+FUZZY_MIN_FORM_LENGTH = 5
+NGRAM_SIZES = (2, 3)
+
+
+def normalize(text: str) -> str:
+    """Same normalization as the backend's synonyms.normalize (NFKC + casefold)"""
+    return unicodedata.normalize("NFKC", text).casefold()
+
+
+def char_ngrams(text: str) -> set:
+    """Same grams as the backend's fuzzy_index.char_ngrams"""
+    grams = {text[i:i + n] for n in NGRAM_SIZES for i in range(len(text) - n + 1)}
+    return grams or ({text} if text else set())
+
+
+def parse_aliases(aliases_json: str) -> list:
+    if not aliases_json:
+        return []
+    try:
+        aliases = json.loads(aliases_json)
+    except json.JSONDecodeError:
+        return []
+    return [a for a in aliases if isinstance(a, str)] if isinstance(aliases, list) else []
+
+
+class StringTable:
+    """Interns strings to int32 indexes"""
+
+    def __init__(self):
+        self.strings = []
+        self.ids = {}
+
+    def intern(self, value: str) -> int:
+        idx = self.ids.get(value)
+        if idx is None:
+            idx = len(self.strings)
+            self.ids[value] = idx
+            self.strings.append(value)
+        return idx
+
+    def encode(self):
+        offsets = array("i", [0])
+        blob = bytearray()
+        for s in self.strings:
+            blob += s.encode("utf-8")
+            offsets.append(len(blob))
+        return offsets, bytes(blob)
+
+
+def build_sections(nodes_file: str, edges_file: str) -> dict:
+    """Parse the CSVs into the snapshot arrays"""
+    table = StringTable()
+    sec = {name: array("i") for name in SECTIONS if name != "string_blob"}
+    sec["alias_offsets"].append(0)
+    node_index = {}
+    aliases_by_node = []
+
+    with open(nodes_file, "r", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            node_index[row["node_id"]] = len(sec["node_key"])
+            sec["node_key"].append(table.intern(row["node_id"]))
+            sec["node_name"].append(table.intern(row["name"]))
+            sec["node_label"].append(table.intern(row["label"]))
+            sec["node_age_min"].append(int(row["age_min"]) if row.get("age_min") else MISSING)
+            sec["node_age_max"].append(int(row["age_max"]) if row.get("age_max") else MISSING)
+            aliases = parse_aliases(row.get("aliases_json"))
+            aliases_by_node.append(aliases)
+            for alias in aliases:
+                sec["alias_strings"].append(table.intern(alias))
+            sec["alias_offsets"].append(len(sec["alias_strings"]))
+
+    skipped = 0
+    with open(edges_file, "r", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            head = node_index.get(row["head_id"])
+            tail = node_index.get(row["tail_id"])
+            if head is None or tail is None:
+                skipped += 1
+                continue
+            sec["edge_head"].append(head)
+            sec["edge_tail"].append(tail)
+            sec["edge_rel"].append(table.intern(row["relation"]))
+            sec["edge_source"].append(table.intern(row["source_id"]) if row.get("source_id") else MISSING)
+    if skipped:
+        print(f"  Skipped {skipped} edges with unknown endpoints")
+
+    node_count = len(sec["node_key"])
+
+    # Incident-edge CSR
+    incident = [[] for _ in range(node_count)]
+    for edge, (head, tail) in enumerate(zip(sec["edge_head"], sec["edge_tail"])):
+        incident[head].append(edge)
+        if tail != head:
+            incident[tail].append(edge)
+    sec["adj_offsets"].append(0)
+    for edges in incident:
+        sec["adj_edges"].extend(edges)
+        sec["adj_offsets"].append(len(sec["adj_edges"]))
+
+    # Sorted indexes
+    node_ids = list(node_index)
+    sec["node_order"].extend(sorted(range(node_count), key=lambda n: node_ids[n]))
+
+    surfaces = {}
+    for node in range(node_count):
+        name = table.strings[sec["node_name"][node]]
+        for form in [name] + aliases_by_node[node]:
+            nodes = surfaces.setdefault(normalize(form.strip()), [])
+            if node not in nodes:
+                nodes.append(node)
+    sec["surface_offsets"].append(0)
+    postings = {}
+    for position, key in enumerate(sorted(surfaces)):
+        sec["surface_keys"].append(table.intern(key))
+        sec["surface_nodes"].extend(surfaces[key])
+        sec["surface_offsets"].append(len(sec["surface_nodes"]))
+        if len(key) >= FUZZY_MIN_FORM_LENGTH:
+            grams = char_ngrams(key)
+            for gram in grams:
+                postings.setdefault(gram, []).append(len(sec["fuzzy_forms"]))
+            sec["fuzzy_forms"].append(position)
+            sec["fuzzy_gram_counts"].append(len(grams))
+    sec["gram_offsets"].append(0)
+    for gram in sorted(postings):
+        sec["gram_keys"].append(table.intern(gram))
+        sec["gram_forms"].extend(postings[gram])
+        sec["gram_offsets"].append(len(sec["gram_forms"]))
+
+    products = [
+        node for node in range(node_count)
+        if table.strings[sec["node_label"][node]] == "InsuranceProduct"
+        and sec["node_age_min"][node] != MISSING
+        and sec["node_age_max"][node] != MISSING
+    ]
+    products.sort(key=lambda n: (sec["node_age_min"][n], table.strings[sec["node_key"][n]]))
+    sec["age_products"].extend(products)
+
+    sec["string_offsets"], sec["string_blob"] = table.encode()
+    return sec
+
+
+def write_snapshot(sections: dict, output: str) -> int:
+    """Write sections atomically; returns the file size"""
+    payloads = [
+        s if isinstance(s, bytes) else s.tobytes()
+        for s in (sections[name] for name in SECTIONS)
+    ]
+
+    offset = HEADER.size + SECTION_ENTRY.size * len(SECTIONS)
+    entries = []
+    for data in payloads:
+        offset += -offset % ALIGNMENT
+        entries.append((offset, len(data)))
+        offset += len(data)
+
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    tmp = output + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(HEADER.pack(MAGIC, VERSION, BYTE_ORDER_MARK, len(SECTIONS)))
+        for entry in entries:
+            f.write(SECTION_ENTRY.pack(*entry))
+        for (start, _), data in zip(entries, payloads):
+            f.write(b"\x00" * (start - f.tell()))
+            f.write(data)
+    os.replace(tmp, output)
+    return offset
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build a binary KG snapshot for the embedded graph store")
+    parser.add_argument("--nodes", default="data/processed/nodes.csv", help="Nodes CSV file")
+    parser.add_argument("--edges", default="data/processed/edges.csv", help="Edges CSV file")
+    parser.add_argument("--output", default="data/processed/kg.snapshot", help="Snapshot file to write")
+    args = parser.parse_args()
+
+    for path in (args.nodes, args.edges):
+        if not os.path.exists(path):
+            print(f"Error: file not found: {path}")
+            sys.exit(1)
+
+    print(f"Building snapshot from {args.nodes} and {args.edges}...")
+    sections = build_sections(args.nodes, args.edges)
+    size = write_snapshot(sections, args.output)
+
+    print(f"  Nodes: {len(sections['node_key'])}")
+    print(f"  Edges: {len(sections['edge_head'])}")
+    print(f"  Strings: {len(sections['string_offsets']) - 1}")
+    print(f"  Surface forms: {len(sections['surface_keys'])} ({len(sections['fuzzy_forms'])} fuzzy)")
+    print(f"Wrote {args.output} ({size} bytes, format v{VERSION})")
+
+
+if __name__ == "__main__":
+    main()
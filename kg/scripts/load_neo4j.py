@@ -2,152 +2,420 @@
 """
 Load data into Neo4j
 
+Rows are grouped by label / relation type and written as `UNWIND $rows`
+batches inside explicit write transactions. Constraints and indexes are
+created before loading so every MERGE/MATCH on node_id is an index seek.
+
+Every successful load writes a manifest of per-node and per-edge content
+hashes. With --mode delta the CSVs are compared against it and only
+inserts, updates and deletes are applied.
+
 Usage:
     python load_neo4j.py --uri bolt://localhost:7687 --user neo4j --password your_password
+    python load_neo4j.py --mode delta --notify-url http://localhost:8000
 """
 
 import csv
 import json
 import os
+import re
+import time
+import hashlib
 import argparse
+import urllib.request
+from collections import defaultdict
+from datetime import datetime
 from neo4j import GraphDatabase
 
 
-def load_nodes(driver, nodes_file: str):
-    """Load nodes into Neo4j"""
-    print(f"Loading nodes from {nodes_file}...")
+KNOWN_LABELS = {"Disease", "Drug", "InsuranceProduct", "ElderCareOrg", "Service"}
+
+# Node properties copied from nodes.csv (besides node_id)
+INT_PROPERTIES = ("age_min", "age_max")
+STR_PROPERTIES = ("product_id", "org_id", "city", "source_id")
+
+# Labels and relation types are interpolated into Cypher, so only allow identifiers
+IDENTIFIER = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
+
+MANIFEST_VERSION = 1
+
+# Full-text index over every label's name and aliases, queried by the backend
+# (NEO4J_FULLTEXT_INDEX). The cjk analyzer indexes Chinese as character
+# bigrams, so mentions match inside longer names without segmentation.
+FULLTEXT_INDEX = "entity_names"
+FULLTEXT_ANALYZER = "cjk"
+
+
+def check_identifier(name: str) -> str:
+    """Return name if it is safe to use as a Cypher label / relation type"""
+    if not IDENTIFIER.match(name or ""):
+        raise ValueError(f"Invalid label or relation type: {name!r}")
+    return name
+
+
+def node_label(node: dict) -> str:
+    """Neo4j label for a node row (unknown labels are stored as :Entity)"""
+    return node["label"] if node["label"] in KNOWN_LABELS else "Entity"
+
+
+def node_properties(node: dict) -> dict:
+    """Properties to SET on a node"""
+    props = {"name": node["name"]}
+    if node_label(node) == "Entity":
+        props["label"] = node["label"]
+
+    for key in INT_PROPERTIES:
+        if node.get(key):
+            props[key] = int(node[key])
+    for key in STR_PROPERTIES:
+        if node.get(key):
+            props[key] = node[key]
+
+    # Add aliases if exists
+    if node.get("aliases_json"):
+        try:
+            aliases = json.loads(node["aliases_json"])
+            if aliases:
+                props["aliases"] = aliases
+        except json.JSONDecodeError:
+            pass
+
+    return props
+
+
+def read_csv(path: str) -> list:
+    """Read a CSV file into a list of dicts"""
+    with open(path, "r", encoding="utf-8") as f:
+        return list(csv.DictReader(f))
 
-    with open(nodes_file, "r", encoding="utf-8") as f:
-        reader = csv.DictReader(f)
-        nodes = list(reader)
 
-    # Batch insert
-    query = """
-    MERGE (n:Entity {node_id: $node_id})
-    SET n.name = $name,
-        n.label = $label
+def chunks(rows: list, size: int):
+    """Split rows into batches of at most size"""
+    for i in range(0, len(rows), size):
+        yield rows[i:i + size]
+
+
+def run_batches(driver, query: str, rows: list, batch_size: int) -> int:
+    """Run query once per batch of rows, each batch in its own write transaction"""
+    def work(tx, batch):
+        tx.run(query, rows=batch).consume()
+
+    with driver.session() as session:
+        for batch in chunks(rows, batch_size):
+            session.execute_write(work, batch)
+
+    return len(rows)
+
+
+def report(what: str, count: int, started: float):
+    """Print count and throughput"""
+    elapsed = max(time.perf_counter() - started, 1e-9)
+    print(f"  ✓ Loaded {count} {what} in {elapsed:.2f}s ({count / elapsed:,.0f} rows/s)")
+
+
+def upsert_nodes(driver, nodes: list, batch_size: int) -> int:
+    """
+    MERGE nodes by node_id, one UNWIND query per label
+
+    Properties are replaced, not merged, so a value dropped from the CSV
+    (aliases, age bounds, ...) is removed from the node.
+    """
+    by_label = defaultdict(list)
+    for node in nodes:
+        by_label[node_label(node)].append({
+            "node_id": node["node_id"],
+            "props": dict(node_properties(node), node_id=node["node_id"]),
+        })
+
+    count = 0
+    for label, rows in by_label.items():
+        query = f"""
+        UNWIND $rows AS row
+        MERGE (n:`{check_identifier(label)}` {{node_id: row.node_id}})
+        SET n = row.props
+        """
+        count += run_batches(driver, query, rows, batch_size)
+
+    return count
+
+
+def upsert_edges(driver, edges: list, labels: dict, batch_size: int) -> int:
+    """
+    MERGE edges, one UNWIND query per (head label, relation, tail label)
+
+    labels maps node_id -> label so both endpoints are matched through the
+    node_id constraint of their label.
+    """
+    groups = defaultdict(list)
+    for edge in edges:
+        key = (labels.get(edge["head_id"]), edge["relation"], labels.get(edge["tail_id"]))
+        groups[key].append({
+            "head_id": edge["head_id"],
+            "tail_id": edge["tail_id"],
+            "source_id": edge.get("source_id", ""),
+        })
+
+    count = 0
+    for (head_label, rel_type, tail_label), rows in groups.items():
+        head = f":`{check_identifier(head_label)}`" if head_label else ""
+        tail = f":`{check_identifier(tail_label)}`" if tail_label else ""
+        query = f"""
+        UNWIND $rows AS row
+        MATCH (a{head} {{node_id: row.head_id}})
+        MATCH (b{tail} {{node_id: row.tail_id}})
+        MERGE (a)-[r:`{check_identifier(rel_type)}`]->(b)
+        SET r.source_id = row.source_id
+        """
+        count += run_batches(driver, query, rows, batch_size)
+
+    return count
+
+
+def delete_nodes(driver, node_ids: list, labels: dict, batch_size: int) -> int:
+    """DETACH DELETE nodes by node_id, one UNWIND query per label"""
+    by_label = defaultdict(list)
+    for node_id in node_ids:
+        by_label[labels[node_id]].append({"node_id": node_id})
+
+    count = 0
+    for label, rows in by_label.items():
+        query = f"""
+        UNWIND $rows AS row
+        MATCH (n:`{check_identifier(label)}` {{node_id: row.node_id}})
+        DETACH DELETE n
+        """
+        count += run_batches(driver, query, rows, batch_size)
+
+    return count
+
+
+def delete_edges(driver, keys: list, labels: dict, batch_size: int) -> int:
+    """Delete edges by (head_id, relation, tail_id) key"""
+    groups = defaultdict(list)
+    for key in keys:
+        head_id, rel_type, tail_id = key.split("|")
+        groups[(labels.get(head_id), rel_type, labels.get(tail_id))].append({
+            "head_id": head_id,
+            "tail_id": tail_id,
+        })
+
+    count = 0
+    for (head_label, rel_type, tail_label), rows in groups.items():
+        head = f":`{check_identifier(head_label)}`" if head_label else ""
+        tail = f":`{check_identifier(tail_label)}`" if tail_label else ""
+        query = f"""
+        UNWIND $rows AS row
+        MATCH (a{head} {{node_id: row.head_id}})-[r:`{check_identifier(rel_type)}`]->(b{tail} {{node_id: row.tail_id}})
+        DELETE r
+        """
+        count += run_batches(driver, query, rows, batch_size)
+
+    return count
+
+
+def prune_stale(driver, nodes: list, edges: list, batch_size: int) -> int:
+    """
+    Delete what a full load would not recreate (run before loading)
+
+    Removes edges missing from edges.csv, and nodes missing from nodes.csv
+    or stored under a different label than the CSV now gives them.
     """
+    labels = {n["node_id"]: node_label(n) for n in nodes}
+    keys = {edge_key(e) for e in edges}
 
     with driver.session() as session:
-        # Add properties based on label
-        for node in nodes:
-            label = node["label"]
-
-            # Build query based on label
-            if label == "InsuranceProduct":
-                q = """
-                MERGE (n:InsuranceProduct {node_id: $node_id})
-                SET n.name = $name
-                """
-                params = {"node_id": node["node_id"], "name": node["name"]}
-                if node.get("age_min"):
-                    params["age_min"] = int(node["age_min"])
-                if node.get("age_max"):
-                    params["age_max"] = int(node["age_max"])
-                if node.get("product_id"):
-                    params["product_id"] = node["product_id"]
-            elif label == "Disease":
-                q = """
-                MERGE (n:Disease {node_id: $node_id})
-                SET n.name = $name
-                """
-                params = {"node_id": node["node_id"], "name": node["name"]}
-            elif label == "Drug":
-                q = """
-                MERGE (n:Drug {node_id: $node_id})
-                SET n.name = $name
-                """
-                params = {"node_id": node["node_id"], "name": node["name"]}
-            elif label == "ElderCareOrg":
-                q = """
-                MERGE (n:ElderCareOrg {node_id: $node_id})
-                SET n.name = $name
-                """
-                params = {"node_id": node["node_id"], "name": node["name"]}
-                if node.get("city"):
-                    params["city"] = node["city"]
-            elif label == "Service":
-                q = """
-                MERGE (n:Service {node_id: $node_id})
-                SET n.name = $name
-                """
-                params = {"node_id": node["node_id"], "name": node["name"]}
-            else:
-                q = """
-                MERGE (n:Entity {node_id: $node_id})
-                SET n.name = $name, n.label = $label
-                """
-                params = {"node_id": node["node_id"], "name": node["name"], "label": label}
-
-            session.run(q, **params)
-
-            # Add aliases if exists
-            if node.get("aliases_json"):
-                try:
-                    aliases = json.loads(node["aliases_json"])
-                    if aliases:
-                        session.run(
-                            """
-                            MATCH (n {node_id: $node_id})
-                            SET n.aliases = $aliases
-                            """,
-                            node_id=node["node_id"],
-                            aliases=aliases,
-                        )
-                except json.JSONDecodeError:
-                    pass
-
-    print(f"  ✓ Loaded {len(nodes)} nodes")
-
-
-def load_edges(driver, edges_file: str):
+        stored_labels = {
+            r["node_id"]: r["label"]
+            for r in session.run(
+                "MATCH (n) WHERE n.node_id IS NOT NULL "
+                "RETURN n.node_id AS node_id, labels(n)[0] AS label"
+            )
+        }
+        stored_keys = {
+            r["key"]
+            for r in session.run(
+                "MATCH (a)-[r]->(b) "
+                "WHERE a.node_id IS NOT NULL AND b.node_id IS NOT NULL "
+                "RETURN a.node_id + '|' + type(r) + '|' + b.node_id AS key"
+            )
+        }
+
+    stale_edges = sorted(k for k in stored_keys if k not in keys)
+    stale_nodes = sorted(k for k, label in stored_labels.items() if labels.get(k) != label)
+    print(f"Pruning {len(stale_edges)} stale edges and {len(stale_nodes)} stale nodes...")
+
+    count = delete_edges(driver, stale_edges, stored_labels, batch_size)
+    count += delete_nodes(driver, stale_nodes, stored_labels, batch_size)
+    return count
+
+
+def load_nodes(driver, nodes: list, batch_size: int):
+    """Load nodes into Neo4j"""
+    print(f"Loading {len(nodes)} nodes...")
+
+    started = time.perf_counter()
+    count = upsert_nodes(driver, nodes, batch_size)
+    report("nodes", count, started)
+
+
+def load_edges(driver, edges: list, labels: dict, batch_size: int):
     """Load edges into Neo4j"""
-    print(f"Loading edges from {edges_file}...")
-
-    with open(edges_file, "r", encoding="utf-8") as f:
-        reader = csv.DictReader(f)
-        edges = list(reader)
-
-    # Map relation to Cypher type
-    relation_map = {
-        "TREATS": "TREATS",
-        "COVERS": "COVERS",
-        "EXCLUDES": "EXCLUDES",
-        "AGE_RANGE": "AGE_RANGE",
-        "PROVIDES": "PROVIDES",
+    print(f"Loading {len(edges)} edges...")
+
+    started = time.perf_counter()
+    count = upsert_edges(driver, edges, labels, batch_size)
+    report("edges", count, started)
+
+
+def edge_key(edge: dict) -> str:
+    """Identity of an edge: head_id|relation|tail_id"""
+    return f"{edge['head_id']}|{edge['relation']}|{edge['tail_id']}"
+
+
+def content_hash(data: dict) -> str:
+    """Stable hash of a row's loaded content"""
+    payload = json.dumps(data, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+def build_manifest(nodes: list, edges: list) -> dict:
+    """Per-node and per-edge content hashes of what is being loaded"""
+    return {
+        "version": MANIFEST_VERSION,
+        "loaded_at": datetime.now().isoformat(),
+        "nodes": {
+            n["node_id"]: {
+                "label": node_label(n),
+                "hash": content_hash({"label": node_label(n), "props": node_properties(n)}),
+            }
+            for n in nodes
+        },
+        "edges": {
+            edge_key(e): content_hash({"source_id": e.get("source_id", "")})
+            for e in edges
+        },
     }
 
-    with driver.session() as session:
-        for edge in edges:
-            rel_type = edge["relation"]
-            cypher_type = relation_map.get(rel_type, rel_type)
 
-            query = f"""
-            MATCH (a {{node_id: $head_id}})
-            MATCH (b {{node_id: $tail_id}})
-            MERGE (a)-[r:{cypher_type}]->(b)
-            SET r.source_id = $source_id
-            """
+def read_manifest(path: str):
+    """Manifest of the last successful load, or None"""
+    if not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        manifest = json.load(f)
+    if manifest.get("version") != MANIFEST_VERSION:
+        return None
+    return manifest
 
-            session.run(
-                query,
-                head_id=edge["head_id"],
-                tail_id=edge["tail_id"],
-                source_id=edge.get("source_id", ""),
-            )
 
-    print(f"  ✓ Loaded {len(edges)} edges")
+def save_manifest(path: str, manifest: dict):
+    """Write the manifest atomically"""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False)
+    os.replace(tmp, path)
 
 
-def create_indexes(driver):
-    """Create indexes"""
-    print("Creating indexes...")
+def sync_delta(driver, nodes: list, edges: list, old: dict, new: dict, batch_size: int) -> set:
+    """
+    Apply only what changed since the manifest `old`
+
+    Returns the node_ids whose node or incident edges changed.
+    """
+    old_nodes, new_nodes = old["nodes"], new["nodes"]
+    old_edges, new_edges = old["edges"], new["edges"]
+    old_labels = {k: v["label"] for k, v in old_nodes.items()}
+    new_labels = {k: v["label"] for k, v in new_nodes.items()}
+
+    # A label change means the node has to be re-created under its new label
+    relabeled = {k for k in new_nodes if k in old_nodes and old_labels[k] != new_labels[k]}
+    deleted_nodes = [k for k in old_nodes if k not in new_nodes] + sorted(relabeled)
+    upserted_nodes = {
+        k for k, v in new_nodes.items()
+        if k not in old_nodes or old_nodes[k]["hash"] != v["hash"]
+    }
+
+    deleted_edges = [k for k in old_edges if k not in new_edges]
+    upserted_edges = {
+        k for k, h in new_edges.items()
+        if old_edges.get(k) != h or set(k.split("|")[::2]) & relabeled
+    }
+
+    print(
+        f"Delta: nodes +/~{len(upserted_nodes)} -{len(deleted_nodes) - len(relabeled)}, "
+        f"edges +/~{len(upserted_edges)} -{len(deleted_edges)}"
+    )
+
+    started = time.perf_counter()
+    count = delete_edges(driver, deleted_edges, old_labels, batch_size)
+    count += delete_nodes(driver, deleted_nodes, old_labels, batch_size)
+    count += upsert_nodes(driver, [n for n in nodes if n["node_id"] in upserted_nodes], batch_size)
+    count += upsert_edges(driver, [e for e in edges if edge_key(e) in upserted_edges], new_labels, batch_size)
+    report("changes", count, started)
+
+    changed = set(upserted_nodes) | set(deleted_nodes)
+    for key in list(upserted_edges) + deleted_edges:
+        head_id, _, tail_id = key.split("|")
+        changed.update((head_id, tail_id))
+    return changed
+
+
+def notify_backend(backend_url: str, node_ids=None):
+    """Tell the running backend to refresh (only node_ids, if given)"""
+    body = {"node_ids": sorted(node_ids)} if node_ids is not None else {}
+    request = urllib.request.Request(
+        f"{backend_url.rstrip('/')}/api/v1/kg/reload",
+        data=json.dumps(body).encode("utf-8"),
+        headers={"Content-Type": "application/json"},
+        method="POST",
+    )
+    try:
+        with urllib.request.urlopen(request, timeout=30) as response:
+            print(f"  ✓ Backend notified: {response.read().decode('utf-8')}")
+    except Exception as e:
+        print(f"  ⚠ Could not notify backend at {backend_url}: {e}")
+
+
+def create_indexes(driver, labels=None):
+    """Create node_id constraints, name indexes, the name/alias full-text index and the product age indexes (run before loading)"""
+    print("Creating constraints and indexes...")
+
+    labels = sorted(set(labels or KNOWN_LABELS) | {"Entity"})
 
     with driver.session() as session:
-        session.run("CREATE INDEX node_id_index IF NOT EXISTS FOR (n:Entity) ON (n.node_id)")
-        session.run("CREATE INDEX name_index IF NOT EXISTS FOR (n:Entity) ON (n.name)")
+        # Older loads created a plain index on :Entity(node_id), which
+        # would conflict with the uniqueness constraint below
+        session.run("DROP INDEX node_id_index IF EXISTS")
 
-    print("  ✓ Indexes created")
+        for label in labels:
+            check_identifier(label)
+            session.run(
+                f"CREATE CONSTRAINT {label.lower()}_node_id IF NOT EXISTS "
+                f"FOR (n:`{label}`) REQUIRE n.node_id IS UNIQUE"
+            )
+            session.run(
+                f"CREATE INDEX {label.lower()}_name IF NOT EXISTS "
+                f"FOR (n:`{label}`) ON (n.name)"
+            )
+        # Name/alias lookup in the backend (find_nodes_by_mentions)
+        session.run(
+            f"CREATE FULLTEXT INDEX {FULLTEXT_INDEX} IF NOT EXISTS "
+            f"FOR (n:{'|'.join(f'`{label}`' for label in labels)}) ON EACH [n.name, n.aliases] "
+            f"OPTIONS {{indexConfig: {{`fulltext.analyzer`: '{FULLTEXT_ANALYZER}'}}}}"
+        )
+        # Age filters in the backend (find_products_by_age). One index per
+        # bound, so either range predicate can seek; older loads created a
+        # composite index, which only seeks on age_min
+        session.run("DROP INDEX insuranceproduct_age_range IF EXISTS")
+        for bound in ("age_min", "age_max"):
+            session.run(
+                f"CREATE INDEX insuranceproduct_{bound} IF NOT EXISTS "
+                f"FOR (n:InsuranceProduct) ON (n.{bound})"
+            )
+        session.run("CALL db.awaitIndexes()")
+
+    print("  ✓ Constraints and indexes created")
 
 
 def verify_data(driver):
@@ -174,26 +442,45 @@ def verify_data(driver):
 
 def main():
     parser = argparse.ArgumentParser(description="Load data into Neo4j")
-    parser.add_argument("--uri", default="bolt://localhost:7687", help="Neo4j URI")
-    parser.add_argument("--user", default="neo4j", help="Neo4j user")
-    parser.add_argument("--password", default="neo4j_password", help="Neo4j password")
+    parser.add_argument("--uri", default=os.environ.get("NEO4J_URI", "bolt://localhost:7687"), help="Neo4j URI")
+    parser.add_argument("--user", default=os.environ.get("NEO4J_USER", "neo4j"), help="Neo4j user")
+    parser.add_argument("--password", default=os.environ.get("NEO4J_PASSWORD", "neo4j_password"), help="Neo4j password")
     parser.add_argument("--nodes", default="data/processed/nodes.csv", help="Nodes CSV file")
     parser.add_argument("--edges", default="data/processed/edges.csv", help="Edges CSV file")
+    parser.add_argument("--batch-size", type=int, default=5000, help="Rows per UNWIND transaction")
+    parser.add_argument("--mode", choices=["full", "delta"], default="full", help="Full reload or apply changes since last load")
+    parser.add_argument("--manifest", default="data/processed/load_manifest.json", help="Manifest of the last successful load")
+    parser.add_argument("--notify-url", default=os.environ.get("BACKEND_URL"), help="Backend URL to notify after loading")
     args = parser.parse_args()
 
     # Change to script directory
     os.chdir(os.path.dirname(os.path.abspath(__file__)))
     os.chdir("..")  # Go to kg/ directory
 
+    nodes = read_csv(args.nodes)
+    edges = read_csv(args.edges)
+    manifest = build_manifest(nodes, edges)
+
+    previous = read_manifest(args.manifest) if args.mode == "delta" else None
+    if args.mode == "delta" and previous is None:
+        print(f"No usable manifest at {args.manifest}, falling back to a full load")
+
     # Connect to Neo4j
     print(f"Connecting to Neo4j at {args.uri}...")
     driver = GraphDatabase.driver(args.uri, auth=(args.user, args.password))
 
     try:
         # Load data
-        load_nodes(driver, args.nodes)
-        load_edges(driver, args.edges)
         create_indexes(driver)
+        if previous is not None:
+            changed = sync_delta(driver, nodes, edges, previous, manifest, args.batch_size)
+        else:
+            labels = {n["node_id"]: node_label(n) for n in nodes}
+            prune_stale(driver, nodes, edges, args.batch_size)
+            load_nodes(driver, nodes, args.batch_size)
+            load_edges(driver, edges, labels, args.batch_size)
+            changed = None
+        save_manifest(args.manifest, manifest)
         verify_data(driver)
 
         print("\n✓ Data loaded successfully!")
@@ -204,6 +491,9 @@ def main():
     finally:
         driver.close()
 
+    if args.notify_url:
+        notify_backend(args.notify_url, changed)
+
 
 if __name__ == "__main__":
     main()
@@ -71,8 +71,8 @@ def generate_nodes() -> list:
 
     # Elder Care Organizations
     orgs = [
-        ("o_001", "ElderCareOrg", "XX养老院", None, None, None, None, "北京", "doc_006"),
-        ("o_002", "ElderCareOrg", "爱心护理中心", None, None, None, None, "上海", "doc_006"),
+        ("o_001", "ElderCareOrg", "XX养老院", None, None, None, None, None, "北京", "doc_006"),
+        ("o_002", "ElderCareOrg", "爱心护理中心", None, None, None, None, None, "上海", "doc_006"),
         ("o_003", "ElderCareOrg", "康养社区", '["养老社区"]', None, None, None, None, "深圳", "doc_006"),
     ]
     for o in orgs:
@@ -0,0 +1,454 @@
+#!/usr/bin/env python3
+"""
+Load-test the GraphRAG /ask endpoint
+
+Replays questions (docs/eval_questions.json, or a JSONL trace such as
+qa_logs.jsonl) either at a fixed concurrency (closed loop) or at a target
+arrival rate (open loop), then reports throughput, latency percentiles,
+error rate and the per-stage breakdown from the response debug timings.
+
+With --offline the app runs in-process on the embedded graph store and the
+mock LLM, so no Neo4j, LLM provider or running server is needed.
+
+Usage:
+    # Against a running backend, 8 requests in flight
+    python scripts/benchmark.py --backend-url http://localhost:8000 --concurrency 8 --requests 200
+
+    # Offline, 20 requests/s (Poisson arrivals) for 30 seconds
+    python scripts/benchmark.py --offline --rate 20 --duration 30
+
+    # Replay a QA log at its recorded pace and compare with a baseline
+    python scripts/benchmark.py --offline --trace data/logs/qa_logs.jsonl --replay-timing \\
+        --baseline data/benchmarks/baseline.json
+
+    # Sequential demo run that keeps every answer (what run_demo.py used to do)
+    python scripts/benchmark.py --concurrency 1 --responses-file data/logs/demo_results.jsonl
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from contextlib import asynccontextmanager
+from datetime import datetime
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+import httpx
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BACKEND_DIR = os.path.join(REPO_ROOT, "backend")
+
+# Summary fields compared against a baseline, and whether higher is better
+COMPARED_FIELDS = [
+    ("throughput_rps", True),
+    ("latency_ms.p50", False),
+    ("latency_ms.p95", False),
+    ("latency_ms.p99", False),
+    ("error_rate", False),
+]
+
+
+def load_questions(questions_file: str, trace_file: Optional[str] = None) -> List[Dict[str, Any]]:
+    """
+    Questions to replay, in order
+
+    A trace is JSONL with a "question" per line and optionally "hop",
+    "limit" and an ISO "timestamp" (qa_logs.jsonl has the latter). Each
+    item gets "offset": seconds after the first timestamped line, or None.
+    """
+    if not trace_file:
+        with open(questions_file, "r", encoding="utf-8") as f:
+            return [dict(q, offset=None) for q in json.load(f) if q.get("question")]
+
+    items = []
+    first = None
+    with open(trace_file, "r", encoding="utf-8") as f:
+        for n, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            record = json.loads(line)
+            if not record.get("question"):
+                continue
+            offset = None
+            if record.get("timestamp"):
+                ts = datetime.fromisoformat(record["timestamp"]).timestamp()
+                first = ts if first is None else first
+                offset = ts - first
+            items.append({
+                "id": record.get("id", n),
+                "question": record["question"],
+                "category": record.get("category"),
+                "hop": record.get("hop"),
+                "limit": record.get("limit"),
+                "offset": offset,
+            })
+    return items
+
+
+def percentile(values: List[float], p: float) -> Optional[float]:
+    """p-th percentile (0-100) with linear interpolation"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = (len(ordered) - 1) * p / 100
+    low = int(rank)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+
+
+def _distribution(values: List[float]) -> Dict[str, Optional[float]]:
+    def r(v):
+        return round(v, 2) if v is not None else None
+
+    return {
+        "mean": r(sum(values) / len(values)) if values else None,
+        "p50": r(percentile(values, 50)),
+        "p95": r(percentile(values, 95)),
+        "p99": r(percentile(values, 99)),
+        "max": r(max(values)) if values else None,
+    }
+
+
+@asynccontextmanager
+async def offline_client(args) -> AsyncIterator[httpx.AsyncClient]:
+    """The app in-process on the embedded graph store and mock LLM"""
+    if args.snapshot:
+        graph_files = {"KG_SNAPSHOT_PATH": os.path.abspath(args.snapshot)}
+    else:
+        for path in (args.nodes, args.edges):
+            if not os.path.exists(path):
+                sys.exit(f"❌ {path} not found (run kg/scripts/make_sample_data.py or pass --nodes/--edges)")
+        graph_files = {
+            "KG_NODES_FILE": os.path.abspath(args.nodes),
+            "KG_EDGES_FILE": os.path.abspath(args.edges),
+        }
+
+    with tempfile.TemporaryDirectory(prefix="graphrag-bench-") as log_dir:
+        # Settings are read at import time, so configure before importing the app
+        os.environ.update(graph_files)
+        os.environ.update({
+            "GRAPH_BACKEND": "embedded",
+            "LLM_PROVIDER": "mock",
+            "LOG_DIR": log_dir,
+            "CACHE_BACKEND": "memory" if args.cache else "none",
+            "METRICS_DEBUG_TIMINGS": "true",
+        })
+        sys.path.insert(0, BACKEND_DIR)
+        from app.main import app
+
+        async with app.router.lifespan_context(app):
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(
+                transport=transport, base_url="http://benchmark", timeout=args.timeout
+            ) as client:
+                yield client
+
+
+@asynccontextmanager
+async def remote_client(args) -> AsyncIterator[httpx.AsyncClient]:
+    limits = httpx.Limits(max_connections=None, max_keepalive_connections=None)
+    async with httpx.AsyncClient(
+        base_url=args.backend_url, timeout=args.timeout, limits=limits
+    ) as client:
+        print(f"Checking backend at {args.backend_url}...")
+        try:
+            health = (await client.get("/health", timeout=5)).json()
+        except Exception as e:
+            sys.exit(f"❌ Cannot connect to backend: {e}")
+        print(f"Health: {health}")
+        if health.get("status") != "ok":
+            print("⚠️  Backend is degraded; errors below may come from its dependencies")
+        yield client
+
+
+async def send(client: httpx.AsyncClient, item: Dict[str, Any], args, started: float) -> Dict[str, Any]:
+    """
+    POST one question; latency counts from ``started``
+
+    Open-loop callers pass the scheduled send time, so queueing behind a
+    slow server shows up as latency instead of being hidden.
+    """
+    record = {
+        "timestamp": datetime.now().isoformat(),
+        "question_id": item.get("id"),
+        "question": item["question"],
+        "category": item.get("category"),
+    }
+    try:
+        response = await client.post(
+            "/api/v1/ask",
+            json={
+                "question": item["question"],
+                "hop": item.get("hop") or args.hop,
+                "limit": item.get("limit") or args.limit,
+            },
+        )
+        response.raise_for_status()
+        result = response.json()
+        debug = result.get("debug") or {}
+        record.update({
+            "status": "success",
+            "answer": result.get("answer"),
+            "confidence": result.get("confidence"),
+            "citations_count": len(result.get("citations", [])),
+            "answered_by": debug.get("answered_by"),
+            "partial": debug.get("partial", False),
+            "timings": debug.get("timings") or {},
+        })
+        # The API reports LLM failures as an answer, not an HTTP error
+        if (result.get("answer") or "").startswith("Error:"):
+            record["status"] = "error"
+            record["error"] = result["answer"]
+    except Exception as e:
+        record.update({"status": "error", "error": f"{type(e).__name__}: {e}"})
+    record["latency_ms"] = round((time.perf_counter() - started) * 1000, 2)
+    return record
+
+
+async def run_closed_loop(client, items, args) -> List[Dict[str, Any]]:
+    """``concurrency`` workers, each sending its next question as soon as the last returns"""
+    records: List[Dict[str, Any]] = []
+    total = args.requests or (None if args.duration else len(items))
+    ends_at = time.perf_counter() + args.duration if args.duration else None
+    sent = 0
+
+    async def worker():
+        nonlocal sent
+        while (total is None or sent < total) and (ends_at is None or time.perf_counter() < ends_at):
+            item = items[sent % len(items)]
+            sent += 1
+            records.append(await send(client, item, args, time.perf_counter()))
+
+    await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+    return records
+
+
+def arrival_offsets(items, args) -> List[float]:
+    """Send times (seconds from start) for open-loop runs"""
+    if args.replay_timing:
+        if any(item["offset"] is None for item in items):
+            sys.exit("❌ --replay-timing needs a trace with a timestamp on every line")
+        return [item["offset"] / args.speedup for item in items]
+
+    total = args.requests or (None if args.duration else len(items))
+    offsets, t = [], 0.0
+    while (total is None or len(offsets) < total) and (not args.duration or t < args.duration):
+        offsets.append(t)
+        t += random.expovariate(args.rate) if args.arrivals == "poisson" else 1 / args.rate
+    return offsets
+
+
+async def run_open_loop(client, items, args) -> List[Dict[str, Any]]:
+    """Send on a fixed schedule whether or not earlier requests have finished"""
+    offsets = arrival_offsets(items, args)
+    start = time.perf_counter()
+    tasks = []
+    for i, offset in enumerate(offsets):
+        delay = start + offset - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        tasks.append(asyncio.create_task(send(client, items[i % len(items)], args, start + offset)))
+    return list(await asyncio.gather(*tasks))
+
+
+def summarize(records: List[Dict[str, Any]], wall_seconds: float) -> Dict[str, Any]:
+    """Throughput, latency percentiles, error rate and per-stage breakdown"""
+    ok = [r for r in records if r["status"] == "success"]
+    errors = [r for r in records if r["status"] != "success"]
+
+    stages: Dict[str, List[float]] = {}
+    counters: Dict[str, List[float]] = {}
+    answered_by: Dict[str, int] = {}
+    for r in ok:
+        for key, value in r["timings"].items():
+            if key.endswith("_ms"):
+                stages.setdefault(key[:-3], []).append(value)
+            else:
+                counters.setdefault(key, []).append(value)
+        answered_by[r["answered_by"]] = answered_by.get(r["answered_by"], 0) + 1
+
+    error_kinds: Dict[str, int] = {}
+    for r in errors:
+        kind = r["error"].split(":")[0]
+        error_kinds[kind] = error_kinds.get(kind, 0) + 1
+
+    return {
+        "requests": len(records),
+        "errors": len(errors),
+        "error_rate": round(len(errors) / len(records), 4) if records else 0.0,
+        "error_kinds": error_kinds,
+        "wall_seconds": round(wall_seconds, 3),
+        "throughput_rps": round(len(ok) / wall_seconds, 2) if wall_seconds else 0.0,
+        "latency_ms": _distribution([r["latency_ms"] for r in ok]),
+        # Stages only appear in requests that ran them (cache hits skip retrieval)
+        "stages_ms": {name: dict(_distribution(v), count=len(v)) for name, v in sorted(stages.items())},
+        "per_request": {name: round(sum(v) / len(v), 2) for name, v in sorted(counters.items())},
+        "answered_by": answered_by,
+        "partial": sum(1 for r in ok if r["partial"]),
+    }
+
+
+def _field(summary: Dict[str, Any], path: str) -> Optional[float]:
+    value: Any = summary
+    for part in path.split("."):
+        value = value.get(part) if isinstance(value, dict) else None
+    return value
+
+
+def compare(summary: Dict[str, Any], baseline: Dict[str, Any], max_regression: float) -> List[str]:
+    """Fields that got worse than the baseline by more than max_regression percent"""
+    regressions = []
+    print("\nComparison with baseline:")
+    for path, higher_is_better in COMPARED_FIELDS:
+        now, before = _field(summary, path), _field(baseline, path)
+        if now is None or before is None:
+            continue
+        change = (now - before) / before * 100 if before else (0.0 if now == before else float("inf"))
+        worse = -change if higher_is_better else change
+        flag = ""
+        if worse > max_regression:
+            regressions.append(path)
+            flag = "  ❌ regression"
+        print(f"  {path:<16} {before:>10} -> {now:>10}  ({change:+.1f}%){flag}")
+    return regressions
+
+
+def print_report(summary: Dict[str, Any]) -> None:
+    print("\n" + "=" * 50)
+    print("SUMMARY")
+    print("=" * 50)
+    print(f"Requests: {summary['requests']}  Errors: {summary['errors']} ({summary['error_rate']:.1%})")
+    for kind, count in summary["error_kinds"].items():
+        print(f"  {kind}: {count}")
+    print(f"Throughput: {summary['throughput_rps']} req/s over {summary['wall_seconds']}s")
+    lat = summary["latency_ms"]
+    print(f"Latency ms: p50={lat['p50']} p95={lat['p95']} p99={lat['p99']} max={lat['max']}")
+    if summary["stages_ms"]:
+        print("Stages ms:")
+        for name, d in summary["stages_ms"].items():
+            print(f"  {name:<10} p50={d['p50']:<9} p95={d['p95']:<9} n={d['count']}")
+    if summary["per_request"]:
+        print("Per request: " + ", ".join(f"{k}={v}" for k, v in summary["per_request"].items()))
+    print(f"Answered by: {summary['answered_by']}  Partial: {summary['partial']}")
+
+
+async def run(args, items) -> Tuple[List[Dict[str, Any]], float]:
+    client_context = offline_client(args) if args.offline else remote_client(args)
+    async with client_context as client:
+        if args.warmup:
+            await asyncio.gather(*(send(client, item, args, time.perf_counter()) for item in items[:args.warmup]))
+        start = time.perf_counter()
+        if args.rate or args.replay_timing:
+            records = await run_open_loop(client, items, args)
+        else:
+            records = await run_closed_loop(client, items, args)
+        return records, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test the GraphRAG API")
+    parser.add_argument(
+        "--backend-url",
+        default=os.environ.get("BACKEND_URL", "http://localhost:8000"),
+        help="Backend URL",
+    )
+    parser.add_argument("--offline", action="store_true", help="Run the app in-process (embedded graph, mock LLM)")
+    parser.add_argument("--nodes", default="data/processed/nodes.csv", help="Offline: KG nodes CSV")
+    parser.add_argument("--edges", default="data/processed/edges.csv", help="Offline: KG edges CSV")
+    parser.add_argument("--snapshot", help="Offline: KG binary snapshot (instead of the CSVs)")
+    parser.add_argument("--cache", action="store_true", help="Offline: keep the /ask caches on")
+
+    parser.add_argument("--questions-file", default="docs/eval_questions.json", help="Questions file")
+    parser.add_argument("--trace", help="JSONL trace to replay instead (e.g. qa_logs.jsonl)")
+    parser.add_argument("--hop", type=int, default=2, help="Hop count for subgraph")
+    parser.add_argument("--limit", type=int, default=20, help="Evidence limit")
+
+    parser.add_argument("--concurrency", type=int, default=4, help="Closed loop: requests in flight")
+    parser.add_argument("--rate", type=float, help="Open loop: arrivals per second")
+    parser.add_argument("--arrivals", choices=["poisson", "uniform"], default="poisson", help="Open loop: arrival process")
+    parser.add_argument("--replay-timing", action="store_true", help="Open loop: send at the trace's own timestamps")
+    parser.add_argument("--speedup", type=float, default=1.0, help="With --replay-timing: time compression factor")
+    parser.add_argument("--requests", type=int, help="Requests to send (default: one pass over the questions)")
+    parser.add_argument("--duration", type=float, help="Seconds to keep sending")
+    parser.add_argument("--warmup", type=int, default=0, help="Unmeasured requests sent first")
+    parser.add_argument("--timeout", type=float, default=120.0, help="Per-request timeout (seconds)")
+    parser.add_argument("--seed", type=int, help="Random seed for Poisson arrivals")
+
+    parser.add_argument("--output-file", help="Summary JSON (default: data/benchmarks/benchmark-<time>.json)")
+    parser.add_argument("--responses-file", help="Also append every response as JSONL")
+    parser.add_argument("--baseline", help="Summary JSON to compare against")
+    parser.add_argument("--save-baseline", help="Also write this run's summary here")
+    parser.add_argument("--max-regression", type=float, default=10.0, help="Percent worse than baseline that fails the run")
+    args = parser.parse_args()
+
+    if args.seed is not None:
+        random.seed(args.seed)
+    if args.rate is not None and args.rate <= 0:
+        parser.error("--rate must be positive")
+
+    print(f"Loading questions from {args.trace or args.questions_file}...")
+    items = load_questions(args.questions_file, args.trace)
+    if not items:
+        sys.exit("❌ No questions to send")
+    print(f"Found {len(items)} questions")
+
+    mode = (
+        "trace timing" if args.replay_timing
+        else f"open loop at {args.rate}/s" if args.rate
+        else f"closed loop x{args.concurrency}"
+    )
+    print(f"Running ({'offline' if args.offline else args.backend_url}, {mode})...")
+    records, wall = asyncio.run(run(args, items))
+
+    summary = summarize(records, wall)
+    print_report(summary)
+
+    result = {
+        "timestamp": datetime.now().isoformat(),
+        "config": {
+            "target": "offline" if args.offline else args.backend_url,
+            "source": args.trace or args.questions_file,
+            "mode": mode,
+            "cache": args.cache if args.offline else None,
+            "hop": args.hop,
+            "limit": args.limit,
+        },
+        "summary": summary,
+    }
+    output_file = args.output_file or os.path.join(
+        "data", "benchmarks", f"benchmark-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json"
+    )
+    for path in filter(None, [output_file, args.save_baseline]):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+    print(f"\nResults saved to: {output_file}")
+
+    if args.responses_file:
+        os.makedirs(os.path.dirname(args.responses_file) or ".", exist_ok=True)
+        with open(args.responses_file, "a", encoding="utf-8") as f:
+            for r in records:
+                f.write(json.dumps(r, ensure_ascii=False) + "\n")
+        print(f"Responses saved to: {args.responses_file}")
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        changed = [k for k, v in result["config"].items() if baseline["config"].get(k) != v]
+        if changed:
+            # e.g. open-loop throughput is set by --rate, not by the server
+            print(f"\n⚠️  Baseline was run with different {', '.join(changed)}; comparison may not be meaningful")
+        regressions = compare(summary, baseline["summary"], args.max_regression)
+        if regressions:
+            print(f"❌ Regressed more than {args.max_regression:g}%: {', '.join(regressions)}")
+            sys.exit(1)
+        print("✅ Within baseline tolerance")
+
+
+if __name__ == "__main__":
+    main()